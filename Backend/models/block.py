@@ -1,16 +1,27 @@
 import hashlib
-import json
 from typing import List
 try:
     from .transaction import Transaction  # package-relative import
+    from .encoding import encode_fields
+    from .merkle import Proof, merkle_proof, merkle_root, verify_proof
 except Exception:
     # Fallback when run without package context
     try:
         from transaction import Transaction  # type: ignore
+        from encoding import encode_fields  # type: ignore
+        from merkle import Proof, merkle_proof, merkle_root, verify_proof  # type: ignore
     except Exception as e:
         raise ImportError(f"Cannot import Transaction: {e}")
 
 
+def transaction_digests(transactions) -> List[bytes]:
+    # ColumnarTransactions giữ sẵn digest theo cột; list thường dùng digest đã memo trên từng Transaction
+    digests = getattr(transactions, 'digests', None)
+    if digests is not None:
+        return digests()
+    return [t.digest() for t in transactions]
+
+
 class Block:
     def __init__(self, index: int, transactions: List[Transaction], previous_hash: str, timestamp: int):
         self.index = index
@@ -19,12 +30,19 @@ class Block:
         self.timestamp = timestamp
         self.hash = self.compute_hash()
 
+    def compute_merkle_root(self) -> bytes:
+        return merkle_root(transaction_digests(self.transactions))
+
     def compute_hash(self) -> str:
-        payload = {
-            "index": self.index,
-            "transactions": [t.__dict__ for t in self.transactions],
-            "previous_hash": self.previous_hash,
-            "timestamp": self.timestamp,
-        }
-        block_string = json.dumps(payload, sort_keys=True).encode()
-        return hashlib.sha256(block_string).hexdigest()
+        # Header = index, previous_hash, timestamp, Merkle root của digest giao dịch
+        self.merkle_root = self.compute_merkle_root()
+        header = encode_fields(self.index, self.previous_hash, self.timestamp, self.merkle_root)
+        return hashlib.sha256(b'block\x00' + header).hexdigest()
+
+    def inclusion_proof(self, position: int) -> Proof:
+        """Merkle proof that transactions[position] is part of this block"""
+        return merkle_proof(transaction_digests(self.transactions), position)
+
+    @staticmethod
+    def verify_inclusion(tx: Transaction, proof: Proof, merkle_root_: bytes) -> bool:
+        return verify_proof(tx.digest(), proof, merkle_root_)
@@ -1,25 +1,37 @@
 import time
-from typing import List
+from typing import Dict, List
 try:
     # Support both package and standalone imports
     try:
         from .block import Block  # package-relative import
         from .transaction import Transaction
+        from .owner_index import OwnerIndex
+        from .columnar import ColumnarTransactions, StringTable, fits_columns
     except Exception:
         try:
             from block import Block  # type: ignore
             from transaction import Transaction  # type: ignore
+            from owner_index import OwnerIndex  # type: ignore
+            from columnar import ColumnarTransactions, StringTable, fits_columns  # type: ignore
         except Exception as e:
             raise ImportError(f"Cannot import Block/Transaction: {e}")
 except ImportError:
     from block import Block  # type: ignore
     from transaction import Transaction  # type: ignore
+    from owner_index import OwnerIndex  # type: ignore
+    from columnar import ColumnarTransactions, StringTable, fits_columns  # type: ignore
 
 
 class BlockChain:
-    def __init__(self):
+    def __init__(self, compact: bool = False):
+        # compact=True: block đã mine lưu giao dịch theo cột (ColumnarTransactions) cho sổ cái lớn
+        self.compact = compact
+        self._strings = StringTable() if compact else None
         self.chain: List[Block] = []
         self.pending_transactions: List[Transaction] = []
+        # Vị trí block cuối cùng đã được is_valid() kiểm tra (checkpoint)
+        self._verified_upto = 0
+        self._owner_index = OwnerIndex()
         self.create_genesis_block()
 
     def create_genesis_block(self):
@@ -28,37 +40,61 @@ class BlockChain:
 
     def add_transaction(self, tx: Transaction):
         self.pending_transactions.append(tx)
+        self._owner_index.add_pending(tx, len(self.pending_transactions) - 1)
+
+    def _seal_transactions(self):
+        if self.compact and all(fits_columns(t) for t in self.pending_transactions):
+            return ColumnarTransactions.from_transactions(self.pending_transactions, self._strings)
+        return self.pending_transactions.copy()
 
     def mine_block(self):
         if not self.pending_transactions:
             return None
         block = Block(
             index=len(self.chain),
-            transactions=self.pending_transactions.copy(),
+            transactions=self._seal_transactions(),
             previous_hash=self.chain[-1].hash,
             timestamp=int(time.time()),
         )
         self.chain.append(block)
         self.pending_transactions.clear()
+        self._owner_index.mark_mined(block.index)
         return block
 
-    def get_transactions_by_owner(self, owner: str) -> List[Transaction]:
+    def _resolve(self, seqs) -> List[Transaction]:
         result: List[Transaction] = []
-        for b in self.chain:
-            for t in b.transactions:
-                if t.owner.lower() == owner.lower():
-                    result.append(t)
-        for t in self.pending_transactions:
-            if t.owner.lower() == owner.lower():
-                result.append(t)
+        for seq in seqs:
+            block, offset = self._owner_index.position(seq)
+            if block == OwnerIndex.PENDING:
+                result.append(self.pending_transactions[offset])
+            else:
+                result.append(self.chain[block].transactions[offset])
         return result
 
-    def is_valid(self) -> bool:
-        for i in range(1, len(self.chain)):
+    def get_transactions_by_owner(self, owner: str) -> List[Transaction]:
+        # Tra qua OwnerIndex: chi phí phụ thuộc số giao dịch của owner, không phụ thuộc độ dài chuỗi
+        return self._resolve(self._owner_index.seqs(owner))
+
+    def get_transactions_by_owner_between(self, owner: str, start: int, end: int) -> List[Transaction]:
+        """Owner's transactions with start <= timestamp < end, sorted by timestamp"""
+        return self._resolve(self._owner_index.seqs_between(owner, start, end))
+
+    def get_owner_totals(self, owner: str) -> Dict[str, float]:
+        """Running income/expense totals for an owner (mined and pending)"""
+        return self._owner_index.totals(owner)
+
+    def is_valid(self, full: bool = False) -> bool:
+        """Check hash links; by default only blocks appended since the last successful check.
+
+        Pass full=True to rehash the whole chain (e.g. after blocks were mutated in place).
+        """
+        start = 1 if full else max(1, self._verified_upto + 1)
+        for i in range(start, len(self.chain)):
             prev = self.chain[i - 1]
             curr = self.chain[i]
             if curr.previous_hash != prev.hash:
                 return False
             if curr.compute_hash() != curr.hash:
                 return False
+        self._verified_upto = len(self.chain) - 1
         return True
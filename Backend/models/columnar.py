@@ -0,0 +1,129 @@
+from array import array
+from typing import Dict, Iterable, Iterator, List, Sequence, Union
+try:
+    from .transaction import Transaction  # package-relative import
+except Exception:
+    try:
+        from transaction import Transaction  # type: ignore
+    except Exception as e:
+        raise ImportError(f"Cannot import Transaction: {e}")
+
+
+class StringTable:
+    """Bảng intern chuỗi dùng chung cho cả chuỗi: mỗi owner/category/note chỉ lưu một lần"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._values: List[str] = []
+
+    def intern(self, value: str) -> int:
+        idx = self._ids.get(value)
+        if idx is None:
+            idx = len(self._values)
+            self._ids[value] = idx
+            self._values.append(value)
+        return idx
+
+    def lookup(self, value: str) -> int:
+        """Id of an already interned string, or -1"""
+        return self._ids.get(value, -1)
+
+    def __getitem__(self, idx: int) -> str:
+        return self._values[idx]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+def fits_columns(tx: Transaction) -> bool:
+    """True if the transaction round-trips through the columns without changing type"""
+    return (
+        type(tx.id) is int and type(tx.timestamp) is int and type(tx.isIncome) is bool
+        and (type(tx.amount) is float or (type(tx.amount) is int and abs(tx.amount) <= 2 ** 53))
+        and isinstance(tx.owner, str) and isinstance(tx.category, str) and isinstance(tx.note, str)
+    )
+
+
+class ColumnarTransactions(Sequence):
+    """Giao dịch của một block lưu theo cột (array) thay vì list các object.
+
+    amount / timestamp / isIncome nằm trong các array song song, owner /
+    category / note là id trong StringTable. Truy cập theo chỉ số hoặc lặp
+    sẽ dựng lại Transaction với đúng kiểu dữ liệu ban đầu, nên
+    Block.compute_hash và BlockChain.get_transactions_by_owner cho kết quả
+    như với list thường.
+    """
+
+    def __init__(self, table: StringTable):
+        self._table = table
+        self._ids = array('q')
+        self._owners = array('l')
+        self._amounts = array('d')
+        self._amount_is_int = array('b')
+        self._categories = array('l')
+        self._notes = array('l')
+        self._timestamps = array('q')
+        self._is_income = array('b')
+        self._digests = None
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable[Transaction], table: StringTable) -> 'ColumnarTransactions':
+        store = cls(table)
+        for tx in transactions:
+            store.append(tx)
+        return store
+
+    def append(self, tx: Transaction) -> None:
+        if not fits_columns(tx):
+            raise TypeError(f"transaction {tx.id!r} cannot be stored in columns without changing its types")
+        self._ids.append(tx.id)
+        self._owners.append(self._table.intern(tx.owner))
+        self._amounts.append(tx.amount)
+        self._amount_is_int.append(type(tx.amount) is int)
+        self._categories.append(self._table.intern(tx.category))
+        self._notes.append(self._table.intern(tx.note))
+        self._timestamps.append(tx.timestamp)
+        self._is_income.append(tx.isIncome)
+        self._digests = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _materialize(self, i: int) -> Transaction:
+        amount = self._amounts[i]
+        return Transaction(
+            id=self._ids[i],
+            owner=self._table[self._owners[i]],
+            amount=int(amount) if self._amount_is_int[i] else amount,
+            category=self._table[self._categories[i]],
+            note=self._table[self._notes[i]],
+            timestamp=self._timestamps[i],
+            isIncome=bool(self._is_income[i]),
+        )
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            return [self._materialize(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('transaction index out of range')
+        return self._materialize(i)
+
+    def __iter__(self) -> Iterator[Transaction]:
+        for i in range(len(self)):
+            yield self._materialize(i)
+
+    def digests(self):
+        """Per-transaction digests, computed once and cached for the block"""
+        # Cache là một khối bytes liền (32 byte/giao dịch) thay vì list object bytes
+        if self._digests is None:
+            self._digests = b''.join(tx.digest() for tx in self)
+        blob = self._digests
+        return [blob[i:i + 32] for i in range(0, len(blob), 32)]
+
+    def nbytes(self) -> int:
+        """Bytes held by this block's columns (excluding the shared string table)"""
+        columns = (self._ids, self._owners, self._amounts, self._amount_is_int,
+                   self._categories, self._notes, self._timestamps, self._is_income)
+        return sum(c.itemsize * len(c) for c in columns)
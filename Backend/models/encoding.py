@@ -0,0 +1,49 @@
+import struct
+from typing import Any
+
+# Mã hoá nhị phân chuẩn (canonical): mỗi giá trị có tag kiểu + độ dài cố định hoặc
+# tiền tố độ dài, nên hai giá trị khác nhau không bao giờ cho cùng chuỗi byte
+# (khác json.dumps: 1 và 1.0, "1" và 1 đều được phân biệt).
+
+_pack_q = struct.Struct('>q').pack
+_pack_d = struct.Struct('>d').pack
+_pack_len = struct.Struct('>I').pack
+
+
+def _encode_int(value: int) -> bytes:
+    if -2 ** 63 <= value < 2 ** 63:
+        return b'i' + _pack_q(value)
+    digits = str(value).encode()
+    return b'I' + _pack_len(len(digits)) + digits
+
+
+def _encode_str(value: str) -> bytes:
+    raw = value.encode('utf-8')
+    return b's' + _pack_len(len(raw)) + raw
+
+
+_ENCODERS = {
+    type(None): lambda value: b'n',
+    bool: lambda value: b'b\x01' if value else b'b\x00',
+    int: _encode_int,
+    float: lambda value: b'f' + _pack_d(value),
+    str: _encode_str,
+    bytes: lambda value: b'x' + _pack_len(len(value)) + value,
+}
+
+
+def encode_value(value: Any) -> bytes:
+    encoder = _ENCODERS.get(type(value))
+    if encoder is None:
+        # Lớp con (IntEnum, str subclass...) mã hoá như kiểu gốc
+        for base, enc in _ENCODERS.items():
+            if base is not type(None) and isinstance(value, base):
+                encoder = enc
+                break
+        else:
+            raise TypeError(f"cannot canonically encode {type(value).__name__}")
+    return encoder(value)
+
+
+def encode_fields(*values: Any) -> bytes:
+    return b''.join([encode_value(v) for v in values])
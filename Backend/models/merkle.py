@@ -0,0 +1,52 @@
+import hashlib
+from typing import List, Sequence, Tuple
+
+# Cây Merkle trên các digest giao dịch. Nút lẻ ở cuối một tầng được đẩy thẳng
+# lên tầng trên (không nhân đôi như Bitcoin) để hai danh sách lá khác nhau không
+# thể cho cùng một root. Nút trong có tiền tố 0x01 để tách biệt với digest lá.
+
+EMPTY_ROOT = hashlib.sha256(b'').digest()
+
+# (sibling_is_left, sibling_hash) từ lá lên gốc
+Proof = List[Tuple[bool, bytes]]
+
+
+def _parent(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b'\x01' + left + right).digest()
+
+
+def merkle_root(leaves: Sequence[bytes]) -> bytes:
+    if not leaves:
+        return EMPTY_ROOT
+    level = list(leaves)
+    while len(level) > 1:
+        nxt = [_parent(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            nxt.append(level[-1])
+        level = nxt
+    return level[0]
+
+
+def merkle_proof(leaves: Sequence[bytes], index: int) -> Proof:
+    """Sibling hashes needed to rebuild the root from leaves[index] (O(log n) entries)"""
+    if not 0 <= index < len(leaves):
+        raise IndexError('leaf index out of range')
+    proof: Proof = []
+    level = list(leaves)
+    while len(level) > 1:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append((sibling < index, level[sibling]))
+        nxt = [_parent(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            nxt.append(level[-1])
+        level = nxt
+        index //= 2
+    return proof
+
+
+def verify_proof(leaf: bytes, proof: Proof, root: bytes) -> bool:
+    node = leaf
+    for sibling_is_left, sibling in proof:
+        node = _parent(sibling, node) if sibling_is_left else _parent(node, sibling)
+    return node == root
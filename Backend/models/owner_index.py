@@ -0,0 +1,89 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Sequence
+
+
+class OwnerIndex:
+    """owner -> vị trí các giao dịch của owner đó trong BlockChain.
+
+    Mỗi giao dịch nhận một số thứ tự (seq) theo thứ tự được thêm vào; vị trí
+    thật (block, offset) của seq nằm trong hai mảng song song. Giao dịch đang
+    chờ có block = PENDING và offset là vị trí trong pending_transactions;
+    mark_mined() chỉ cần đổi block của các seq đang chờ, offset giữ nguyên vì
+    mine_block() sao chép pending theo đúng thứ tự.
+    """
+
+    PENDING = -1
+
+    def __init__(self):
+        self._block = array('l')
+        self._offset = array('l')
+        self._first_pending = 0
+        # Danh sách theo owner cũng là array để không tốn một object int cho mỗi phần tử
+        self._seqs: Dict[str, array] = {}
+        # Theo từng owner: timestamp đã sắp xếp và seq tương ứng (cho truy vấn theo khoảng thời gian)
+        self._times: Dict[str, array] = {}
+        self._time_seqs: Dict[str, array] = {}
+        self._income: Dict[str, float] = {}
+        self._expense: Dict[str, float] = {}
+
+    @staticmethod
+    def key(owner: str) -> str:
+        return owner.lower()
+
+    def __len__(self) -> int:
+        return len(self._block)
+
+    def add_pending(self, tx, offset: int) -> None:
+        seq = len(self._block)
+        self._block.append(self.PENDING)
+        self._offset.append(offset)
+        k = self.key(tx.owner)
+        seqs = self._seqs.get(k)
+        if seqs is None:
+            seqs = self._seqs[k] = array('q')
+            self._times[k] = array('d')
+            self._time_seqs[k] = array('q')
+        seqs.append(seq)
+
+        times = self._times[k]
+        time_seqs = self._time_seqs[k]
+        if len(times) and tx.timestamp >= times[-1]:
+            times.append(tx.timestamp)
+            time_seqs.append(seq)
+        else:
+            pos = bisect_right(times, tx.timestamp)
+            times.insert(pos, tx.timestamp)
+            time_seqs.insert(pos, seq)
+
+        if tx.isIncome:
+            self._income[k] = self._income.get(k, 0) + tx.amount
+        else:
+            self._expense[k] = self._expense.get(k, 0) + tx.amount
+
+    def mark_mined(self, block_index: int) -> None:
+        """Move every pending entry into block `block_index`"""
+        for seq in range(self._first_pending, len(self._block)):
+            self._block[seq] = block_index
+        self._first_pending = len(self._block)
+
+    def position(self, seq: int):
+        return self._block[seq], self._offset[seq]
+
+    def seqs(self, owner: str) -> Sequence[int]:
+        """Sequence numbers of the owner's transactions in chain order"""
+        return self._seqs.get(self.key(owner), ())
+
+    def seqs_between(self, owner: str, start: int, end: int) -> Sequence[int]:
+        """Sequence numbers with start <= timestamp < end, sorted by timestamp"""
+        k = self.key(owner)
+        times = self._times.get(k)
+        if not times:
+            return ()
+        return self._time_seqs[k][bisect_left(times, start):bisect_left(times, end)]
+
+    def totals(self, owner: str) -> Dict[str, float]:
+        k = self.key(owner)
+        income = self._income.get(k, 0)
+        expense = self._expense.get(k, 0)
+        return {"income": income, "expense": expense, "balance": income - expense}
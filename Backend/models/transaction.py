@@ -1,9 +1,23 @@
+import hashlib
 from dataclasses import dataclass
 from typing import Optional
+try:
+    from .encoding import encode_fields  # package-relative import
+except Exception:
+    try:
+        from encoding import encode_fields  # type: ignore
+    except Exception as e:
+        raise ImportError(f"Cannot import encode_fields: {e}")
 
+TRANSACTION_FIELDS = ('id', 'owner', 'amount', 'category', 'note', 'timestamp', 'isIncome')
 
-@dataclass
+
+@dataclass(frozen=True)
 class Transaction:
+    # __slots__: không có __dict__ riêng cho mỗi instance (nhẹ hơn khi sổ cái lớn).
+    # frozen: giao dịch bất biến nên digest() có thể tính một lần rồi giữ lại trong _digest.
+    __slots__ = TRANSACTION_FIELDS + ('_digest',)
+
     id: int
     owner: str
     amount: int
@@ -11,3 +25,29 @@ class Transaction:
     note: str
     timestamp: int
     isIncome: bool
+
+    def to_dict(self) -> dict:
+        """Field name -> value, the same mapping the old per-instance __dict__ held"""
+        return {name: getattr(self, name) for name in TRANSACTION_FIELDS}
+
+    # Pickle (process pool, copy): frozen + __slots__ cần tự khai báo trạng thái
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in TRANSACTION_FIELDS)
+
+    def __setstate__(self, state):
+        for name, value in zip(TRANSACTION_FIELDS, state):
+            object.__setattr__(self, name, value)
+
+    def encode(self) -> bytes:
+        """Canonical binary encoding of the transaction fields"""
+        return encode_fields(self.id, self.owner, self.amount, self.category,
+                             self.note, self.timestamp, self.isIncome)
+
+    def digest(self) -> bytes:
+        """SHA-256 of encode(), memoized on the instance"""
+        try:
+            return self._digest
+        except AttributeError:
+            d = hashlib.sha256(b'tx\x00' + self.encode()).digest()
+            object.__setattr__(self, '_digest', d)
+            return d
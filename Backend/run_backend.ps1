@@ -1,5 +1,6 @@
 param(
-    [switch]$Seed
+    [switch]$Seed,
+    [int]$Workers = 1
 )
 
 # Run backend using the venv python; also optionally seed demo data
@@ -43,7 +44,16 @@ if ($Seed) { $env:SEED_SAMPLE = "1"; Write-Host "Bật seed dữ liệu mẫu (S
 # Start using Waitress to avoid Flask development server warnings
 # Serve the WSGI app callable defined in app.py as `app`
 Write-Host "Starting backend (FastAPI) on http://127.0.0.1:5000" -ForegroundColor Cyan
-& $venvPython -m uvicorn src.main:app --host 127.0.0.1 --port 5000 --reload
+# Log request do RequestLogMiddleware ghi (JSON); tắt access log trùng của uvicorn
+if ($Workers -gt 1) {
+    # Nhiều worker process (không dùng được --reload); uvicorn và app cùng đọc WEB_CONCURRENCY
+    # để seed chạy dưới lock và cache được invalidate chéo giữa các worker
+    $env:WEB_CONCURRENCY = "$Workers"
+    Write-Host "Chạy $Workers worker" -ForegroundColor Cyan
+    & $venvPython -m uvicorn src.main:app --host 127.0.0.1 --port 5000 --workers $Workers --no-access-log
+} else {
+    & $venvPython -m uvicorn src.main:app --host 127.0.0.1 --port 5000 --reload --no-access-log
+}
 Start-Sleep -Seconds 1
 try {
     $resp = Invoke-RestMethod -Uri "http://127.0.0.1:$env:PORT/api/health" -Method Get -ErrorAction Stop
@@ -0,0 +1,81 @@
+"""
+Benchmark hash block: JSON (cách cũ) so với mã hoá nhị phân + Merkle root
+Đo: hash lần đầu, hash lại (digest giao dịch đã memo), tạo + kiểm tra Merkle proof
+Chạy: python scripts/bench_block_hash.py [--sizes 1000,10000] [--repeat 5]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.block import Block  # noqa: E402
+from models.transaction import Transaction  # noqa: E402
+
+USERS = ["Alice", "Bob", "Carol", "Dave", "Eve", "Frank", "Grace", "Henry"]
+CATEGORIES = ["Lương", "Thưởng", "Ăn uống", "Mua sắm", "Giải trí", "Đầu tư", "Tiết kiệm"]
+
+
+def json_block_hash(block):
+    # Block.compute_hash trước đây: json.dumps(sort_keys=True) trên toàn bộ giao dịch
+    payload = {
+        "index": block.index,
+        "transactions": [t.to_dict() for t in block.transactions],
+        "previous_hash": block.previous_hash,
+        "timestamp": block.timestamp,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def make_transactions(size):
+    now = int(time.time())
+    return [
+        Transaction(id=i, owner=random.choice(USERS), amount=random.randint(1, 1000),
+                    category=random.choice(CATEGORIES), note="", timestamp=now + i,
+                    isIncome=random.random() < 0.3)
+        for i in range(size)
+    ]
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(sizes, repeat):
+    print(f"{'tx/block':>9s} | {'JSON (ms)':>10s} | {'Merkle lần đầu':>15s} | {'Merkle hash lại':>16s} | {'proof (µs)':>9s} | {'verify (µs)':>10s}")
+    print("-" * 96)
+    for size in sizes:
+        txs = make_transactions(size)
+        block = Block(index=1, transactions=txs, previous_hash="0", timestamp=int(time.time()))
+        json_ms = timed(lambda: json_block_hash(block), repeat)
+
+        def cold():
+            fresh = [Transaction(*t.__getstate__()) for t in txs]
+            Block(index=1, transactions=fresh, previous_hash="0", timestamp=block.timestamp)
+        # Trừ thời gian dựng lại Transaction để chỉ tính phần băm
+        rebuild_ms = timed(lambda: [Transaction(*t.__getstate__()) for t in txs], repeat)
+        cold_ms = timed(cold, repeat) - rebuild_ms
+        warm_ms = timed(block.compute_hash, repeat)
+
+        position = size // 2
+        root = block.merkle_root
+        proof = block.inclusion_proof(position)
+        proof_us = timed(lambda: block.inclusion_proof(position), repeat) * 1000
+        verify_us = timed(lambda: Block.verify_inclusion(txs[position], proof, root), repeat * 100) * 1000
+        print(f"{size:>9d} | {json_ms:>10.2f} | {cold_ms:>15.2f} | {warm_ms:>16.2f} | "
+              f"{proof_us:>9.0f} | {verify_us:>10.1f} ({len(proof)} hash)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='1000,10000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    main([int(s) for s in args.sizes.split(',')], args.repeat)
@@ -0,0 +1,185 @@
+"""
+Benchmark nối block vào đỉnh chuỗi khi ghi song song, đúng đường ghi của backend
+Nhiều BlockProducer (như nhiều worker) niêm phong block qua chain_lock() + _append_at_tip (index = đỉnh + 1,
+unique index trên blocks.index làm compare-and-swap), trong khi ingest_records nạp lô block vào cùng chuỗi.
+Báo block/s, tx/s, latency nối block (chờ lock + ghi) p50/p95/p99, số lần thử lại do xung đột index,
+rồi kiểm tra chuỗi: index trùng, index bị hở và validate_full.
+Engine mongo dùng database riêng MONGO_DB_NAME + "_bench" (bị xóa sau khi chạy) hoặc `--mongo mock`
+(mongomock-motor, không cần mongod); sqlite dùng file tạm.
+Chạy:
+  python scripts/bench_block_index.py                               # mongod theo MONGO_URI
+  python scripts/bench_block_index.py --mongo mock --producers 8 --txs 5000 --ingest 20000
+  python scripts/bench_block_index.py --engine sqlite --ingest 0    # chỉ producer
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import database  # noqa: E402
+from src.chain import shutdown_validation, validate_full  # noqa: E402
+from src.ingest import ingest_records  # noqa: E402
+from src.producer import BLOCK_APPEND_CONFLICTS, BlockProducer  # noqa: E402
+from src.storage import ENGINES  # noqa: E402
+
+BENCH_DB = database.MONGO_DB_NAME + '_bench'
+USERS = [f'user{i}' for i in range(200)]
+SUBMIT_CHUNK = 100
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+class TimedProducer(BlockProducer):
+    """BlockProducer that records how long each append took (waiting for chain_lock included)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.append_seconds = []
+
+    async def _append(self, block_data, batch, transactions=None):
+        start = time.perf_counter()
+        try:
+            return await super()._append(block_data, batch, transactions)
+        finally:
+            self.append_seconds.append(time.perf_counter() - start)
+
+
+def make_transaction():
+    sender, recipient = random.sample(USERS, 2)
+    return {'sender': sender, 'recipient': recipient, 'amount': round(random.uniform(1, 1000), 2)}
+
+
+async def produce(producer, count):
+    """Submit `count` transactions in chunks (like POST /api/transactions/batch) and wait until mined"""
+    tx_ids = []
+    for start in range(0, count, SUBMIT_CHUNK):
+        results = producer.submit_many([make_transaction() for _ in range(min(SUBMIT_CHUNK, count - start))])
+        tx_ids.extend(r for r in results if not isinstance(r, Exception))
+        await asyncio.sleep(0)
+    await producer.wait_many(tx_ids)
+    return len(tx_ids)
+
+
+async def check_chain():
+    """Duplicate / missing block indexes and the validate_full result"""
+    counts = Counter()
+    async for batch in database.get_storage().iter_blocks(batch_size=1000, tx_fields=('amount',)):
+        counts.update(block['index'] for block in batch)
+    duplicates = sum(n - 1 for n in counts.values() if n > 1)
+    gaps = (max(counts) + 1 - len(counts)) if counts else 0
+    return sum(counts.values()), duplicates, gaps, await validate_full()
+
+
+async def bench(args):
+    producers = [TimedProducer(max_txs=args.block_size, max_wait_ms=args.max_wait_ms) for _ in range(args.producers)]
+    for producer in producers:
+        await producer.start()
+    conflicts = BLOCK_APPEND_CONFLICTS.value()
+    per_producer = args.txs // max(1, args.producers)
+    records = (make_transaction() for _ in range(args.ingest))
+    start = time.perf_counter()
+    try:
+        jobs = [produce(producer, per_producer) for producer in producers]
+        if args.ingest:
+            jobs.append(ingest_records(records, block_size=args.ingest_block_size, batch_blocks=args.batch_blocks,
+                                       rollups=False, verify_signatures=False))
+        results = await asyncio.gather(*jobs)
+    finally:
+        for producer in producers:
+            await producer.stop()
+    elapsed = time.perf_counter() - start
+    mined = sum(results[:len(producers)])
+    ingested = results[-1] if args.ingest else {'transactions': 0, 'blocks': 0}
+    appends = sorted(s for producer in producers for s in producer.append_seconds)
+    return {
+        'elapsed': elapsed, 'mined': mined, 'appends': appends,
+        'ingested': ingested, 'conflicts': BLOCK_APPEND_CONFLICTS.value() - conflicts,
+        'chain': await check_chain(),
+    }
+
+
+async def open_engine(engine, workdir):
+    if engine == 'sqlite':
+        return await database.init_storage('sqlite', sqlite_path=os.path.join(workdir, 'bench.db'))
+    # Database trống mỗi lần chạy; init_mongodb tạo lại các index (kể cả unique blocks.index) như backend
+    await database.init_storage('mongo', db_name=BENCH_DB)
+    await database.get_async_db().client.drop_database(BENCH_DB)
+    await database.close_storage()
+    return await database.init_storage('mongo', db_name=BENCH_DB)
+
+
+async def close_engine(engine):
+    if engine == 'mongo':
+        await database.get_async_db().client.drop_database(BENCH_DB)
+    await database.close_storage()
+
+
+def ms(value):
+    return value * 1000
+
+
+async def main(args):
+    if args.mongo == 'mock' and args.engine == 'mongo':
+        try:
+            import mongomock
+            import mongomock_motor
+        except ImportError:
+            sys.exit("❌ --mongo mock cần: pip install mongomock-motor")
+        shared = mongomock.MongoClient()
+        database.AsyncIOMotorClient = lambda *a, **k: mongomock_motor.AsyncMongoMockClient(mock_mongo_client=shared)
+
+    print(f"🔧 {args.engine}: {args.producers} producer x {args.txs // max(1, args.producers):,} giao dịch "
+          f"({args.block_size}/block) + ingest {args.ingest:,} giao dịch ({args.ingest_block_size}/block)")
+    workdir = tempfile.mkdtemp(prefix='bench_block_index_')
+    try:
+        await open_engine(args.engine, workdir)
+        try:
+            result = await bench(args)
+        finally:
+            await close_engine(args.engine)
+            shutdown_validation()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    appends, ingested = result['appends'], result['ingested']
+    blocks, duplicates, gaps, validation = result['chain']
+    total_txs = result['mined'] + ingested['transactions']
+    print("-" * 60)
+    print(f"  ⏱️  {result['elapsed']:.2f}s | {blocks / result['elapsed']:,.0f} block/s | "
+          f"{total_txs / result['elapsed']:,.0f} tx/s")
+    print(f"  📦 producer: {len(appends):,} block, {result['mined']:,} giao dịch | "
+          f"ingest: {ingested['blocks']:,} block, {ingested['transactions']:,} giao dịch")
+    print(f"  🔒 nối block (chờ lock + ghi): p50 {ms(percentile(appends, 50)):.2f}ms | "
+          f"p95 {ms(percentile(appends, 95)):.2f}ms | p99 {ms(percentile(appends, 99)):.2f}ms")
+    print(f"  🔁 thử lại do xung đột index: {result['conflicts']}")
+    print(f"  🔍 index trùng: {duplicates} | index bị hở: {gaps} | validate_full: "
+          f"{'hợp lệ' if validation['valid'] else validation['error']} ({validation['checked']:,} block)")
+    ok = not duplicates and not gaps and validation['valid']
+    print("✅ Chuỗi liền mạch" if ok else "❌ Chuỗi bị fork hoặc hở index")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engine', choices=ENGINES, default='mongo')
+    parser.add_argument('--mongo', choices=('real', 'mock'), default='real',
+                        help="mock: mongomock-motor trong process thay cho mongod")
+    parser.add_argument('--producers', type=int, default=4, help="số BlockProducer chạy song song")
+    parser.add_argument('--txs', type=int, default=2000, help="tổng giao dịch chia đều cho các producer")
+    parser.add_argument('--block-size', type=int, default=10, help="BLOCK_MAX_TXS của mỗi producer")
+    parser.add_argument('--max-wait-ms', type=float, default=5)
+    parser.add_argument('--ingest', type=int, default=5000, help="số giao dịch nạp song song qua ingest (0: tắt)")
+    parser.add_argument('--ingest-block-size', type=int, default=100)
+    parser.add_argument('--batch-blocks', type=int, default=5, help="số block mỗi lô ingest (mỗi lô một lần giữ lock)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
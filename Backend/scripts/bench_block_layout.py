@@ -0,0 +1,150 @@
+"""
+Benchmark layout lưu block: embedded (giao dịch chép vào block) so với reference (tx_ids + merkle_root)
+Mỗi layout ghi cùng số block qua đường ghi của producer (save_transactions + save_block), rồi đo:
+dung lượng collection blocks/transactions (collStats), latency ghi mỗi block và latency đọc một trang block
+(get_blocks_page, reference đọc giao dịch bằng một lệnh $in; thêm dòng reference+$lookup để so sánh).
+Cần mongod theo MONGO_URI; dùng database riêng MONGO_DB_NAME + "_layout" (bị xóa sau khi chạy).
+Chạy: python scripts/bench_block_layout.py [--blocks 2000] [--txs 10] [--page 100] [--reads 200]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.chain import GENESIS_PREVIOUS_HASH, attach_transactions, compute_block_hash  # noqa: E402
+from src.database import (  # noqa: E402
+    MONGO_DB_NAME, close_mongodb, get_async_db, get_blocks_page, init_mongodb, save_block, save_transactions,
+)
+
+BENCH_DB = MONGO_DB_NAME + '_layout'
+USERS = [f'user{i}' for i in range(200)]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def make_transactions(count):
+    txs = []
+    for _ in range(count):
+        sender, recipient = random.sample(USERS, 2)
+        txs.append({
+            'sender': sender,
+            'recipient': recipient,
+            'amount': round(random.uniform(1, 1000), 2),
+            'mined': True,
+            'wallet_address': '0x' + os.urandom(20).hex(),
+            'signature': '0x' + os.urandom(65).hex(),
+            'signed_message': f'FinanceChain transfer {sender} -> {recipient} nonce={os.urandom(16).hex()}',
+        })
+    return txs
+
+
+async def write_chain(layout, args):
+    """Append `args.blocks` blocks like the producer does; returns per-block write latencies"""
+    latencies = []
+    prev_hash = GENESIS_PREVIOUS_HASH
+    for index in range(args.blocks):
+        block_id = ObjectId()
+        txs = make_transactions(args.txs)
+        for tx in txs:
+            tx['block_id'] = str(block_id)
+        start = time.perf_counter()
+        await save_transactions(txs)
+        block = attach_transactions({'_id': block_id}, txs, layout)
+        block.update({'index': index, 'timestamp': time.time(), 'label': f'{len(txs)} giao dịch (Block #{index})',
+                      'previous_hash': prev_hash})
+        block['hash'] = prev_hash = compute_block_hash(block)
+        await save_block(block, None if layout == 'embedded' else txs)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def storage(db):
+    """Data and on-disk size (bytes) of blocks and transactions"""
+    sizes = {}
+    for name in ('blocks', 'transactions'):
+        st = await db.command('collStats', name)
+        sizes[name] = {'size': st['size'], 'storage': st['storageSize'] + st['totalIndexSize']}
+    return sizes
+
+
+async def read_pages(args, lookup=False):
+    """Latency of reading one page of blocks with transactions at random positions"""
+    db = get_async_db()
+    latencies = []
+    for _ in range(args.reads):
+        after = random.randint(-1, max(0, args.blocks - args.page - 1))
+        start = time.perf_counter()
+        if lookup:
+            await db.blocks.aggregate([
+                {'$match': {'index': {'$gt': after}}},
+                {'$sort': {'index': 1}},
+                {'$limit': args.page},
+                {'$lookup': {'from': 'transactions', 'localField': 'tx_ids', 'foreignField': '_id',
+                             'as': 'transactions'}},
+                {'$project': {'transactions.signed_message': 0, 'transactions.block_id': 0}},
+            ]).to_list(length=args.page)
+        else:
+            await get_blocks_page(args.page, after)
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)
+
+
+async def run(layout, args):
+    # Database trống cho mỗi layout; init_mongodb tạo lại các index như backend
+    await init_mongodb(db_name=BENCH_DB)
+    await get_async_db().client.drop_database(BENCH_DB)
+    await close_mongodb()
+    await init_mongodb(db_name=BENCH_DB)
+    db = get_async_db()
+    try:
+        writes = sorted(await write_chain(layout, args))
+        sizes = await storage(db)
+        rows = {layout: (sizes, writes, await read_pages(args))}
+        if layout == 'reference':
+            rows['reference+$lookup'] = (sizes, writes, await read_pages(args, lookup=True))
+        return rows
+    finally:
+        await db.client.drop_database(BENCH_DB)
+        await close_mongodb()
+
+
+def mb(value):
+    return value / (1024 * 1024)
+
+
+async def main(args):
+    print(f"📦 {args.blocks:,} blocks x {args.txs} giao dịch mỗi layout, đọc {args.reads} trang {args.page} block")
+    rows = {}
+    for layout in ('embedded', 'reference'):
+        rows.update(await run(layout, args))
+    print(f"\n{'layout':<18s} | {'blocks MB':>9s} | {'tx MB':>7s} | {'tổng MB':>7s} | {'đĩa MB':>7s} | "
+          f"{'ghi p50':>7s} | {'ghi p95':>7s} | {'đọc p50':>7s} | {'đọc p95':>7s}")
+    print("-" * 102)
+    for name, (sizes, writes, reads) in rows.items():
+        total = sizes['blocks']['size'] + sizes['transactions']['size']
+        disk = sizes['blocks']['storage'] + sizes['transactions']['storage']
+        print(f"{name:<18s} | {mb(sizes['blocks']['size']):9.2f} | {mb(sizes['transactions']['size']):7.2f} | "
+              f"{mb(total):7.2f} | {mb(disk):7.2f} | {percentile(writes, 50) * 1000:7.2f} | "
+              f"{percentile(writes, 95) * 1000:7.2f} | {percentile(reads, 50) * 1000:7.2f} | "
+              f"{percentile(reads, 95) * 1000:7.2f}")
+    print("\n💡 Latency tính bằng ms; 'ghi' gồm insert giao dịch, insert block và cập nhật rollups như producer; "
+          "'đĩa' gồm cả index.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--blocks', type=int, default=2000, help="số block mỗi layout")
+    parser.add_argument('--txs', type=int, default=10, help="số giao dịch mỗi block")
+    parser.add_argument('--page', type=int, default=100, help="số block mỗi trang đọc")
+    parser.add_argument('--reads', type=int, default=200, help="số lần đọc trang")
+    asyncio.run(main(parser.parse_args()))
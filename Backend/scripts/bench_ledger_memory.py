@@ -0,0 +1,86 @@
+"""
+Đo bộ nhớ mỗi giao dịch của sổ cái trong bộ nhớ
+So sánh: dataclass có __dict__ (cách cũ), Transaction dùng __slots__, và BlockChain(compact=True)
+Chạy: python scripts/bench_ledger_memory.py [--size 1000000] [--block-size 1000]
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.blockchain import BlockChain  # noqa: E402
+from models.transaction import Transaction  # noqa: E402
+
+USERS = [f"user{i}" for i in range(1000)]
+CATEGORIES = ["Lương", "Thưởng", "Ăn uống", "Mua sắm", "Giải trí", "Đầu tư", "Tiết kiệm"]
+
+
+@dataclass
+class DictTransaction:
+    # Transaction trước khi có __slots__
+    id: int
+    owner: str
+    amount: int
+    category: str
+    note: str
+    timestamp: int
+    isIncome: bool
+
+
+def rows(size):
+    rnd = random.Random(42)
+    base = int(time.time()) - size
+    for i in range(size):
+        yield (i, rnd.choice(USERS), rnd.randint(1, 1000), rnd.choice(CATEGORIES), "", base + i, rnd.random() < 0.3)
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current
+
+
+def main(size, block_size):
+    def plain_list(cls):
+        return lambda: [cls(*r) for r in rows(size)]
+
+    def chain(compact):
+        def build():
+            c = BlockChain(compact=compact)
+            for i, r in enumerate(rows(size), 1):
+                c.add_transaction(Transaction(*r))
+                if i % block_size == 0:
+                    c.mine_block()
+            c.mine_block()
+            return c
+        return build
+
+    cases = [
+        ("list[dataclass có __dict__]", plain_list(DictTransaction)),
+        ("list[Transaction __slots__]", plain_list(Transaction)),
+        ("BlockChain()", chain(False)),
+        ("BlockChain(compact=True)", chain(True)),
+    ]
+    print(f"📦 {size:,} giao dịch, {block_size} giao dịch/block")
+    print("-" * 60)
+    for name, build in cases:
+        used = measure(build)
+        print(f"  {name:30s}: {used / 2**20:8.1f} MiB | {used / size:7.1f} B/giao dịch")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=1_000_000)
+    parser.add_argument('--block-size', type=int, default=1000)
+    args = parser.parse_args()
+    main(args.size, args.block_size)
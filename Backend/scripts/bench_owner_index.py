@@ -0,0 +1,74 @@
+"""
+Benchmark BlockChain.get_transactions_by_owner với OwnerIndex
+Thời gian tra cứu một owner không phụ thuộc độ dài chuỗi (so với quét toàn bộ)
+Chạy: python scripts/bench_owner_index.py [--sizes 10000,100000,1000000] [--block-size 1000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.blockchain import BlockChain  # noqa: E402
+from models.transaction import Transaction  # noqa: E402
+
+USERS = [f"user{i}" for i in range(1000)]
+CATEGORIES = ["Lương", "Thưởng", "Ăn uống", "Mua sắm", "Giải trí", "Đầu tư", "Tiết kiệm"]
+
+
+def build_chain(size, block_size):
+    chain = BlockChain()
+    base = int(time.time()) - size
+    for i in range(size):
+        # "target" có đúng 100 giao dịch, rải đều trên toàn chuỗi
+        owner = "Target" if i % max(1, size // 100) == 0 else random.choice(USERS)
+        chain.add_transaction(Transaction(
+            id=i, owner=owner, amount=random.randint(1, 1000), category=random.choice(CATEGORIES),
+            note="", timestamp=base + i, isIncome=random.random() < 0.3,
+        ))
+        if (i + 1) % block_size == 0:
+            chain.mine_block()
+    return chain
+
+
+def full_scan(chain, owner):
+    result = []
+    for b in chain.chain:
+        for t in b.transactions:
+            if t.owner.lower() == owner.lower():
+                result.append(t)
+    for t in chain.pending_transactions:
+        if t.owner.lower() == owner.lower():
+            result.append(t)
+    return result
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main(sizes, block_size):
+    print(f"{'tx':>10s} | {'index (µs)':>12s} | {'range (µs)':>12s} | {'totals (µs)':>12s} | {'full scan (µs)':>15s}")
+    print("-" * 74)
+    for size in sizes:
+        chain = build_chain(size, block_size)
+        assert chain.get_transactions_by_owner("target") == full_scan(chain, "target")
+        mid = int(time.time()) - size // 2
+        indexed = timed(lambda: chain.get_transactions_by_owner("target"), 1000)
+        ranged = timed(lambda: chain.get_transactions_by_owner_between("target", mid, mid + size // 4), 1000)
+        totals = timed(lambda: chain.get_owner_totals("target"), 1000)
+        scan = timed(lambda: full_scan(chain, "target"), 3)
+        print(f"{size:>10d} | {indexed:>12.1f} | {ranged:>12.1f} | {totals:>12.2f} | {scan:>15.0f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--block-size', type=int, default=1000)
+    args = parser.parse_args()
+    main([int(s) for s in args.sizes.split(',')], args.block_size)
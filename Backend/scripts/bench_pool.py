@@ -0,0 +1,194 @@
+"""
+Benchmark kích thước connection pool của Motor dưới tải song song
+Mỗi maxPoolSize chạy cùng một tải (đọc trang giao dịch, đọc theo _id, ghi giao dịch) với N coroutine song song,
+đo req/s, p50/p95/p99, số connection đã mở và thời gian chờ lấy connection từ pool.
+Tuỳ chọn khác (nén, timeout, write concern) lấy từ biến môi trường MONGO_* như backend.
+Chạy: python scripts/bench_pool.py [--pool-sizes 1,5,10,25,50,100] [--concurrency 200] [--ops 5000]
+Dùng database riêng MONGO_DB_NAME + "_bench" (bị xóa sau khi chạy).
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.database import MONGO_DB_NAME, MONGO_URI, client_options  # noqa: E402
+
+BENCH_DB = MONGO_DB_NAME + '_bench'
+ACCOUNTS = [f'user{i}' for i in range(200)]
+
+
+class PoolWatcher(monitoring.ConnectionPoolListener):
+    """Connections opened / checked out at once, and checkout wait"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        self.opened = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.waits = []
+
+    def connection_created(self, event):
+        with self.lock:
+            self.opened += 1
+
+    def connection_check_out_started(self, event):
+        self.local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        wait = time.perf_counter() - getattr(self.local, 'started', time.perf_counter())
+        with self.lock:
+            self.waits.append(wait)
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def connection_checked_in(self, event):
+        with self.lock:
+            self.in_use -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def random_tx(now):
+    sender, recipient = random.sample(ACCOUNTS, 2)
+    return {
+        'sender': sender, 'recipient': recipient, 'amount': round(random.uniform(1, 500), 2),
+        'created_at': now - timedelta(seconds=random.randint(0, 86400 * 30)), 'mined': True,
+    }
+
+
+async def prepare(db, count):
+    await db.transactions.drop()
+    await db.transactions.create_index([('created_at', -1), ('_id', -1)])
+    await db.transactions.create_index([('sender', 1), ('created_at', -1)])
+    now = datetime.utcnow()
+    for start in range(0, count, 5000):
+        await db.transactions.insert_many([random_tx(now) for _ in range(min(5000, count - start))])
+
+
+async def read_page(db, ids):
+    await db.transactions.find({'sender': random.choice(ACCOUNTS)}).sort('created_at', -1).limit(100).to_list(100)
+
+
+async def read_one(db, ids):
+    await db.transactions.find_one({'_id': random.choice(ids)})
+
+
+async def write_one(db, ids):
+    await db.transactions.insert_one(random_tx(datetime.utcnow()))
+
+
+def parse_mix(spec):
+    operations = {'page': read_page, 'get': read_one, 'insert': write_one}
+    weighted = []
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        weighted.extend([operations[name.strip()]] * int(weight or 1))
+    return weighted
+
+
+async def run(pool_size, args, mix):
+    watcher = PoolWatcher()
+    client = AsyncIOMotorClient(MONGO_URI, event_listeners=[watcher], **client_options(maxPoolSize=pool_size))
+    db = client[BENCH_DB]
+    try:
+        ids = [doc['_id'] async for doc in db.transactions.find({}, {'_id': 1}).limit(2000)]
+        # Khởi động: mở connection đầu tiên ngoài phần đo
+        await db.command('ping')
+        watcher.reset()
+        latencies = []
+        remaining = args.ops
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                op = random.choice(mix)
+                t = time.perf_counter()
+                await op(db, ids)
+                latencies.append(time.perf_counter() - t)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+        elapsed = time.perf_counter() - start
+    finally:
+        client.close()
+    latencies.sort()
+    waits = sorted(watcher.waits)
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(latencies, 50) * 1000,
+        'p95': percentile(latencies, 95) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'opened': watcher.opened,
+        'peak': watcher.peak_in_use,
+        'wait_p95': percentile(waits, 95) * 1000,
+    }
+
+
+async def main(args):
+    pool_sizes = [int(n) for n in args.pool_sizes.split(',')]
+    mix = parse_mix(args.mix)
+    setup = AsyncIOMotorClient(MONGO_URI, **client_options())
+    try:
+        print(f"📦 Chuẩn bị {args.docs:,} giao dịch trong {BENCH_DB}...")
+        await prepare(setup[BENCH_DB], args.docs)
+        print(f"🔧 {args.concurrency} coroutine song song, {args.ops:,} thao tác/lần, mix {args.mix}")
+        print(f"\n{'maxPoolSize':>11s} | {'req/s':>8s} | {'p50 ms':>7s} | {'p95 ms':>7s} | {'p99 ms':>7s} | "
+              f"{'conn mở':>7s} | {'đỉnh':>5s} | {'chờ p95':>7s}")
+        print("-" * 82)
+        for size in pool_sizes:
+            r = await run(size, args, mix)
+            print(f"{size:>11d} | {r['rps']:8.0f} | {r['p50']:7.2f} | {r['p95']:7.2f} | {r['p99']:7.2f} | "
+                  f"{r['opened']:>7d} | {r['peak']:>5d} | {r['wait_p95']:7.2f}")
+    finally:
+        await setup.drop_database(BENCH_DB)
+        setup.close()
+    print("\n💡 'chờ p95' là thời gian chờ lấy connection từ pool; tăng maxPoolSize khi cột này chiếm phần lớn p95.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pool-sizes', default='1,5,10,25,50,100')
+    parser.add_argument('--concurrency', type=int, default=200, help="số coroutine gửi request song song")
+    parser.add_argument('--ops', type=int, default=5000, help="số thao tác mỗi kích thước pool")
+    parser.add_argument('--docs', type=int, default=50000, help="số giao dịch nạp sẵn")
+    parser.add_argument('--mix', default='page=6,get=3,insert=1', help="tỉ lệ thao tác: page, get, insert")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,108 @@
+"""
+Benchmark serialize response chain: to_serializable + json.dumps (cách cũ) so với src.encoder.dumps
+Đo thêm: decode BSON có / không có signed_message (tác dụng của projection)
+Chạy: python scripts/bench_serialization.py [--blocks 10000] [--txs 1] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import bson
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.database import to_serializable  # noqa: E402
+from src.storage.mongo import BLOCK_LIST_PROJECTION  # noqa: E402
+from src.encoder import FastJSONResponse, dumps, orjson  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+USERS = ["Alice", "Bob", "Carol", "Dave", "Eve", "Frank", "Grace", "Henry"]
+
+
+def make_blocks(count, txs_per_block):
+    start = datetime.utcnow() - timedelta(days=30)
+    blocks = []
+    for i in range(count):
+        block_id = ObjectId()
+        txs = []
+        for _ in range(txs_per_block):
+            sender, recipient = random.sample(USERS, 2)
+            txs.append({
+                "_id": ObjectId(),
+                "sender": sender,
+                "recipient": recipient,
+                "amount": round(random.uniform(1, 1000), 2),
+                "mined": True,
+                "signer": "0x" + os.urandom(20).hex(),
+                "signature": "0x" + os.urandom(65).hex(),
+                # Chuỗi message ký bằng ví, dài hơn hẳn các trường còn lại
+                "signed_message": f"FinanceChain transfer {sender} -> {recipient} nonce={os.urandom(32).hex()} " * 4,
+                "created_at": start + timedelta(minutes=i),
+            })
+        blocks.append({
+            "_id": block_id,
+            "index": i,
+            "timestamp": start.timestamp() + i * 60,
+            "transactions": txs,
+            "label": f"{txs[0]['sender']} → {txs[0]['recipient']} (Block #{i})",
+            "previous_hash": os.urandom(32).hex(),
+            "hash": os.urandom(32).hex(),
+            "created_at": start + timedelta(minutes=i),
+        })
+    return blocks
+
+
+def strip_projection(block):
+    # Mô phỏng BLOCK_LIST_PROJECTION ({'transactions.signed_message': 0}) phía server
+    out = dict(block)
+    out["transactions"] = [{k: v for k, v in tx.items() if k != "signed_message"} for tx in block["transactions"]]
+    return out
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(count, txs_per_block, repeat):
+    print(f"🔧 Encoder: {'orjson ' + orjson.__version__ if orjson else 'json (stdlib)'}, projection {BLOCK_LIST_PROJECTION}")
+    blocks = make_blocks(count, txs_per_block)
+    payload = {"current": [], "chain": blocks, "next_cursor": None}
+
+    old_body = JSONResponse({**payload, "chain": [to_serializable(b) for b in blocks]}).body
+    new_body = FastJSONResponse(payload).body
+    same = old_body == new_body
+    print(f"📦 {count} block x {txs_per_block} tx, response {len(new_body) / 1024 / 1024:.1f} MB, output giống nhau: {'✅' if same else '❌'}")
+
+    old_ms = timed(lambda: JSONResponse({**payload, "chain": [to_serializable(b) for b in blocks]}), repeat)
+    new_ms = timed(lambda: dumps(payload), repeat)
+    print(f"   to_serializable + json.dumps : {old_ms:8.1f} ms")
+    print(f"   encoder.dumps                : {new_ms:8.1f} ms  (x{old_ms / new_ms:.1f})")
+
+    projected = [strip_projection(b) for b in blocks]
+    raw_full = [bson.encode(b) for b in blocks]
+    raw_projected = [bson.encode(b) for b in projected]
+    full_ms = timed(lambda: [bson.decode(r) for r in raw_full], repeat)
+    proj_ms = timed(lambda: [bson.decode(r) for r in raw_projected], repeat)
+    print(f"🔍 Decode BSON đầy đủ            : {full_ms:8.1f} ms, {sum(map(len, raw_full)) / 1024 / 1024:.1f} MB")
+    print(f"   Decode có projection          : {proj_ms:8.1f} ms, {sum(map(len, raw_projected)) / 1024 / 1024:.1f} MB")
+    end_old = full_ms + old_ms
+    end_new = proj_ms + timed(lambda: dumps({**payload, "chain": projected}), repeat)
+    print(f"⏱️  Tổng decode + encode: {end_old:.1f} ms -> {end_new:.1f} ms (x{end_old / end_new:.1f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=10000)
+    parser.add_argument("--txs", type=int, default=1, help="giao dịch mỗi block")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.blocks, args.txs, args.repeat)
@@ -0,0 +1,164 @@
+"""
+Benchmark các engine lưu trữ (STORAGE_ENGINE): mongo và sqlite (WAL)
+Ghi chuỗi block như producer (save_transactions + save_block, theo BLOCK_LAYOUT) rồi đo latency ghi mỗi block,
+đọc trang block / giao dịch và quét toàn chuỗi. Kịch bản conformance giữa các engine nằm ở tests/test_storage.py.
+Engine mongo dùng database riêng MONGO_DB_NAME + "_storage" (bị xóa sau khi chạy) hoặc `--mongo mock`
+(mongomock-motor, không cần mongod); sqlite dùng file tạm.
+Chạy:
+  python scripts/bench_storage.py                                  # cả hai engine, mongod theo MONGO_URI
+  python scripts/bench_storage.py --mongo mock --blocks 2000 --txs 10
+  python scripts/bench_storage.py --engines sqlite --synchronous FULL
+  BLOCK_LAYOUT=reference python scripts/bench_storage.py --mongo mock
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import database  # noqa: E402
+from src.chain import GENESIS_PREVIOUS_HASH, attach_transactions, compute_block_hash  # noqa: E402
+from src.storage import ENGINES  # noqa: E402
+
+BENCH_DB = database.MONGO_DB_NAME + '_storage'
+USERS = [f'user{i}' for i in range(200)]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+# Benchmark: ghi như producer rồi đọc như API
+
+def make_transactions(count):
+    txs = []
+    for _ in range(count):
+        sender, recipient = random.sample(USERS, 2)
+        txs.append({
+            'sender': sender,
+            'recipient': recipient,
+            'amount': round(random.uniform(1, 1000), 2),
+            'mined': True,
+            'wallet_address': '0x' + os.urandom(20).hex(),
+            'signature': '0x' + os.urandom(65).hex(),
+            'signed_message': f'FinanceChain transfer {sender} -> {recipient} nonce={os.urandom(16).hex()}',
+        })
+    return txs
+
+
+async def bench(args):
+    """Latencies of block writes and reads through the src.database facade"""
+    writes = []
+    prev_hash = GENESIS_PREVIOUS_HASH
+    for _ in range(args.blocks):
+        block_id = ObjectId()
+        txs = make_transactions(args.txs)
+        for tx in txs:
+            tx['block_id'] = str(block_id)
+        start = time.perf_counter()
+        await database.save_transactions(txs)
+        block = attach_transactions({'_id': block_id}, txs, database.BLOCK_LAYOUT)
+        index = len(writes)
+        block.update({'index': index, 'timestamp': time.time(), 'label': f'{len(txs)} giao dịch (Block #{index})',
+                      'previous_hash': prev_hash})
+        block['hash'] = prev_hash = compute_block_hash(block)
+        await database.save_block(block, None if 'transactions' in block else txs)
+        writes.append(time.perf_counter() - start)
+
+    block_reads, tx_reads = [], []
+    for _ in range(args.reads):
+        after = random.randint(-1, max(0, args.blocks - args.page - 1))
+        start = time.perf_counter()
+        await database.get_blocks_page(args.page, after)
+        block_reads.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        await database.get_transactions_page(args.page, None, {'sender': random.choice(USERS)})
+        tx_reads.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await database.compute_rollups()
+    scan = time.perf_counter() - start
+    return {'write': sorted(writes), 'blocks_page': sorted(block_reads), 'tx_page': sorted(tx_reads), 'scan': scan}
+
+
+async def open_engine(engine, args, workdir):
+    if engine == 'sqlite':
+        database.SQLITE_SYNCHRONOUS = args.synchronous
+        return await database.init_storage('sqlite', sqlite_path=os.path.join(workdir, 'bench.db'))
+    # Database trống mỗi lần chạy; init_mongodb tạo lại các index như backend
+    await database.init_storage('mongo', db_name=BENCH_DB)
+    await database.get_async_db().client.drop_database(BENCH_DB)
+    await database.close_storage()
+    return await database.init_storage('mongo', db_name=BENCH_DB)
+
+
+async def close_engine(engine):
+    if engine == 'mongo':
+        await database.get_async_db().client.drop_database(BENCH_DB)
+    await database.close_storage()
+
+
+async def run(engine, args):
+    workdir = tempfile.mkdtemp(prefix='bench_storage_')
+    try:
+        await open_engine(engine, args, workdir)
+        try:
+            return await bench(args)
+        finally:
+            await close_engine(engine)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def ms(value):
+    return value * 1000
+
+
+async def main(args):
+    if args.mongo == 'mock' and 'mongo' in args.engines:
+        try:
+            import mongomock
+            import mongomock_motor
+        except ImportError:
+            sys.exit("❌ --mongo mock cần: pip install mongomock-motor")
+        shared = mongomock.MongoClient()
+        database.AsyncIOMotorClient = lambda *a, **k: mongomock_motor.AsyncMongoMockClient(mock_mongo_client=shared)
+
+    print(f"🔧 Engine: {', '.join(args.engines)}, layout {database.BLOCK_LAYOUT}, sqlite synchronous={args.synchronous}")
+    timings = {}
+    for engine in args.engines:
+        timings[engine] = await run(engine, args)
+        print(f"✅ {engine}: xong")
+
+    print(f"\n📦 {args.blocks:,} blocks x {args.txs} giao dịch, đọc {args.reads} trang {args.page} dòng")
+    print(f"{'engine':<8s} | {'ghi p50':>8s} | {'ghi p99':>8s} | {'block/s':>8s} | "
+          f"{'trang block p50':>15s} | {'trang tx p50':>12s} | {'quét chuỗi':>10s}")
+    print('-' * 89)
+    for engine, t in timings.items():
+        print(f"{engine:<8s} | {ms(percentile(t['write'], 50)):6.2f}ms | {ms(percentile(t['write'], 99)):6.2f}ms | "
+              f"{len(t['write']) / sum(t['write']):8.0f} | {ms(percentile(t['blocks_page'], 50)):13.2f}ms | "
+              f"{ms(percentile(t['tx_page'], 50)):10.2f}ms | {t['scan']:9.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES))
+    parser.add_argument('--mongo', choices=('real', 'mock'), default='real',
+                        help="mock: mongomock-motor trong process thay cho mongod")
+    parser.add_argument('--synchronous', choices=('NORMAL', 'FULL'), default=database.SQLITE_SYNCHRONOUS,
+                        help="PRAGMA synchronous của sqlite (FULL: fsync mỗi lần commit)")
+    parser.add_argument('--blocks', type=int, default=1000)
+    parser.add_argument('--txs', type=int, default=10)
+    parser.add_argument('--page', type=int, default=50)
+    parser.add_argument('--reads', type=int, default=200)
+    sys.exit(asyncio.run(main(parser.parse_args())))
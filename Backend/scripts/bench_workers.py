@@ -0,0 +1,129 @@
+"""
+Benchmark throughput của API với 1 và N worker process (uvicorn --workers)
+Mỗi cấu hình khởi động uvicorn trên một cổng riêng (WEB_CONCURRENCY=N: seed dưới lock, cache đồng bộ qua MongoDB),
+chờ /api/health rồi chạy scripts/loadtest.py --url với cùng tải, in bảng req/s và p50/p95/p99 theo số worker.
+Cần mongod theo MONGO_URI; dùng database riêng MONGO_DB_NAME + "_workers" (bị xóa sau khi chạy).
+Chạy:
+  python scripts/bench_workers.py                        # 1 và số CPU worker
+  python scripts/bench_workers.py --workers 1,2,4 -n 5000 -c 100 --load-procs 4
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(SCRIPTS_DIR)
+
+load_dotenv()
+
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
+BENCH_DB = os.getenv('MONGO_DB_NAME', 'financechain') + '_workers'
+
+
+def wait_healthy(url, server, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn thoát với mã {server.returncode}")
+        try:
+            with urllib.request.urlopen(url + '/api/health', timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.3)
+    raise RuntimeError(f"API không sẵn sàng sau {timeout}s")
+
+
+def run_load(url, args, tmpdir, workers):
+    """Run `--load-procs` loadtest processes in parallel; returns their per-scenario results"""
+    procs = []
+    for i in range(args.load_procs):
+        out = os.path.join(tmpdir, f'w{workers}-{i}.json')
+        cmd = [sys.executable, os.path.join(SCRIPTS_DIR, 'loadtest.py'), '--url', url,
+               '--scenarios', args.scenarios, '-n', str(max(1, args.requests // args.load_procs)),
+               '-c', str(args.concurrency), '--seed', str(42 + i), '--out', out]
+        procs.append((subprocess.Popen(cmd, cwd=BACKEND_DIR, stdout=subprocess.DEVNULL), out))
+    results = []
+    for proc, out in procs:
+        proc.wait()
+        with open(out, encoding='utf-8') as f:
+            results.append(json.load(f)['scenarios'])
+    return results
+
+
+def merge(results, scenario):
+    """Sum throughput over load processes; percentiles are the worst process's"""
+    parts = [r[scenario] for r in results]
+    return {
+        'rps': sum(p['throughput_rps'] or 0 for p in parts),
+        'p50': max(p['latency_ms']['p50'] or 0 for p in parts),
+        'p95': max(p['latency_ms']['p95'] or 0 for p in parts),
+        'p99': max(p['latency_ms']['p99'] or 0 for p in parts),
+        'errors': sum(p['errors'] for p in parts),
+    }
+
+
+def main(args):
+    counts = [int(n) for n in args.workers.split(',')]
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    mongo = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    rows = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for i, workers in enumerate(counts):
+                mongo.drop_database(BENCH_DB)
+                port = args.port + i
+                url = f'http://127.0.0.1:{port}'
+                env = dict(os.environ, MONGO_DB_NAME=BENCH_DB, WEB_CONCURRENCY=str(workers),
+                           LOG_REQUESTS='0', SEED_SAMPLE='1')
+                server = subprocess.Popen(
+                    [sys.executable, '-m', 'uvicorn', 'src.main:app', '--host', '127.0.0.1', '--port', str(port),
+                     '--workers', str(workers), '--no-access-log', '--log-level', 'warning'],
+                    cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+                )
+                try:
+                    wait_healthy(url, server)
+                    print(f"🚀 {workers} worker: {', '.join(scenarios)} — {args.requests} request/kịch bản, "
+                          f"{args.load_procs} tiến trình tải x concurrency {args.concurrency}", flush=True)
+                    results = run_load(url, args, tmpdir, workers)
+                    rows[workers] = {s: merge(results, s) for s in scenarios}
+                finally:
+                    server.terminate()
+                    server.wait(timeout=30)
+    finally:
+        mongo.drop_database(BENCH_DB)
+        mongo.close()
+
+    base = rows.get(counts[0], {})
+    print(f"\n{'kịch bản':<13s} | {'worker':>6s} | {'req/s':>8s} | {'x lần':>6s} | {'p50 ms':>8s} | "
+          f"{'p95 ms':>8s} | {'p99 ms':>8s} | {'lỗi':>5s}")
+    print("-" * 82)
+    for scenario in scenarios:
+        for workers in counts:
+            r = rows[workers][scenario]
+            ref = base.get(scenario, {}).get('rps')
+            speedup = f"{r['rps'] / ref:.2f}" if ref else '-'
+            print(f"{scenario:<13s} | {workers:>6d} | {r['rps']:8.1f} | {speedup:>6s} | {r['p50']:8.2f} | "
+                  f"{r['p95']:8.2f} | {r['p99']:8.2f} | {r['errors']:>5d}")
+    print("\n💡 p50/p95/p99 lấy giá trị lớn nhất giữa các tiến trình tải; tăng --load-procs nếu máy tải là nút thắt.")
+    return 1 if any(r['errors'] for row in rows.values() for r in row.values()) else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default=f"1,{os.cpu_count() or 2}", help="danh sách số worker cần so sánh")
+    parser.add_argument('--scenarios', default='post_tx,get_tx')
+    parser.add_argument('-n', '--requests', type=int, default=2000, help="số request mỗi kịch bản (tổng)")
+    parser.add_argument('-c', '--concurrency', type=int, default=50, help="concurrency mỗi tiến trình tải")
+    parser.add_argument('--load-procs', type=int, default=2, help="số tiến trình loadtest chạy song song")
+    parser.add_argument('--port', type=int, default=5100, help="cổng đầu tiên (mỗi cấu hình một cổng)")
+    sys.exit(main(parser.parse_args()))
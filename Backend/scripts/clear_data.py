@@ -22,6 +22,14 @@ if confirm.lower() == 'yes':
     # Xóa blocks
     block_result = db.blocks.delete_many({})
     print(f"✓ Đã xóa {block_result.deleted_count} blocks")
+
+    # Số dư và thống kê theo ngày tổng hợp từ các block đã bị xoá
+    for name in ('balances', 'rollups'):
+        db[name].delete_many({})
+    # Checkpoint kiểm tra chuỗi (validate_incremental) trỏ tới block đã bị xoá
+    db.chain_state.delete_many({})
+    # Checkpoint nạp dữ liệu (scripts/import_data.py) không còn đúng khi chuỗi đã bị xoá
+    db.ingest_state.delete_many({})
     
     print("\n✅ Đã xóa toàn bộ dữ liệu!")
     print("💡 Chạy create_sample_data.py để tạo dữ liệu mới")
@@ -1,85 +1,90 @@
 """
 Script để tạo dữ liệu mẫu trong MongoDB cho FinanceChain
-Chạy: python scripts/create_sample_data.py
+Ghi qua pipeline nạp hàng loạt (src/ingest.py) nên tạo được cả chuỗi lớn, ví dụ 10 triệu giao dịch
+Chạy: python scripts/create_sample_data.py [--count 20] [--block-size 5]
 """
 
-from pymongo import MongoClient
-from datetime import datetime, timedelta
+import argparse
+import asyncio
+import os
 import random
-import time
-
-# Kết nối MongoDB
-MONGO_URI = "mongodb://localhost:27017"
-DB_NAME = "financechain"
-
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
+import sys
+from datetime import datetime, timedelta
 
-# Xóa dữ liệu cũ (nếu muốn bắt đầu lại)
-print("🗑️  Xóa dữ liệu cũ...")
-db.transactions.delete_many({})
-db.blocks.delete_many({})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.database import close_mongodb, get_async_db, init_mongodb  # noqa: E402
+from src.ingest import INGEST_BATCH_BLOCKS, ingest_records  # noqa: E402
 
 # Danh sách tên để tạo giao dịch
 users = ["Alice", "Bob", "Carol", "Dave", "Eve", "Frank", "Grace", "Henry"]
 categories = ["Lương", "Thưởng", "Ăn uống", "Mua sắm", "Giải trí", "Đầu tư", "Tiết kiệm"]
 
-print("\n💰 Tạo giao dịch mẫu...")
-
-# Tạo 20 giao dịch ngẫu nhiên
-transactions = []
-for i in range(20):
-    sender = random.choice(users)
-    recipient = random.choice([u for u in users if u != sender])
-    amount = round(random.uniform(10, 1000), 2)
-    
-    tx = {
-        "sender": sender,
-        "recipient": recipient,
-        "amount": amount,
-        "mined": True,
-        "created_at": datetime.utcnow() - timedelta(days=random.randint(0, 30))
-    }
-    transactions.append(tx)
-    print(f"  ✓ {sender} → {recipient}: ${amount}")
-
-# Insert transactions
-result = db.transactions.insert_many(transactions)
-print(f"\n✅ Đã tạo {len(result.inserted_ids)} giao dịch")
-
-# Tạo blocks (nhóm giao dịch thành blocks)
-print("\n🔗 Tạo blocks...")
-block_size = 5  # Mỗi block chứa 5 giao dịch
-
-for i in range(0, len(transactions), block_size):
-    block_txs = transactions[i:i+block_size]
-    block = {
-        "index": i // block_size,
-        "timestamp": time.time() - (len(transactions) - i) * 3600,
-        "transactions": block_txs,
-        "created_at": datetime.utcnow() - timedelta(hours=len(transactions) - i)
-    }
-    db.blocks.insert_one(block)
-    print(f"  ✓ Block #{block['index']}: {len(block_txs)} giao dịch")
-
-print(f"\n✅ Đã tạo {(len(transactions) + block_size - 1) // block_size} blocks")
-
-# Thống kê
-print("\n📊 Thống kê:")
-print(f"  • Tổng giao dịch: {db.transactions.count_documents({})}")
-print(f"  • Tổng blocks: {db.blocks.count_documents({})}")
-print(f"  • Tổng số tiền: ${sum(tx['amount'] for tx in transactions):.2f}")
-
-# Top người gửi nhiều nhất
-print("\n🏆 Top người gửi:")
-pipeline = [
-    {"$group": {"_id": "$sender", "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
-    {"$sort": {"total": -1}},
-    {"$limit": 5}
-]
-for doc in db.transactions.aggregate(pipeline):
-    print(f"  • {doc['_id']}: ${doc['total']:.2f} ({doc['count']} giao dịch)")
-
-print("\n✨ Hoàn tất! Khởi động Backend để xem dữ liệu.")
-print("   Frontend: http://127.0.0.1:5173")
-print("   Backend API: http://127.0.0.1:5000/api/transactions")
+SHOW_LIMIT = 20
+
+
+def sample_records(count, show=SHOW_LIMIT):
+    """Sinh giao dịch ngẫu nhiên theo thứ tự thời gian trong 30 ngày gần nhất (không giữ cả list trong RAM)"""
+    start = datetime.utcnow() - timedelta(days=30)
+    step = timedelta(days=30) / max(count, 1)
+    for i in range(count):
+        sender = random.choice(users)
+        recipient = random.choice([u for u in users if u != sender])
+        amount = round(random.uniform(10, 1000), 2)
+        if i < show:
+            print(f"  ✓ {sender} → {recipient}: ${amount}")
+        elif i == show and show:
+            print("  ...")
+        yield {"sender": sender, "recipient": recipient, "amount": amount, "created_at": start + step * i}
+
+
+def report(stats):
+    rate = stats['transactions'] / stats['elapsed'] if stats['elapsed'] else 0
+    print(f"  ⏳ {stats['transactions']:,} giao dịch, {stats['blocks']:,} blocks ({rate:,.0f} tx/s)", flush=True)
+
+
+async def main(count, block_size):
+    await init_mongodb()
+    db = get_async_db()
+    try:
+        # Xóa dữ liệu cũ (nếu muốn bắt đầu lại)
+        print("🗑️  Xóa dữ liệu cũ...")
+        for name in ('transactions', 'blocks', 'chain_state', 'ingest_state'):
+            await db[name].delete_many({})
+
+        print(f"\n💰 Tạo {count:,} giao dịch mẫu, {block_size} giao dịch mỗi block...")
+        stats = await ingest_records(
+            sample_records(count), block_size=block_size, batch_blocks=max(INGEST_BATCH_BLOCKS, 10000 // block_size),
+            progress=report if count > 100000 else None,
+        )
+        print(f"\n✅ Đã tạo {stats['transactions']:,} giao dịch trong {stats['blocks']:,} blocks ({stats['elapsed']:.1f}s)")
+
+        # Thống kê
+        print("\n📊 Thống kê:")
+        print(f"  • Tổng giao dịch: {await db.transactions.estimated_document_count():,}")
+        print(f"  • Tổng blocks: {await db.blocks.estimated_document_count():,}")
+        totals = await db.transactions.aggregate([{"$group": {"_id": None, "total": {"$sum": "$amount"}}}]).to_list(1)
+        print(f"  • Tổng số tiền: ${totals[0]['total'] if totals else 0:.2f}")
+
+        # Top người gửi nhiều nhất
+        print("\n🏆 Top người gửi:")
+        pipeline = [
+            {"$group": {"_id": "$sender", "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+            {"$sort": {"total": -1}},
+            {"$limit": 5}
+        ]
+        async for doc in db.transactions.aggregate(pipeline):
+            print(f"  • {doc['_id']}: ${doc['total']:.2f} ({doc['count']} giao dịch)")
+    finally:
+        await close_mongodb()
+
+    print("\n✨ Hoàn tất! Khởi động Backend để xem dữ liệu.")
+    print("   Frontend: http://127.0.0.1:5173")
+    print("   Backend API: http://127.0.0.1:5000/api/transactions")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20, help="số giao dịch")
+    parser.add_argument("--block-size", type=int, default=5, help="giao dịch mỗi block")
+    args = parser.parse_args()
+    asyncio.run(main(args.count, args.block_size))
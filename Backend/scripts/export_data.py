@@ -0,0 +1,58 @@
+"""
+Xuất blocks / transactions ra file NDJSON (backup, kiểm toán), đọc theo lô nên bộ nhớ không đổi
+Chạy:
+  python scripts/export_data.py blocks backup/blocks.ndjson.gz          # .gz -> nén gzip
+  python scripts/export_data.py transactions tx.ndjson [--batch-size 5000]
+  python scripts/export_data.py blocks blocks.ndjson --after-index 1000  # chỉ block mới
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.database import close_storage, init_storage  # noqa: E402
+from src.export import EXPORT_BATCH_SIZE, EXPORT_COLLECTIONS, gzip_chunks, iter_ndjson  # noqa: E402
+
+
+async def main(args):
+    await init_storage()
+    filters = {}
+    if args.after_index is not None:
+        if args.collection != 'blocks':
+            print("❌ --after-index chỉ dùng cho blocks")
+            return 2
+        filters = {'after_index': args.after_index}
+
+    chunks = iter_ndjson(args.collection, filters, args.batch_size)
+    if args.output.endswith('.gz'):
+        chunks = gzip_chunks(chunks)
+
+    start = time.perf_counter()
+    written = 0
+    tmp_path = args.output + '.part'
+    try:
+        with open(tmp_path, 'wb') as f:
+            async for chunk in chunks:
+                f.write(chunk)
+                written += len(chunk)
+        # Chỉ thay file đích khi đã xuất xong
+        os.replace(tmp_path, args.output)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        await close_storage()
+    elapsed = time.perf_counter() - start
+    print(f"✅ Đã xuất {args.collection} -> {args.output} ({written / 1024 / 1024:.1f} MB, {elapsed:.1f}s)")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('collection', choices=EXPORT_COLLECTIONS)
+    parser.add_argument('output', help="đường dẫn file; đuôi .gz để nén")
+    parser.add_argument('--batch-size', type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument('--after-index', type=int, default=None)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,59 @@
+"""
+Nạp giao dịch hàng loạt từ file JSON / NDJSON / CSV (có thể .gz) vào chuỗi block
+Đọc dần file, gom thành block, ghi theo lô insert_many; dừng giữa chừng thì chạy lại để nạp tiếp.
+Chạy được khi backend đang chạy: mỗi lô nối vào đỉnh chuỗi dưới lock 'chain' chung với block producer.
+Chạy:
+  python scripts/import_data.py data/transactions.ndjson.gz
+  python scripts/import_data.py legacy.json --block-size 500 --batch-blocks 50
+  python scripts/import_data.py export.csv --format csv --no-resume
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.database import close_storage, init_storage  # noqa: E402
+from src.ingest import FORMATS, INGEST_BATCH_BLOCKS, INGEST_BLOCK_SIZE, ingest_file  # noqa: E402
+
+
+def report(stats):
+    rate = stats['transactions'] / stats['elapsed'] if stats['elapsed'] else 0
+    print(f"  ⏳ {stats['records']:>12,} bản ghi | {stats['transactions']:>12,} giao dịch | "
+          f"{stats['blocks']:>9,} blocks | {rate:>9,.0f} tx/s", flush=True)
+
+
+async def main(args):
+    await init_storage()
+    try:
+        print(f"📥 Nạp {args.path}")
+        stats = await ingest_file(
+            args.path, fmt=args.format, resume=not args.no_resume,
+            block_size=args.block_size, batch_blocks=args.batch_blocks,
+            rollups=not args.skip_rollups, verify_signatures=not args.skip_signatures, progress=report,
+        )
+    finally:
+        await close_storage()
+    if stats.get('skipped_run'):
+        print("✅ File này đã được nạp xong trước đó (dùng --no-resume để nạp lại)")
+        return 0
+    rate = stats['transactions'] / stats['elapsed'] if stats['elapsed'] else 0
+    print(f"✅ {stats['transactions']:,} giao dịch trong {stats['blocks']:,} blocks, "
+          f"{stats['elapsed']:.1f}s ({rate:,.0f} tx/s)" + (" — nạp tiếp từ checkpoint" if stats['resumed'] else ""))
+    if stats['invalid']:
+        print(f"⚠️  Bỏ qua {stats['invalid']:,} bản ghi thiếu sender/recipient/owner, amount hoặc sai chữ ký")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=FORMATS, default=None, help="mặc định đoán theo đuôi file")
+    parser.add_argument('--block-size', type=int, default=INGEST_BLOCK_SIZE, help="giao dịch mỗi block")
+    parser.add_argument('--batch-blocks', type=int, default=INGEST_BATCH_BLOCKS, help="blocks mỗi lần insert_many")
+    parser.add_argument('--no-resume', action='store_true', help="không dùng / ghi checkpoint")
+    parser.add_argument('--skip-rollups', action='store_true',
+                        help="không tính lại balances/rollups (chạy scripts/rollups.py rebuild sau)")
+    parser.add_argument('--skip-signatures', action='store_true', help="không kiểm tra chữ ký ví của bản ghi")
+    sys.exit(asyncio.run(main(parser.parse_args())))
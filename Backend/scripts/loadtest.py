@@ -0,0 +1,358 @@
+"""
+Load test / benchmark end-to-end cho API: POST /api/transactions, POST /api/transactions/batch,
+POST /api/payments, GET /api/transactions và POST /api/payments/{id}/confirm
+Mỗi kịch bản chạy thành một pha riêng; báo throughput (request/s và giao dịch/s), latency p50/p95/p99 và số lệnh
+MongoDB (round-trip) trung bình mỗi request, lưu kết quả JSON để so sánh giữa các lần chạy.
+App chạy trong process dùng database riêng MONGO_DB_NAME + "_loadtest" (sqlite: file tạm), bị xóa sau khi chạy.
+Cần httpx (pip install httpx); --mongo mock cần thêm mongomock-motor.
+Chạy:
+  python scripts/loadtest.py                                  # app chạy trong process, mongod theo MONGO_URI
+  python scripts/loadtest.py --mongo mock --ledger 5000       # mongomock-motor, không cần mongod
+  python scripts/loadtest.py --url http://127.0.0.1:5000 -c 50 -n 2000
+  python scripts/loadtest.py --scenarios post_tx,post_batch --wait -n 20 --batch-rows 1000   # so sánh giao dịch/s
+  python scripts/loadtest.py --compare bench_results/loadtest-20260101-120000.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+from pymongo import MongoClient, monitoring
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(SCRIPTS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+# src.database đọc MONGO_DB_NAME / SQLITE_PATH lúc import (create_sample_data import nó):
+# đặt trước để app trong process không ghi vào database đang dùng
+LOADTEST_DB = os.getenv('MONGO_DB_NAME', 'financechain') + '_loadtest'
+LOADTEST_SQLITE = os.path.join(tempfile.gettempdir(), f'financechain-loadtest-{os.getpid()}.db')
+os.environ['MONGO_DB_NAME'] = LOADTEST_DB
+os.environ['SQLITE_PATH'] = LOADTEST_SQLITE
+
+from create_sample_data import categories, sample_records, users  # noqa: E402
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+SCENARIOS = ('post_tx', 'post_batch', 'post_payment', 'get_tx', 'confirm')
+# post_batch gửi --batch-rows giao dịch mỗi request nên chỉ chạy khi chọn bằng --scenarios
+DEFAULT_SCENARIOS = ('post_tx', 'post_payment', 'get_tx', 'confirm')
+# Mã trạng thái coi là thành công; confirm trả 409 khi payment đang hoặc đã được producer xác nhận
+EXPECTED_STATUS = {
+    'post_tx': {200, 202},
+    'post_batch': {200, 202},
+    'post_payment': {200, 202},
+    'get_tx': {200, 304},
+    'confirm': {200, 202, 409},
+}
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Đếm lệnh MongoDB mà client trong process gửi đi (mỗi lệnh là một round-trip)"""
+
+    def __init__(self):
+        self.commands = Counter()
+
+    def started(self, event):
+        self.commands[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def reset(self):
+        snapshot, self.commands = self.commands, Counter()
+        return snapshot
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def random_amount():
+    # Phần lớn giao dịch nhỏ, thỉnh thoảng có khoản lớn (lương, đầu tư)
+    return round(min(random.lognormvariate(4, 1.2), 50000), 2)
+
+
+def random_pair():
+    sender = random.choice(users + categories)
+    recipient = random.choice([u for u in users if u != sender])
+    return sender, recipient
+
+
+class LoadTest:
+    def __init__(self, client, args, counter=None, backlog=None):
+        self.client = client
+        self.args = args
+        self.counter = counter
+        self.backlog = backlog
+        self.payment_ids = []
+
+    def _wait_suffix(self):
+        return '?wait=true' if self.args.wait else ''
+
+    async def post_tx(self, i):
+        sender, recipient = random_pair()
+        return await self.client.post('/api/transactions' + self._wait_suffix(),
+                                      json={"sender": sender, "recipient": recipient, "amount": random_amount()})
+
+    async def post_batch(self, i):
+        rows = []
+        for _ in range(self.args.batch_rows):
+            sender, recipient = random_pair()
+            rows.append({"sender": sender, "recipient": recipient, "amount": random_amount()})
+        return await self.client.post('/api/transactions/batch' + self._wait_suffix(), json=rows)
+
+    async def post_payment(self, i):
+        payer, payee = random_pair()
+        response = await self.client.post('/api/payments' + self._wait_suffix(),
+                                          json={"payer": payer, "payee": payee, "amount": random_amount()})
+        if response.status_code in (200, 202):
+            self.payment_ids.append(response.json()['payment_id'])
+        return response
+
+    async def get_tx(self, i):
+        # Dashboard đọc trang đầu; một phần request lọc theo người gửi
+        params = {"limit": self.args.page_size}
+        if random.random() < 0.3:
+            params["sender"] = random.choice(users)
+        return await self.client.get('/api/transactions', params=params)
+
+    async def confirm(self, i):
+        return await self.client.post(f'/api/payments/{self.payment_ids[i % len(self.payment_ids)]}/confirm'
+                                      + self._wait_suffix())
+
+    async def prepare(self, scenario):
+        if scenario == 'confirm' and not self.payment_ids:
+            for _ in range(min(self.args.requests, 200)):
+                await self.post_payment(0)
+            await self.drain()
+
+    async def drain(self, timeout=30):
+        """Chờ producer niêm phong hết giao dịch đang chờ (chỉ khi app chạy trong process)"""
+        if self.backlog is None:
+            return
+        deadline = time.perf_counter() + timeout
+        while self.backlog() and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+
+    async def run_phase(self, scenario):
+        await self.prepare(scenario)
+        if self.counter:
+            self.counter.reset()
+        send = getattr(self, scenario)
+        latencies, statuses = [], Counter()
+        next_i = iter(range(self.args.requests))
+
+        async def worker():
+            for i in next_i:
+                start = time.perf_counter()
+                try:
+                    response = await send(i)
+                    statuses[response.status_code] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(self.args.concurrency)])
+        duration = time.perf_counter() - start
+        # Lệnh Mongo do producer chạy nền để ghi block cũng tính cho pha này
+        await self.drain()
+        commands = self.counter.reset() if self.counter else None
+
+        latencies.sort()
+        errors = sum(n for code, n in statuses.items() if code not in EXPECTED_STATUS[scenario])
+        rows = len(latencies) * (self.args.batch_rows if scenario == 'post_batch' else 1)
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "status": {str(code): n for code, n in sorted(statuses.items(), key=lambda kv: str(kv[0]))},
+            "duration_s": round(duration, 3),
+            "throughput_rps": round(len(latencies) / duration, 1) if duration else None,
+            # Giao dịch gửi mỗi giây (post_batch gửi --batch-rows giao dịch mỗi request)
+            "rows_per_s": round(rows / duration, 1) if duration else None,
+            "latency_ms": {
+                "mean": round(sum(latencies) / len(latencies), 2) if latencies else None,
+                **{f"p{p}": round(percentile(latencies, p), 2) if latencies else None for p in (50, 95, 99)},
+                "max": round(latencies[-1], 2) if latencies else None,
+            },
+            "db_roundtrips_per_request": (round(sum(commands.values()) / len(latencies), 2)
+                                          if commands is not None and latencies else None),
+            "db_commands": dict(commands.most_common()) if commands is not None else None,
+        }
+
+
+def drop_loadtest_db(database, args):
+    """Xóa database load test: file sqlite tạm, hoặc database trên mongod (mongomock chỉ nằm trong bộ nhớ)"""
+    for suffix in ('', '-wal', '-shm'):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(LOADTEST_SQLITE + suffix)
+    if args.mongo != 'real' or database.STORAGE_ENGINE != 'mongo':
+        return
+    client = MongoClient(database.MONGO_URI, serverSelectionTimeoutMS=5000)
+    try:
+        client.drop_database(LOADTEST_DB)
+    finally:
+        client.close()
+
+
+@contextlib.asynccontextmanager
+async def inprocess_client(args, counter):
+    """Chạy FastAPI app trong process (ASGI transport), Mongo thật hoặc mongomock-motor, trên database riêng"""
+    import src.database as database
+    if args.mongo == 'mock':
+        try:
+            import mongomock
+            import mongomock_motor
+        except ImportError:
+            sys.exit("❌ --mongo mock cần: pip install mongomock-motor")
+        shared = mongomock.MongoClient()
+        database.AsyncIOMotorClient = lambda *a, **k: mongomock_motor.AsyncMongoMockClient(mock_mongo_client=shared)
+    else:
+        monitoring.register(counter)
+
+    from src.ingest import ingest_records
+    from src.main import app
+    from src.producer import producer
+
+    quiet = contextlib.redirect_stdout(io.StringIO()) if not args.verbose else contextlib.nullcontext()
+    # Lần chạy trước bị ngắt có thể còn để lại dữ liệu
+    drop_loadtest_db(database, args)
+    try:
+        with quiet:
+            if args.ledger:
+                # Nạp sổ cái mẫu trước khi app (và block producer) khởi động
+                await database.init_storage()
+                await ingest_records(sample_records(args.ledger, show=0), block_size=args.block_size)
+                await database.close_storage()
+            async with app.router.lifespan_context(app):
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url='http://loadtest') as client:
+                    yield client, (lambda: producer.backlog)
+    finally:
+        drop_loadtest_db(database, args)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_table(results, previous=None):
+    print(f"\n{'kịch bản':<13s} | {'req/s':>8s} | {'tx/s':>9s} | {'p50 ms':>8s} | {'p95 ms':>8s} | {'p99 ms':>8s} | "
+          f"{'DB/req':>6s} | {'lỗi':>5s}")
+    print("-" * 88)
+    for name, r in results.items():
+        lat = r['latency_ms']
+        db = r['db_roundtrips_per_request']
+        print(f"{name:<13s} | {r['throughput_rps'] or 0:8.1f} | {r.get('rows_per_s') or 0:9.1f} | {lat['p50'] or 0:8.2f} | "
+              f"{lat['p95'] or 0:8.2f} | {lat['p99'] or 0:8.2f} | {db if db is not None else 'n/a':>6} | "
+              f"{r['errors']:>5d}")
+        old = (previous or {}).get(name)
+        if old:
+            def delta(new, prev):
+                return f"{(new - prev) / prev * 100:+.0f}%" if new is not None and prev else "  -"
+            print(f"{'  Δ lần trước':<13s} | {delta(r['throughput_rps'], old['throughput_rps']):>8s} | "
+                  f"{delta(r.get('rows_per_s'), old.get('rows_per_s')):>9s} | "
+                  f"{delta(lat['p50'], old['latency_ms']['p50']):>8s} | {delta(lat['p95'], old['latency_ms']['p95']):>8s} | "
+                  f"{delta(lat['p99'], old['latency_ms']['p99']):>8s} |")
+
+
+async def main(args):
+    if httpx is None:
+        sys.exit("❌ Cần httpx: pip install httpx")
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"❌ Kịch bản không hợp lệ: {', '.join(sorted(unknown))} (chọn trong {', '.join(SCENARIOS)})")
+    random.seed(args.seed)
+
+    counter = CommandCounter()
+    if args.url:
+        target = args.url
+        client_cm = contextlib.AsyncExitStack()
+        client = await client_cm.enter_async_context(httpx.AsyncClient(base_url=args.url, timeout=60))
+        test = LoadTest(client, args)
+        if args.ledger:
+            print("⚠️  --ledger chỉ dùng khi app chạy trong process; bỏ qua")
+    else:
+        target = f"inprocess:{args.mongo}"
+        client_cm = contextlib.AsyncExitStack()
+        client, backlog = await client_cm.enter_async_context(inprocess_client(args, counter))
+        # mongomock không đi qua pymongo nên không đếm được round-trip
+        test = LoadTest(client, args, counter if args.mongo != 'mock' else None, backlog)
+
+    print(f"🚀 {target}: {', '.join(scenarios)} — {args.requests} request/kịch bản, concurrency {args.concurrency}")
+    results = {}
+    try:
+        for scenario in scenarios:
+            results[scenario] = await test.run_phase(scenario)
+            print(f"  ✓ {scenario}: {results[scenario]['throughput_rps']} req/s")
+    finally:
+        await client_cm.aclose()
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f).get('scenarios')
+    print_table(results, previous)
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "git_commit": git_commit(),
+        "target": target,
+        "python": platform.python_version(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ('out', 'compare')},
+        "env": {k: os.environ[k] for k in ('BLOCK_MAX_TXS', 'BLOCK_MAX_WAIT_MS', 'CACHE_TTL_S',
+                                           'MEMPOOL_CAPACITY', 'MEMPOOL_SENDER_QUOTA') if k in os.environ},
+        "scenarios": results,
+    }
+    out = args.out or os.path.join(BACKEND_DIR, 'bench_results', f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Kết quả: {out}")
+    return 1 if any(r['errors'] for r in results.values()) else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="API đang chạy; bỏ trống để chạy app trong process")
+    parser.add_argument('--mongo', choices=('real', 'mock'), default='real',
+                        help="khi chạy trong process: mongod theo MONGO_URI hoặc mongomock-motor")
+    parser.add_argument('--scenarios', default=','.join(DEFAULT_SCENARIOS))
+    parser.add_argument('-n', '--requests', type=int, default=500, help="số request mỗi kịch bản")
+    parser.add_argument('-c', '--concurrency', type=int, default=20)
+    parser.add_argument('--wait', action='store_true', help="POST với ?wait=true (chờ block được ghi)")
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--batch-rows', type=int, default=500, help="số giao dịch mỗi request của post_batch")
+    parser.add_argument('--ledger', type=int, default=1000, help="số giao dịch mẫu nạp trước (trong process)")
+    parser.add_argument('--block-size', type=int, default=50, help="giao dịch mỗi block của sổ cái mẫu")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', help="file JSON kết quả (mặc định bench_results/loadtest-<thời gian>.json)")
+    parser.add_argument('--compare', help="file JSON của lần chạy trước để so sánh")
+    parser.add_argument('--verbose', action='store_true', help="hiện log của app khi chạy trong process")
+    sys.exit(asyncio.run(main(parser.parse_args())))
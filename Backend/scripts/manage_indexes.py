@@ -0,0 +1,59 @@
+"""
+Quản lý index MongoDB (migration + kiểm tra query plan)
+Chạy:
+  python scripts/manage_indexes.py apply     # tạo index còn thiếu
+  python scripts/manage_indexes.py report    # index thiếu / thừa / không dùng
+  python scripts/manage_indexes.py explain   # truy vấn nóng phải là IXSCAN (exit 1 nếu COLLSCAN)
+"""
+
+import os
+import sys
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.indexes import ensure_indexes, explain_hot_queries, index_report  # noqa: E402
+
+load_dotenv()
+
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
+MONGO_DB_NAME = os.getenv('MONGO_DB_NAME', 'financechain')
+
+
+def main(command):
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    db = client[MONGO_DB_NAME]
+
+    if command == 'apply':
+        errors = ensure_indexes(db)
+        for coll_name, messages in errors.items():
+            for message in messages:
+                print(f"❌ {coll_name}.{message}")
+        print("✅ Index đã đồng bộ" if not errors else "⚠️  Một số index chưa tạo được")
+        return 1 if errors else 0
+
+    if command == 'report':
+        for coll_name, info in index_report(db).items():
+            print(f"📂 {coll_name}")
+            print(f"  • Thiếu:       {', '.join(info['missing']) or '-'}")
+            print(f"  • Không khai báo: {', '.join(info['undeclared']) or '-'}")
+            unused = info['unused']
+            print(f"  • Không dùng:  {'(không có $indexStats)' if unused is None else ', '.join(unused) or '-'}")
+        return 0
+
+    if command == 'explain':
+        failed = 0
+        for coll_name, query, sort, stages in explain_hot_queries(db):
+            ok = 'COLLSCAN' not in stages and 'IXSCAN' in stages
+            failed += not ok
+            print(f"  {'✓' if ok else '✗'} {coll_name}.find({query}).sort({sort}): {' <- '.join(stages)}")
+        print("✅ Tất cả truy vấn nóng dùng IXSCAN" if not failed else f"❌ {failed} truy vấn không dùng index")
+        return 1 if failed else 0
+
+    print(__doc__)
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1] if len(sys.argv) > 1 else ''))
@@ -0,0 +1,56 @@
+"""
+Chuyển các block đã lưu sang layout khác (xem BLOCK_LAYOUT trong src/database.py)
+  reference: block chỉ giữ tx_ids + merkle_root, giao dịch nằm duy nhất trong collection transactions
+  embedded:  chép lại toàn bộ giao dịch vào blocks.transactions (layout cũ)
+Hash block đổi theo layout nên chuỗi được nối lại từ block đầu tiên được chuyển; chạy lại sau khi bị
+dừng giữa chừng thì làm tiếp. Dừng backend (producer) trước khi chạy, sau đó đặt BLOCK_LAYOUT cho khớp.
+Chạy:
+  python scripts/migrate_block_layout.py reference [--batch-size 1000]
+  python scripts/migrate_block_layout.py embedded --no-verify
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.chain import VALIDATE_BATCH_SIZE, migrate_block_layout, shutdown_validation, validate_full  # noqa: E402
+from src.database import BLOCK_LAYOUT, close_mongodb, init_mongodb  # noqa: E402
+
+
+def report(stats):
+    print(f"  ⏳ {stats['blocks']:,} blocks / {stats['transactions']:,} giao dịch đã chuyển, "
+          f"{stats['relinked']:,} blocks nối lại hash", flush=True)
+
+
+async def main(args):
+    await init_mongodb()
+    try:
+        start = time.perf_counter()
+        print(f"🔄 Chuyển blocks sang layout '{args.layout}'...")
+        stats = await migrate_block_layout(args.layout, args.batch_size, progress=report)
+        print(f"✅ {stats['blocks']:,} blocks, {stats['transactions']:,} giao dịch "
+              f"({time.perf_counter() - start:.1f}s)")
+        if args.verify:
+            result = await validate_full(args.batch_size)
+            if not result['valid']:
+                print(f"❌ Chuỗi không hợp lệ tại block {result['index']}: {result['error']}")
+                return 1
+            print(f"✅ Đã kiểm tra {result['checked']:,} blocks")
+        if BLOCK_LAYOUT != args.layout:
+            print(f"💡 Đặt BLOCK_LAYOUT={args.layout} để block mới dùng cùng layout (hiện tại: {BLOCK_LAYOUT})")
+        return 0
+    finally:
+        shutdown_validation()
+        await close_mongodb()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('layout', choices=['reference', 'embedded'])
+    parser.add_argument('--batch-size', type=int, default=VALIDATE_BATCH_SIZE, help="số block mỗi lô")
+    parser.add_argument('--no-verify', dest='verify', action='store_false',
+                        help="bỏ qua kiểm tra toàn bộ chuỗi sau khi chuyển")
+    sys.exit(asyncio.run(main(parser.parse_args())))
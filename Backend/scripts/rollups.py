@@ -0,0 +1,39 @@
+"""
+Số dư (balances) và thống kê theo ngày (rollups) được cập nhật sẵn
+Chạy:
+  python scripts/rollups.py rebuild   # tính lại từ các block đã lưu (đọc theo lô)
+  python scripts/rollups.py check     # so sánh với kết quả tính lại, exit 1 nếu lệch
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.database import check_rollups, close_storage, init_storage, rebuild_rollups  # noqa: E402
+
+
+async def main(command):
+    await init_storage()
+    try:
+        if command == 'rebuild':
+            result = await rebuild_rollups()
+            print(f"✅ Đã tính lại: {result['accounts']} tài khoản, {result['days']} ngày")
+            return 0
+        if command == 'check':
+            mismatches = await check_rollups()
+            for m in mismatches[:20]:
+                print(f"  ✗ {m['collection']}[{m['key']}]: lưu {m['stored']} / đúng {m['expected']}")
+            if mismatches:
+                print(f"❌ {len(mismatches)} bản ghi lệch — chạy: python scripts/rollups.py rebuild")
+                return 1
+            print("✅ Balances/rollups khớp với dữ liệu blocks")
+            return 0
+        print(__doc__)
+        return 2
+    finally:
+        await close_storage()
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else '')))
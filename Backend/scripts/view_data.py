@@ -25,7 +25,9 @@ print(f"  • Tổng giao dịch: {tx_count}")
 print(f"  • Tổng blocks: {block_count}")
 
 if tx_count > 0:
-    total_amount = sum(tx['amount'] for tx in db.transactions.find())
+    # Cộng trong MongoDB ($group) thay vì kéo toàn bộ giao dịch về Python
+    totals = list(db.transactions.aggregate([{"$group": {"_id": None, "total": {"$sum": "$amount"}}}]))
+    total_amount = totals[0]["total"] if totals else 0
     print(f"  • Tổng số tiền: ${total_amount:.2f}")
 
 # Hiển thị 10 giao dịch gần nhất
@@ -41,7 +43,7 @@ print(f"\n🔗 Blocks:")
 print("-" * 60)
 for block in db.blocks.find().sort("index", -1).limit(5):
     timestamp = datetime.fromtimestamp(block['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
-    tx_count = len(block.get('transactions', []))
+    tx_count = block.get('tx_count', len(block.get('transactions', [])))
     print(f"  Block #{block['index']:3d}: {tx_count} giao dịch | {timestamp}")
 
 # Top người dùng
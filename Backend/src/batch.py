@@ -0,0 +1,160 @@
+"""POST /api/transactions/batch: nhận hàng nghìn giao dịch trong một request.
+
+Body là JSON array hoặc NDJSON (mỗi dòng một object). Tất cả phần tử được
+kiểm tra trong một lượt với cùng quy tắc như POST /api/transactions
+(build_transaction), các chữ ký ví được khôi phục chung một lần bằng
+verifier.recover_many, rồi các giao dịch hợp lệ được đưa vào producer cùng
+lúc (submit_many) để ghi bằng insert_many trong vài block nhiều giao dịch.
+Mỗi phần tử có kết quả riêng theo vị trí trong body.
+
+Body lớn hơn BATCH_MAX_BYTES bị từ chối trước khi đọc hết; NDJSON dừng parse
+sau BATCH_MAX_ITEMS + 1 dòng (đủ để biết là quá giới hạn).
+"""
+
+import json
+import os
+
+from .encoder import orjson
+from .signatures import verifier
+
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '10000'))
+BATCH_MAX_BYTES = int(os.getenv('BATCH_MAX_BYTES', str(BATCH_MAX_ITEMS * 1024)))
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+class InvalidItem:
+    """Placeholder for an NDJSON line that is not valid JSON"""
+
+    __slots__ = ('error',)
+
+    def __init__(self, error):
+        self.error = error
+
+
+def parse_batch(body, content_type='', max_items=BATCH_MAX_ITEMS):
+    """Items of a JSON array or NDJSON body; raises ValueError if the body cannot be read.
+
+    A body not starting with '[' is read as NDJSON, and a bad line becomes an
+    InvalidItem instead of failing the whole batch. NDJSON parsing stops after
+    max_items + 1 items, so an oversized batch is not decoded in full.
+    """
+    if 'ndjson' not in content_type and body.lstrip().startswith(b'['):
+        try:
+            items = _loads(body)
+        except ValueError:
+            raise ValueError('invalid JSON')
+        if not isinstance(items, list):
+            raise ValueError('expected JSON array')
+        return items
+    items = []
+    for line in body.splitlines():
+        if len(items) > max_items:
+            break
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            items.append(_loads(line))
+        except ValueError:
+            items.append(InvalidItem('invalid JSON'))
+    return items
+
+
+def build_transaction(body):
+    """Transaction document for a POST /api/transactions body; raises ValueError on bad fields.
+
+    Returns (tx_data, signed); signed is (message, signature, address) when the
+    body carries a wallet signature that should be checked, else None.
+    """
+    sender = body.get('sender')
+    recipient = body.get('recipient')
+    amount = body.get('amount')
+    if not (sender and recipient and amount is not None):
+        raise ValueError('missing fields')
+    # sender và tx_hash làm khoá dict trong mempool: chỉ nhận chuỗi
+    if not (isinstance(sender, str) and isinstance(recipient, str)):
+        raise ValueError('sender and recipient must be strings')
+    tx_hash = body.get('tx_hash')
+    if tx_hash is not None and not isinstance(tx_hash, str):
+        raise ValueError('tx_hash must be a string')
+    # fee (tuỳ chọn) quyết định thứ tự lấy ra khỏi mempool, xem src/mempool.py
+    fee = body.get('fee')
+    if fee is not None and (isinstance(fee, bool) or not isinstance(fee, (int, float)) or fee < 0):
+        raise ValueError('invalid fee')
+    tx_data = {
+        "sender": sender,
+        "recipient": recipient,
+        "amount": amount,
+        "mined": False,
+    }
+    if fee is not None:
+        tx_data["fee"] = fee
+    # attach on-chain tx hash + metadata if provided
+    if tx_hash:
+        tx_data["hash"] = tx_hash
+    if isinstance(body.get('tx_meta'), dict):
+        tx_data["onchain"] = body['tx_meta']
+    signed = None
+    signature, message, address = body.get('signature'), body.get('message'), body.get('address')
+    if signature and message and address and verifier.available:
+        signed = (message, signature, address)
+    return tx_data, signed
+
+
+def attach_signature(tx_data, signed):
+    """Add the checked wallet signature fields to a transaction document"""
+    message, signature, address = signed
+    tx_data['wallet_address'] = address
+    tx_data['signature'] = signature
+    tx_data['signed_message'] = message
+
+
+def _error(index, error):
+    return {"index": index, "ok": False, "error": error}
+
+
+async def validate_batch(items):
+    """Validate all items in one pass; returns (results, accepted).
+
+    `results` has an error entry for every rejected position (None elsewhere)
+    and `accepted` lists (position, tx_data) in body order.
+    """
+    results = [None] * len(items)
+    accepted, signed = [], []
+    for i, item in enumerate(items):
+        if isinstance(item, InvalidItem):
+            results[i] = _error(i, item.error)
+            continue
+        if not isinstance(item, dict):
+            results[i] = _error(i, "expected JSON object")
+            continue
+        try:
+            tx_data, signature = build_transaction(item)
+        except ValueError as e:
+            results[i] = _error(i, str(e))
+            continue
+        if signature:
+            # recover_many cần chuỗi (dùng làm khoá cache); request đơn lẻ báo lỗi tương tự
+            if not all(isinstance(v, str) for v in signature):
+                results[i] = _error(i, "signature verify failed: signature fields must be strings")
+                continue
+            signed.append((len(accepted), signature))
+        accepted.append((i, tx_data))
+    if not signed:
+        return results, accepted
+
+    # Một lần recover_many cho mọi chữ ký (cache + worker pool), không chặn event loop
+    recovered = await verifier.recover_many([(message, sig) for _, (message, sig, _) in signed])
+    bad = set()
+    for (k, signature), address in zip(signed, recovered):
+        position, tx_data = accepted[k]
+        if isinstance(address, Exception):
+            results[position] = _error(position, f"signature verify failed: {address}")
+            bad.add(k)
+        elif address.lower() != signature[2].lower():
+            results[position] = _error(position, "signature mismatch")
+            bad.add(k)
+        else:
+            attach_signature(tx_data, signature)
+    return results, [a for k, a in enumerate(accepted) if k not in bad]
@@ -0,0 +1,328 @@
+"""Liên kết hash cho các block đã lưu và kiểm tra tính toàn vẹn.
+
+Mỗi block được ghi kèm `previous_hash` (hash của block liền trước, block
+đầu tiên dùng "0" giống BlockChain.create_genesis_block) và `hash` tính
+bằng compute_block_hash(). validate_incremental() chỉ kiểm tra các block
+nối thêm sau checkpoint lần trước (state `chain_state` của storage),
+còn validate_full() đọc lại toàn bộ chuỗi theo từng lô và băm song song
+trên một process pool dùng chung của worker (tạo khi cần, đóng bằng
+shutdown_validation() khi tắt app); tối đa CHAIN_VALIDATE_MAX_CONCURRENT
+lần kiểm tra toàn bộ chạy cùng lúc, các lần sau chờ đến lượt.
+
+Với BLOCK_LAYOUT=reference block chỉ giữ `tx_ids` và `merkle_root` (Merkle
+root của các giao dịch trong collection `transactions`); hash block khi đó
+tính trên merkle_root thay cho danh sách giao dịch, và khi kiểm tra chuỗi
+các giao dịch được đọc lại bằng một lệnh $in cho mỗi lô để đối chiếu root.
+
+backfill_block_hashes() và migrate_block_layout() sửa dữ liệu cũ trong
+MongoDB nên chỉ chạy với STORAGE_ENGINE=mongo.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ReplaceOne, UpdateOne
+
+from models.merkle import merkle_root as tree_root
+
+from .database import BLOCK_LAYOUT, CHAIN_TAG, WEB_CONCURRENCY, get_async_db, get_storage, hydrate_blocks, response_cache
+from .logs import timed_db
+
+GENESIS_PREVIOUS_HASH = "0"
+CHECKPOINT_ID = 'checkpoint'
+VALIDATE_BATCH_SIZE = int(os.getenv('CHAIN_VALIDATE_BATCH_SIZE', '1000'))
+# Mỗi worker uvicorn có pool riêng nên mặc định chia số CPU cho WEB_CONCURRENCY
+VALIDATE_WORKERS = int(os.getenv('CHAIN_VALIDATE_WORKERS', str(max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY))))
+VALIDATE_MAX_CONCURRENT = int(os.getenv('CHAIN_VALIDATE_MAX_CONCURRENT', '1'))
+
+_validate_pool = None
+_validate_slots = None
+
+
+def _canonical_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        # MongoDB chỉ lưu tới millisecond; cắt bớt để hash không đổi sau khi đọc lại
+        return value.replace(microsecond=value.microsecond // 1000 * 1000).isoformat()
+    return str(value)
+
+
+def _canonical(value):
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), default=_canonical_default).encode()
+
+
+def compute_block_hash(block):
+    """SHA-256 over the canonical JSON of index, timestamp, previous_hash and transactions.
+
+    Reference-layout blocks (those with a merkle_root) hash the root instead of the transactions.
+    """
+    payload = {
+        "index": block.get("index"),
+        "timestamp": block.get("timestamp"),
+        "previous_hash": block.get("previous_hash"),
+    }
+    if "merkle_root" in block:
+        payload["merkle_root"] = block["merkle_root"]
+    else:
+        payload["transactions"] = block.get("transactions", [])
+    return hashlib.sha256(_canonical(payload)).hexdigest()
+
+
+def merkle_root(transactions):
+    """Merkle root (hex) over SHA-256 of each transaction, ignoring its block_id back-reference.
+
+    Cây dựng bằng models/merkle.py như Block trong bộ nhớ: nút lẻ được đẩy lên,
+    nút trong có tiền tố 0x01, nên thêm một tx_ids trùng lặp sẽ đổi root.
+    """
+    return tree_root([hashlib.sha256(_canonical({k: v for k, v in tx.items() if k != 'block_id'})).digest()
+                      for tx in transactions]).hex()
+
+
+def attach_transactions(block, transactions, layout=BLOCK_LAYOUT):
+    """Put `transactions` (documents that already have an _id) into `block` in the given layout"""
+    if layout == 'reference':
+        block["tx_ids"] = [tx['_id'] for tx in transactions]
+        block["tx_count"] = len(transactions)
+        block["merkle_root"] = merkle_root(transactions)
+    else:
+        block["transactions"] = [{k: v for k, v in tx.items() if k != 'block_id'} for tx in transactions]
+    return block
+
+
+def _hash_blocks(blocks):
+    """(hash, merkle_root of the hydrated transactions or None) for each block"""
+    return [(compute_block_hash(b), merkle_root(b.get('transactions', [])) if 'merkle_root' in b else None)
+            for b in blocks]
+
+
+@timed_db
+async def get_chain_tip():
+    """Return (index, hash) of the last stored block, or (None, GENESIS_PREVIOUS_HASH)"""
+    tip = await get_storage().chain_tip()
+    if not tip:
+        return None, GENESIS_PREVIOUS_HASH
+    return tip
+
+
+async def backfill_block_hashes(batch_size=VALIDATE_BATCH_SIZE):
+    """Add hash links to blocks written without them (legacy data); returns blocks updated.
+
+    Every block from the first unhashed one onwards is relinked, since its
+    successors' previous_hash must follow the new hashes.
+    """
+    db = get_async_db()
+    first = await db.blocks.find_one({'hash': None}, sort=[('index', 1)], projection={'index': 1})
+    if not first:
+        return 0
+    prev = await db.blocks.find_one(
+        {'index': {'$lt': first['index']}}, sort=[('index', -1)], projection={'hash': 1},
+    )
+    prev_hash = prev['hash'] if prev else GENESIS_PREVIOUS_HASH
+
+    updated = 0
+    ops = []
+    cursor = db.blocks.find({'index': {'$gte': first['index']}}).sort([('index', 1), ('_id', 1)]).batch_size(batch_size)
+    async for doc in cursor:
+        doc['previous_hash'] = prev_hash
+        block_hash = compute_block_hash(doc)
+        if doc.get('hash') != block_hash:
+            ops.append(UpdateOne({'_id': doc['_id']}, {'$set': {'previous_hash': prev_hash, 'hash': block_hash}}))
+        prev_hash = block_hash
+        if len(ops) >= batch_size:
+            updated += (await db.blocks.bulk_write(ops, ordered=False)).modified_count
+            ops = []
+    if ops:
+        updated += (await db.blocks.bulk_write(ops, ordered=False)).modified_count
+    # Checkpoint cũ không còn khớp với các hash vừa tính lại
+    await db.chain_state.delete_one({'_id': CHECKPOINT_ID})
+    if updated:
+        response_cache.invalidate(CHAIN_TAG)
+    return updated
+
+
+def _in_layout(block, layout):
+    return ('transactions' not in block) if layout == 'reference' else ('tx_ids' not in block)
+
+
+async def migrate_block_layout(layout, batch_size=VALIDATE_BATCH_SIZE, progress=None):
+    """Convert stored blocks to `layout` ('embedded' or 'reference') and relink their hashes.
+
+    Embedded → reference writes each embedded copy back to `transactions`
+    (upsert by _id, so the stored document is exactly what the block hashed)
+    and keeps only tx_ids/merkle_root in the block. Reference → embedded
+    copies the transactions back into the block. Hashes change with the
+    layout, so every block from the first converted one onwards is relinked.
+    Safe to re-run after an interruption; do not run while the API is writing blocks.
+    Returns {"blocks", "transactions", "relinked"}; `progress(stats)` runs after every batch.
+    """
+    db = get_async_db()
+    stats = {'blocks': 0, 'transactions': 0, 'relinked': 0}
+    other = 'transactions' if layout == 'reference' else 'tx_ids'
+    first = await db.blocks.find_one({other: {'$exists': True}}, sort=[('index', 1)], projection={'index': 1})
+    if not first:
+        return stats
+    prev = await db.blocks.find_one({'index': {'$lt': first['index']}}, sort=[('index', -1)], projection={'hash': 1})
+    prev_hash = prev['hash'] if prev else GENESIS_PREVIOUS_HASH
+
+    cursor = db.blocks.find({'index': {'$gte': first['index']}}).sort([('index', 1), ('_id', 1)]).batch_size(batch_size)
+    batch = await cursor.to_list(length=batch_size)
+    while batch:
+        if layout == 'embedded':
+            await hydrate_blocks(batch, full=True)
+        tx_ops, block_ops = [], []
+        for doc in batch:
+            update = {}
+            if not _in_layout(doc, layout):
+                if layout == 'reference':
+                    txs = [{**tx, '_id': tx.get('_id') or ObjectId(), 'mined': True, 'block_id': str(doc['_id'])}
+                           for tx in doc.pop('transactions')]
+                    tx_ops.extend(ReplaceOne({'_id': tx['_id']}, tx, upsert=True) for tx in txs)
+                    attach_transactions(doc, txs, 'reference')
+                    update['$set'] = {f: doc[f] for f in ('tx_ids', 'tx_count', 'merkle_root')}
+                    update['$unset'] = {'transactions': ''}
+                else:
+                    if len(doc['transactions']) != len(doc['tx_ids']):
+                        raise RuntimeError(f"block {doc['index']}: {len(doc['tx_ids']) - len(doc['transactions'])} "
+                                           "transactions missing from the transactions collection")
+                    txs = doc['transactions']
+                    for field in ('tx_ids', 'tx_count', 'merkle_root'):
+                        doc.pop(field, None)
+                    attach_transactions(doc, txs, 'embedded')
+                    update['$set'] = {'transactions': doc['transactions']}
+                    update['$unset'] = {'tx_ids': '', 'tx_count': '', 'merkle_root': ''}
+                stats['blocks'] += 1
+                stats['transactions'] += len(txs)
+            doc['previous_hash'] = prev_hash
+            block_hash = compute_block_hash(doc)
+            if update or doc.get('hash') != block_hash:
+                update.setdefault('$set', {}).update({'previous_hash': prev_hash, 'hash': block_hash})
+                block_ops.append(UpdateOne({'_id': doc['_id']}, update))
+                stats['relinked'] += 1
+            prev_hash = block_hash
+        # Giao dịch ghi trước block: dừng giữa chừng thì chạy lại vẫn đúng
+        if tx_ops:
+            await db.transactions.bulk_write(tx_ops, ordered=False)
+        if block_ops:
+            await db.blocks.bulk_write(block_ops, ordered=False)
+        if progress:
+            progress(stats)
+        batch = await cursor.to_list(length=batch_size)
+
+    await db.chain_state.delete_one({'_id': CHECKPOINT_ID})
+    response_cache.invalidate(CHAIN_TAG)
+    return stats
+
+
+def _check_block(doc, prev_hash, block_hash, root=None):
+    if doc.get('previous_hash') != prev_hash:
+        return 'previous_hash does not match the preceding block'
+    if doc.get('hash') != block_hash:
+        return 'hash does not match block contents'
+    if root is not None and doc.get('merkle_root') != root:
+        return 'merkle_root does not match the stored transactions'
+    return None
+
+
+async def _save_checkpoint(index, block_hash):
+    await get_storage().set_state('chain_state', CHECKPOINT_ID,
+                                  {'index': index, 'hash': block_hash, 'verified_at': time.time()})
+
+
+async def validate_incremental(batch_size=VALIDATE_BATCH_SIZE):
+    """Verify only the blocks appended since the last checkpoint and advance it.
+
+    Returns {"valid", "checked", "index", "error"}; on failure the checkpoint
+    stays at the last good block and "index" is the first bad one.
+    """
+    storage = get_storage()
+    checkpoint = await storage.get_state('chain_state', CHECKPOINT_ID)
+    last_index = checkpoint['index'] if checkpoint else None
+    prev_hash = checkpoint['hash'] if checkpoint else GENESIS_PREVIOUS_HASH
+
+    checked = 0
+    error = None
+    bad_index = None
+    async for batch in storage.iter_blocks(last_index, batch_size):
+        for doc, (block_hash, root) in zip(batch, _hash_blocks(batch)):
+            error = _check_block(doc, prev_hash, block_hash, root)
+            if error:
+                bad_index = doc.get('index')
+                break
+            checked += 1
+            last_index, prev_hash = doc['index'], doc['hash']
+        if error:
+            break
+
+    if checked:
+        await _save_checkpoint(last_index, prev_hash)
+    return {"valid": error is None, "checked": checked, "index": bad_index, "error": error}
+
+
+def _get_validate_pool():
+    global _validate_pool, _validate_slots
+    if _validate_pool is None:
+        _validate_pool = ProcessPoolExecutor(max_workers=VALIDATE_WORKERS)
+    if _validate_slots is None:
+        _validate_slots = asyncio.Semaphore(max(1, VALIDATE_MAX_CONCURRENT))
+    return _validate_pool
+
+
+def shutdown_validation():
+    """Stop the process pool used by validate_full (lifespan shutdown)"""
+    global _validate_pool, _validate_slots
+    if _validate_pool is not None:
+        _validate_pool.shutdown(wait=True, cancel_futures=True)
+        _validate_pool = None
+    _validate_slots = None
+
+
+async def validate_full(batch_size=VALIDATE_BATCH_SIZE):
+    """Re-verify the whole chain, streaming from storage and hashing on the shared process pool"""
+    pool = _get_validate_pool()
+    async with _validate_slots:
+        try:
+            return await _validate_full(pool, batch_size)
+        except BrokenProcessPool:
+            # Một process con chết làm hỏng cả pool: bỏ đi để lần sau tạo lại
+            shutdown_validation()
+            raise
+
+
+async def _validate_full(pool, batch_size):
+    loop = asyncio.get_running_loop()
+    prev_hash = GENESIS_PREVIOUS_HASH
+    last_index = None
+    checked = 0
+
+    async def hash_batch(batch):
+        size = max(1, -(-len(batch) // VALIDATE_WORKERS))
+        chunks = [batch[i:i + size] for i in range(0, len(batch), size)]
+        results = await asyncio.gather(*[loop.run_in_executor(pool, _hash_blocks, c) for c in chunks])
+        return [digest for chunk in results for digest in chunk]
+
+    batches = get_storage().iter_blocks(batch_size=batch_size)
+    batch = await anext(batches, None)
+    while batch:
+        # Băm lô hiện tại trên process pool trong khi đọc lô kế tiếp từ storage
+        hashing = asyncio.ensure_future(hash_batch(batch))
+        next_batch = await anext(batches, None)
+        digests = await hashing
+        for doc, (block_hash, root) in zip(batch, digests):
+            error = _check_block(doc, prev_hash, block_hash, root)
+            if error:
+                return {"valid": False, "checked": checked, "index": doc.get('index'), "error": error}
+            checked += 1
+            last_index, prev_hash = doc['index'], block_hash
+        batch = next_batch
+
+    if checked:
+        await _save_checkpoint(last_index, prev_hash)
+    return {"valid": True, "checked": checked, "index": None, "error": None}
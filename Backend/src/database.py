@@ -1,27 +1,83 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import MongoClient
+from pymongo import ReturnDocument
+from pymongo.errors import CollectionInvalid
 from bson import ObjectId
-from datetime import datetime
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+import asyncio
+import base64
+import hashlib
+import importlib.util
+import json
 import os
+import socket
+import time
 from dotenv import load_dotenv
+from .events import block_event, hub
+from .indexes import ensure_indexes_async
+from .logs import logger, timed_db
+from .metrics import Counter, Gauge, mongo_listeners
+from .storage import ENGINES
+from .storage.mongo import MongoStorage
+from .storage.sqlite import SQLiteStorage
 
 load_dotenv()
 
 # MongoDB connection
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
 MONGO_DB_NAME = os.getenv('MONGO_DB_NAME', 'financechain')
+# Connection pool và tuỳ chọn driver; để trống thì dùng giá trị trong MONGO_URI / mặc định của driver
+MONGO_MAX_POOL_SIZE = os.getenv('MONGO_MAX_POOL_SIZE', '100')
+MONGO_MIN_POOL_SIZE = os.getenv('MONGO_MIN_POOL_SIZE', '0')
+MONGO_MAX_IDLE_TIME_MS = os.getenv('MONGO_MAX_IDLE_TIME_MS', '')
+MONGO_WAIT_QUEUE_TIMEOUT_MS = os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '')
+MONGO_CONNECT_TIMEOUT_MS = os.getenv('MONGO_CONNECT_TIMEOUT_MS', '10000')
+MONGO_SOCKET_TIMEOUT_MS = os.getenv('MONGO_SOCKET_TIMEOUT_MS', '')
+MONGO_SERVER_SELECTION_TIMEOUT_MS = os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '10000')
+MONGO_COMPRESSORS = os.getenv('MONGO_COMPRESSORS', '')  # ví dụ: zstd,snappy,zlib
+MONGO_READ_PREFERENCE = os.getenv('MONGO_READ_PREFERENCE', '')  # primary | primaryPreferred | secondaryPreferred ...
+MONGO_WRITE_CONCERN = os.getenv('MONGO_WRITE_CONCERN', '')  # 1 | majority
+MONGO_JOURNAL = os.getenv('MONGO_JOURNAL', '')  # 1 | 0
+# Tạo index còn thiếu khi khởi động (tắt bằng MONGO_AUTO_INDEX=0, dùng scripts/manage_indexes.py)
+MONGO_AUTO_INDEX = os.getenv('MONGO_AUTO_INDEX', '1') != '0'
+# Cache response GET trong process (CACHE_TTL_S=0 để tắt)
+CACHE_TTL_S = float(os.getenv('CACHE_TTL_S', '30'))
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '1024'))
+CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+# Số worker process (uvicorn --workers đọc cùng biến này). Nhiều worker thì
+# invalidate cache được đồng bộ qua MongoDB, trễ tối đa CACHE_SYNC_INTERVAL_S
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+CACHE_SHARED = os.getenv('CACHE_SHARED', '1' if WEB_CONCURRENCY > 1 else '0') != '0'
+CACHE_SYNC_INTERVAL_S = float(os.getenv('CACHE_SYNC_INTERVAL_S', '0.5'))
+# Lock giữa các process (seed lúc khởi động); tự hết hạn nếu process giữ lock chết
+LOCK_TTL_S = float(os.getenv('LOCK_TTL_S', '60'))
+CHAIN_LOCK_POLL_S = float(os.getenv('CHAIN_LOCK_POLL_S', '0.05'))
+# Cách lưu giao dịch trong block mới: 'embedded' (chép cả document vào blocks.transactions)
+# hoặc 'reference' (chỉ tx_ids + merkle_root, đọc lại từ collection transactions).
+# Đổi layout của dữ liệu đã có bằng scripts/migrate_block_layout.py
+BLOCK_LAYOUT = os.getenv('BLOCK_LAYOUT', 'embedded')
+if BLOCK_LAYOUT not in ('embedded', 'reference'):
+    raise ValueError(f'BLOCK_LAYOUT must be embedded or reference, got {BLOCK_LAYOUT!r}')
 
-# Async client for FastAPI
-async_client = None
-async_db = None
+# Engine lưu trữ (src/storage/): mongo, hoặc sqlite (một file WAL, không cần MongoDB) cho triển khai một node
+STORAGE_ENGINE = os.getenv('STORAGE_ENGINE', 'mongo')
+if STORAGE_ENGINE not in ENGINES:
+    raise ValueError(f'STORAGE_ENGINE must be one of {", ".join(ENGINES)}, got {STORAGE_ENGINE!r}')
+SQLITE_PATH = os.getenv('SQLITE_PATH', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                    'data', 'financechain.db'))
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')  # NORMAL | FULL
 
-# Sync client for initial setup
-sync_client = None
-sync_db = None
+# Thư viện nén mà driver cần cho từng compressor (zlib có sẵn)
+COMPRESSOR_MODULES = {'zstd': 'zstandard', 'snappy': 'snappy', 'zlib': None}
 
 
 def to_serializable(doc):
-    """Convert ObjectId and datetime (including nested) to JSON-serializable values."""
+    """Convert ObjectId and datetime (including nested) to JSON-serializable values.
+
+    Read functions below return raw documents; responses encode them with
+    src.encoder.dumps instead. Kept for callers that need plain JSON values.
+    """
     if isinstance(doc, dict):
         new_doc = {}
         for key, value in doc.items():
@@ -38,125 +94,720 @@ def to_serializable(doc):
         return new_doc
     return doc
 
-def init_mongodb():
-    """Initialize MongoDB connection"""
-    global async_client, async_db, sync_client, sync_db
-    
-    # Async client for FastAPI endpoints
-    async_client = AsyncIOMotorClient(MONGO_URI)
-    async_db = async_client[MONGO_DB_NAME]
-    
-    # Sync client for startup operations
-    sync_client = MongoClient(MONGO_URI)
-    sync_db = sync_client[MONGO_DB_NAME]
-    
+
+class CacheEntry:
+    __slots__ = ('body', 'etag', 'tags', 'expires')
+
+    def __init__(self, body, etag, tags, expires):
+        self.body = body
+        self.etag = etag
+        self.tags = tags
+        self.expires = expires
+
+
+class ResponseCache:
+    """Read-through cache of serialized response bodies with TTL, LRU and size limits.
+
+    Mỗi entry gắn các tag (ví dụ 'chain', 'payments', 'payment:<id>'); hàm ghi
+    gọi invalidate(tag) để xoá đúng các entry bị ảnh hưởng. Mỗi tag có một
+    generation: put() bỏ qua kết quả đọc từ DB nếu có ghi xen vào giữa lúc
+    snapshot() và put(), nên cache không giữ dữ liệu cũ.
+
+    Khi chạy nhiều worker, invalidate() còn ghi lại họ tag (phần trước dấu
+    ':', ví dụ 'payment' cho 'payment:<id>') vào `dirty`; CacheEpochSync
+    đẩy chúng lên MongoDB và gọi invalidate_family() ở các worker khác.
+    """
+
+    def __init__(self, ttl=CACHE_TTL_S, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._tag_keys = {}
+        self._generations = {}
+        self._family_generations = {}
+        self.dirty = set()
+        self.track_dirty = False
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    @staticmethod
+    def make_etag(body):
+        return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+    def get(self, key):
+        """Fresh entry for key (marked most recently used), or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires <= time.monotonic():
+            self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    @staticmethod
+    def family(tag):
+        return tag.partition(':')[0]
+
+    def snapshot(self, tags):
+        """Generations of `tags`; pass to put() to detect writes during the read"""
+        return tuple(self._generations.get(tag, 0) + self._family_generations.get(self.family(tag), 0)
+                     for tag in tags)
+
+    def put(self, key, body, tags, snapshot=None):
+        """Store body under key; returns the entry (also when it was not cached)"""
+        entry = CacheEntry(body, self.make_etag(body), tuple(tags), time.monotonic() + self.ttl)
+        if not self.enabled or len(body) > self.max_bytes:
+            return entry
+        if snapshot is not None and snapshot != self.snapshot(entry.tags):
+            return entry
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = entry
+        self._bytes += len(body)
+        for tag in entry.tags:
+            self._tag_keys.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+        return entry
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of `tags`"""
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            for key in list(self._tag_keys.get(tag, ())):
+                self._drop(key)
+            if self.track_dirty:
+                self.dirty.add(self.family(tag))
+
+    def invalidate_family(self, family):
+        """Drop every entry tagged with `family` or `family:<anything>` (a write in another worker)"""
+        self._family_generations[family] = self._family_generations.get(family, 0) + 1
+        for tag in [t for t in self._tag_keys if self.family(t) == family]:
+            for key in list(self._tag_keys.get(tag, ())):
+                self._drop(key)
+
+    def clear(self):
+        self.invalidate(*list(self._tag_keys))
+        self._entries.clear()
+        self._bytes = 0
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._tag_keys.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_keys[tag]
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+response_cache = ResponseCache()
+
+Gauge('financechain_response_cache_entries', 'Responses held in the cache', callback=lambda: len(response_cache._entries))
+Gauge('financechain_response_cache_bytes', 'Bytes of cached response bodies', callback=lambda: response_cache._bytes)
+Counter('financechain_response_cache_lookups_total', 'Response cache lookups by result', ('result',),
+        callback=lambda: {('hit',): response_cache.hits, ('miss',): response_cache.misses})
+Counter('financechain_response_cache_evictions_total', 'Entries evicted for the size limits',
+        callback=lambda: response_cache.evictions)
+
+CHAIN_TAG = 'chain'
+PAYMENTS_TAG = 'payments'
+
+
+def payment_tag(payment_id):
+    return f'payment:{payment_id}'
+
+def _available_compressors(spec):
+    """Compressors from a comma list whose library is installed, in order"""
+    names = []
+    for name in (n.strip() for n in spec.split(',')):
+        if not name:
+            continue
+        module = COMPRESSOR_MODULES.get(name, name)
+        if module is not None and importlib.util.find_spec(module) is None:
+            logger.warning('mongo compressor unavailable', extra={'fields': {'compressor': name, 'module': module}})
+            continue
+        names.append(name)
+    return names
+
+
+def client_options(**overrides):
+    """Keyword options for AsyncIOMotorClient built from the MONGO_* settings.
+
+    Giá trị rỗng không được truyền, để tuỳ chọn trong MONGO_URI (nếu có)
+    hoặc mặc định của driver có hiệu lực.
+    """
+    options = {'appname': 'financechain'}
+    for key, value in (('maxPoolSize', MONGO_MAX_POOL_SIZE), ('minPoolSize', MONGO_MIN_POOL_SIZE),
+                       ('maxIdleTimeMS', MONGO_MAX_IDLE_TIME_MS), ('waitQueueTimeoutMS', MONGO_WAIT_QUEUE_TIMEOUT_MS),
+                       ('connectTimeoutMS', MONGO_CONNECT_TIMEOUT_MS), ('socketTimeoutMS', MONGO_SOCKET_TIMEOUT_MS),
+                       ('serverSelectionTimeoutMS', MONGO_SERVER_SELECTION_TIMEOUT_MS)):
+        if value != '':
+            options[key] = int(value)
+    compressors = _available_compressors(MONGO_COMPRESSORS)
+    if compressors:
+        options['compressors'] = ','.join(compressors)
+    if MONGO_READ_PREFERENCE:
+        options['readPreference'] = MONGO_READ_PREFERENCE
+    if MONGO_WRITE_CONCERN:
+        options['w'] = int(MONGO_WRITE_CONCERN) if MONGO_WRITE_CONCERN.isdigit() else MONGO_WRITE_CONCERN
+    if MONGO_JOURNAL:
+        options['journal'] = MONGO_JOURNAL != '0'
+    options.update(overrides)
+    return options
+
+
+class MongoConnection:
+    """The process's single Motor client and database.
+
+    Mọi truy vấn (API, seed lúc khởi động, scripts) dùng chung một client và
+    pool của nó; không còn client đồng bộ riêng cho lúc khởi động.
+    """
+
+    def __init__(self):
+        self.client = None
+        self.db = None
+        self.options = {}
+
+    def connect(self, uri=MONGO_URI, db_name=MONGO_DB_NAME, **overrides):
+        self.options = client_options(**overrides)
+        self.client = AsyncIOMotorClient(uri, event_listeners=mongo_listeners('app'), **self.options)
+        self.db = self.client[db_name]
+        return self.db
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+        self.client = None
+        self.db = None
+
+
+connection = MongoConnection()
+
+Gauge('financechain_mongo_pool_max_size', 'Configured maxPoolSize of the Motor client',
+      callback=lambda: connection.options.get('maxPoolSize'))
+
+# Engine đang dùng (src/storage/); các hàm đọc/ghi bên dưới đều đi qua nó
+_storage = None
+
+
+async def init_mongodb(**overrides):
+    """Connect and create missing collections / indexes"""
+    db = connection.connect(**overrides)
+
     # Create collections if not exist
-    collections = sync_db.list_collection_names()
-    if 'transactions' not in collections:
-        sync_db.create_collection('transactions')
-    if 'blocks' not in collections:
-        sync_db.create_collection('blocks')
-    if 'payments' not in collections:
-        sync_db.create_collection('payments')
-    
-    print(f"✓ MongoDB connected: {MONGO_DB_NAME}")
-    return async_db, sync_db
+    collections = await db.list_collection_names()
+    for name in ('transactions', 'blocks', 'payments'):
+        if name not in collections:
+            try:
+                await db.create_collection(name)
+            except CollectionInvalid:
+                # Worker khác vừa tạo xong
+                pass
+
+    global _storage
+    _storage = MongoStorage(db, BLOCK_LAYOUT)
+
+    if MONGO_AUTO_INDEX:
+        for coll_name, errors in (await ensure_indexes_async(db)).items():
+            for error in errors:
+                logger.warning('index not created', extra={'fields': {'collection': coll_name, 'error': error}})
+
+    logger.info('mongodb connected', extra={'fields': {
+        'db': MONGO_DB_NAME, 'max_pool_size': connection.options.get('maxPoolSize'),
+        'compressors': connection.options.get('compressors')}})
+    return db
 
 def get_async_db():
     """Get async database instance"""
-    return async_db
-
-def get_sync_db():
-    """Get sync database instance"""
-    return sync_db
+    return connection.db
 
 async def close_mongodb():
     """Close MongoDB connection"""
-    if async_client:
-        async_client.close()
-    if sync_client:
-        sync_client.close()
+    global _storage
+    connection.close()
+    if isinstance(_storage, MongoStorage):
+        _storage = None
+
+
+async def init_storage(engine=STORAGE_ENGINE, sqlite_path=SQLITE_PATH, **overrides):
+    """Open the configured storage engine; `overrides` go to init_mongodb for the mongo engine"""
+    global _storage
+    if engine == 'mongo':
+        await init_mongodb(**overrides)
+        return _storage
+    if WEB_CONCURRENCY > 1 or CACHE_SHARED:
+        # Một file SQLite chỉ có một process ghi; cache giữa các worker lại đồng bộ qua MongoDB
+        raise ValueError('STORAGE_ENGINE=sqlite runs a single worker process (WEB_CONCURRENCY=1, CACHE_SHARED=0)')
+    _storage = await SQLiteStorage(sqlite_path, SQLITE_SYNCHRONOUS).open()
+    logger.info('sqlite storage opened', extra={'fields': {'path': sqlite_path}})
+    return _storage
+
+def get_storage():
+    """Storage engine opened by init_storage() (or init_mongodb())"""
+    return _storage
+
+async def close_storage():
+    """Close the storage engine opened by init_storage()"""
+    global _storage
+    if isinstance(_storage, MongoStorage):
+        await close_mongodb()
+    elif _storage is not None:
+        await _storage.close()
+        _storage = None
+
+
+# Phối hợp giữa các worker process qua storage (MongoDB khi chạy nhiều worker, không cần broker)
+LOCK_OWNER = f'{socket.gethostname()}:{os.getpid()}'
+CACHE_EPOCH_ID = 'cache'
+
+
+async def acquire_lock(name, ttl=LOCK_TTL_S, owner=LOCK_OWNER):
+    """Take or renew lock `name` (`locks` collection / table); False if another owner holds it"""
+    return await get_storage().acquire_lock(name, owner, ttl)
+
+
+async def release_lock(name, owner=LOCK_OWNER):
+    await get_storage().release_lock(name, owner)
+
+
+@asynccontextmanager
+async def mongo_lock(name, ttl=LOCK_TTL_S, poll=0.5):
+    """Hold `name` across worker processes, waiting while another process holds it"""
+    waited = False
+    while not await acquire_lock(name, ttl):
+        if not waited:
+            logger.info('waiting for lock', extra={'fields': {'lock': name}})
+            waited = True
+        await asyncio.sleep(poll)
+
+    async def renew():
+        while True:
+            await asyncio.sleep(ttl / 3)
+            try:
+                if not await acquire_lock(name, ttl):
+                    logger.warning('lock lost', extra={'fields': {'lock': name}})
+            except Exception:
+                logger.exception('lock renewal failed', extra={'fields': {'lock': name}})
+
+    renewer = asyncio.create_task(renew())
+    try:
+        yield
+    finally:
+        renewer.cancel()
+        await release_lock(name)
+
+
+# Lock của storage coi cùng owner là gia hạn, nên task trong cùng process phải xếp hàng qua asyncio.Lock
+_chain_append = asyncio.Lock()
+
+
+@asynccontextmanager
+async def chain_lock():
+    """Hold the chain tip while appending blocks (block producer and bulk ingest), across tasks and processes"""
+    async with _chain_append:
+        async with mongo_lock('chain', poll=CHAIN_LOCK_POLL_S):
+            yield
+
+
+class CacheEpochSync:
+    """Carry response cache invalidations between worker processes through MongoDB.
+
+    Document {_id: 'cache', <họ tag>: n} trong collection `epochs`: mỗi
+    CACHE_SYNC_INTERVAL_S, worker $inc các họ tag nó đã invalidate rồi đọc
+    lại document; họ nào tăng nhiều hơn phần của mình là do worker khác ghi,
+    nên xoá các entry thuộc họ đó. Một round-trip mỗi chu kỳ, không thêm gì
+    vào request.
+    """
+
+    def __init__(self, cache, interval=CACHE_SYNC_INTERVAL_S):
+        self.cache = cache
+        self.interval = interval
+        self._seen = None
+        self._task = None
+
+    def start(self):
+        self.cache.track_dirty = True
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.cache.track_dirty = False
+        # Đẩy nốt các invalidate cuối cùng cho worker khác
+        await self.sync()
+
+    async def sync(self):
+        """Publish local invalidations and apply remote ones; returns the families dropped"""
+        db = get_async_db()
+        dirty, self.cache.dirty = self.cache.dirty, set()
+        try:
+            if dirty:
+                doc = await db.epochs.find_one_and_update(
+                    {'_id': CACHE_EPOCH_ID}, {'$inc': {family: 1 for family in dirty}},
+                    upsert=True, return_document=ReturnDocument.AFTER,
+                )
+            else:
+                doc = await db.epochs.find_one({'_id': CACHE_EPOCH_ID}) or {}
+        except Exception:
+            self.cache.dirty |= dirty
+            raise
+        doc.pop('_id', None)
+        changed = []
+        if self._seen is not None:
+            for family, value in doc.items():
+                if value != self._seen.get(family, 0) + (1 if family in dirty else 0):
+                    self.cache.invalidate_family(family)
+                    changed.append(family)
+        self._seen = doc
+        return changed
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception('cache epoch sync failed')
+            await asyncio.sleep(self.interval)
+
+
+cache_sync = CacheEpochSync(response_cache)
 
 # Transaction operations
+@timed_db
 async def save_transaction(transaction_data):
-    """Save transaction to MongoDB"""
-    db = get_async_db()
+    """Save one transaction; returns its id"""
     transaction_data['created_at'] = datetime.utcnow()
-    result = await db.transactions.insert_one(transaction_data)
-    return str(result.inserted_id)
+    ids = await get_storage().insert_transactions([transaction_data])
+    response_cache.invalidate(CHAIN_TAG)
+    return ids[0]
+
+@timed_db
+async def save_transactions(transactions):
+    """Save many transactions in one unordered insert; returns their ids"""
+    now = datetime.utcnow()
+    for tx in transactions:
+        tx['created_at'] = now
+    try:
+        return await get_storage().insert_transactions(transactions)
+    finally:
+        # Insert không ordered có thể ghi được một phần trước khi lỗi
+        response_cache.invalidate(CHAIN_TAG)
+
+@timed_db
+async def delete_transactions(transaction_ids):
+    """Delete transactions by id (e.g. ones written for a block that was never stored)"""
+    if not transaction_ids:
+        return 0
+    try:
+        return await get_storage().delete_transactions(transaction_ids)
+    finally:
+        response_cache.invalidate(CHAIN_TAG)
+
+@timed_db
+async def get_transaction(transaction_id):
+    """Get a single transaction by id"""
+    return await get_storage().get_transaction(transaction_id)
 
 # Payment operations
+@timed_db
 async def save_payment(payment_data):
-    """Save a payment request to MongoDB"""
-    db = get_async_db()
+    """Save a payment request"""
     payment_data['created_at'] = datetime.utcnow()
-    result = await db.payments.insert_one(payment_data)
-    return str(result.inserted_id)
+    payment_id = await get_storage().insert_payment(payment_data)
+    response_cache.invalidate(PAYMENTS_TAG)
+    return payment_id
 
+@timed_db
 async def get_all_payments():
-    """Get all payments from MongoDB"""
-    db = get_async_db()
-    cursor = db.payments.find().sort('created_at', -1)
-    payments = []
-    async for doc in cursor:
-        payments.append(to_serializable(doc))
-    return payments
+    """Get all payments, newest first"""
+    return await get_storage().list_payments()
 
+@timed_db
 async def get_payment(payment_id):
     """Get a single payment by id"""
-    db = get_async_db()
-    try:
-        doc = await db.payments.find_one({'_id': ObjectId(payment_id)})
-    except Exception:
-        return None
-    return to_serializable(doc) if doc else None
+    return await get_storage().get_payment(payment_id)
 
+@timed_db
 async def update_payment(payment_id, update_dict):
     """Update payment document"""
-    db = get_async_db()
     try:
-        res = await db.payments.update_one({'_id': ObjectId(payment_id)}, {'$set': update_dict})
-    except Exception:
+        modified = await get_storage().update_payments([(payment_id, update_dict)])
+    except ValueError:
         return False
-    return res.modified_count > 0
+    if modified:
+        response_cache.invalidate(PAYMENTS_TAG, payment_tag(payment_id))
+        if 'status' in update_dict:
+            hub.publish_local('payment', {'payment_id': payment_id, **update_dict})
+    return modified > 0
+
+@timed_db
+async def transition_payment(payment_id, status, update_dict):
+    """Apply update_dict only if the payment is still in `status`; returns True if it was"""
+    changed = await get_storage().update_payment_if(payment_id, status, update_dict)
+    if changed:
+        response_cache.invalidate(PAYMENTS_TAG, payment_tag(payment_id))
+        if 'status' in update_dict:
+            hub.publish_local('payment', {'payment_id': payment_id, **update_dict})
+    return changed
 
+@timed_db
+async def update_payments(updates):
+    """Apply many (payment_id, update_dict) pairs in one bulk write"""
+    if not updates:
+        return 0
+    try:
+        modified = await get_storage().update_payments(updates)
+    finally:
+        response_cache.invalidate(PAYMENTS_TAG, *[payment_tag(pid) for pid, _ in updates])
+    for pid, update in updates:
+        if 'status' in update:
+            hub.publish_local('payment', {'payment_id': pid, **update})
+    return modified
+
+@timed_db
 async def get_all_transactions():
-    """Get all transactions from MongoDB"""
-    db = get_async_db()
-    cursor = db.transactions.find().sort('created_at', -1)
-    transactions = []
-    async for doc in cursor:
-        transactions.append(to_serializable(doc))
-    return transactions
-
-async def clear_transactions():
-    """Clear all pending transactions"""
-    db = get_async_db()
-    await db.transactions.delete_many({'mined': False})
+    """Get all transactions, newest first (without signed_message)"""
+    return await get_storage().list_transactions()
+
+def encode_cursor(position):
+    """Encode a pagination position as an opaque URL-safe token"""
+    raw = json.dumps(position, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Decode a token produced by encode_cursor; raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        position = json.loads(raw)
+    except Exception:
+        raise ValueError('invalid cursor')
+    if not isinstance(position, dict):
+        raise ValueError('invalid cursor')
+    return position
+
+@timed_db
+async def get_transactions_page(limit, after=None, filters=None):
+    """Get one page of transactions, newest first, after keyset position `after`.
+
+    `filters` may hold sender, recipient, mined, since and until (see Storage.transactions_page).
+    Returns (transactions, next_position); next_position is None on the last page.
+    """
+    return await get_storage().transactions_page(limit, after, filters)
+
+@timed_db
+async def hydrate_blocks(blocks, full=False):
+    """Fill `transactions` of reference-layout blocks from one batched read of transactions.
+
+    Embedded blocks are left as they are, so a store holding both layouts
+    (e.g. during a migration) reads the same. Without `full` signed_message is
+    left out, as in the list endpoints. Returns `blocks`.
+    """
+    return await get_storage().hydrate_blocks(blocks, full)
+
+@timed_db
+async def get_blocks_page(limit, after_index=None, sender=None, recipient=None, since=None, until=None):
+    """Get one page of blocks in ascending index order, after block index `after_index`.
+
+    sender/recipient keep blocks with a transaction from/to that account and
+    since/until (naive UTC datetimes) filter on the block timestamp.
+    Returns (blocks, next_index); next_index is None on the last page.
+    """
+    if after_index is not None and not isinstance(after_index, int):
+        raise ValueError('invalid cursor')
+    return await get_storage().blocks_page(limit, after_index, sender, recipient, since, until)
+
+@timed_db
+async def expire_pending_transactions(max_age):
+    """Delete unmined transactions older than `max_age` seconds; returns how many.
+
+    Giao dịch đang chờ nằm trong mempool của producer; dòng mined=False đã
+    lưu chỉ còn từ đường ghi cũ. Dòng không có created_at cũng bị xoá.
+    """
+    deleted = await get_storage().delete_pending_transactions(datetime.utcnow() - timedelta(seconds=max_age))
+    if deleted:
+        response_cache.invalidate(CHAIN_TAG)
+    return deleted
 
 # Block operations
-async def save_block(block_data):
-    """Save block to MongoDB"""
-    db = get_async_db()
+@timed_db
+async def save_block(block_data, transactions=None):
+    """Save a block; raises storage.DuplicateKeyError if its index is taken.
+
+    `transactions` are the documents a reference-layout block points to; they
+    are used for the stream event and rollups instead of reading them back.
+    """
     block_data['created_at'] = datetime.utcnow()
-    result = await db.blocks.insert_one(block_data)
-    return str(result.inserted_id)
-
-async def get_all_blocks():
-    """Get all blocks from MongoDB"""
-    db = get_async_db()
-    cursor = db.blocks.find().sort('index', 1)
-    blocks = []
-    async for doc in cursor:
-        blocks.append(to_serializable(doc))
-    return blocks
-
-def get_block_count_sync():
-    """Get block count (sync version for startup)"""
-    db = get_sync_db()
-    return db.blocks.count_documents({})
+    block_id = await get_storage().insert_block(block_data)
+    response_cache.invalidate(CHAIN_TAG)
+    full = {**block_data, 'transactions': transactions} if transactions is not None else block_data
+    hub.publish_local('block', block_event(full), block_data.get('index'))
+    await apply_rollups(full)
+    return block_id
 
+@timed_db
 async def get_block_count():
     """Get block count"""
-    db = get_async_db()
-    return await db.blocks.count_documents({})
+    return await get_storage().count_blocks()
+
+# Analytics (aggregated by the storage engine; only totals leave it)
+STATS_BUCKET_FORMATS = {'day': '%Y-%m-%d', 'month': '%Y-%m'}
+
+@timed_db
+async def get_stats_totals():
+    """Transaction count, volume and pending count across the whole ledger"""
+    return await get_storage().stats_totals()
+
+@timed_db
+async def get_account_stats(account):
+    """Sent / received count and total for one account (uses the sender/recipient indexes)"""
+    storage = get_storage()
+    result = {'account': account}
+    for field, key in (('sender', 'sent'), ('recipient', 'received')):
+        result[key] = await storage.account_totals(field, account)
+    result['net'] = result['received']['total'] - result['sent']['total']
+    return result
+
+@timed_db
+async def get_top_accounts(field, limit=5):
+    """Top accounts by total amount, grouped on `sender` or `recipient`"""
+    return await get_storage().top_accounts(field, limit)
+
+@timed_db
+async def get_time_buckets(interval='day', since=None, until=None):
+    """Count and volume per day/month of created_at, oldest first"""
+    return await get_storage().time_buckets(STATS_BUCKET_FORMATS[interval], since, until)
+
+# Materialized balances / daily rollups, maintained with increment upserts from save_block.
+# balances: {_id: account, received, sent, count_in, count_out}
+# rollups:  {_id: 'YYYY-MM-DD' (UTC day of the block timestamp), count, volume, blocks}
+# Only mined transactions (those inside a block) are counted.
+ROLLUP_BATCH_SIZE = int(os.getenv('ROLLUP_BATCH_SIZE', '1000'))
+
+def _as_amount(value):
+    """Numeric amount of a transaction, or None if it is not a number"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _block_day(block):
+    return datetime.utcfromtimestamp(block.get('timestamp') or 0).strftime('%Y-%m-%d')
+
+def _accumulate_block(block, balances, days):
+    """Add one block's transactions to in-memory balance/day deltas"""
+    day = days.setdefault(_block_day(block), {'count': 0, 'volume': 0, 'blocks': 0})
+    day['blocks'] += 1
+    for tx in block.get('transactions', []):
+        amount = _as_amount(tx.get('amount'))
+        if amount is None:
+            continue
+        day['count'] += 1
+        day['volume'] += amount
+        sender, recipient = tx.get('sender'), tx.get('recipient')
+        if sender is not None:
+            acc = balances.setdefault(sender, {'received': 0, 'sent': 0, 'count_in': 0, 'count_out': 0})
+            acc['sent'] += amount
+            acc['count_out'] += 1
+        if recipient is not None:
+            acc = balances.setdefault(recipient, {'received': 0, 'sent': 0, 'count_in': 0, 'count_out': 0})
+            acc['received'] += amount
+            acc['count_in'] += 1
+
+@timed_db
+async def apply_rollups(block):
+    """Apply a block's transactions to balances and rollups with increment upserts"""
+    balances, days = {}, {}
+    _accumulate_block(block, balances, days)
+    await get_storage().apply_rollups(balances, days)
+
+@timed_db
+async def get_balance(account):
+    """Materialized balance of one account (O(1) read)"""
+    doc = await get_storage().get_balance(account)
+    if not doc:
+        return None
+    doc['account'] = account
+    doc['balance'] = doc.get('received', 0) - doc.get('sent', 0)
+    return doc
+
+@timed_db
+async def get_daily_rollups(since=None, until=None):
+    """Daily rollups with since <= day < until (days as 'YYYY-MM-DD')"""
+    return await get_storage().daily_rollups(since, until)
+
+@timed_db
+async def compute_rollups(batch_size=ROLLUP_BATCH_SIZE):
+    """Recompute balances and daily rollups from the stored blocks, streaming in batches"""
+    balances, days = {}, {}
+    async for batch in get_storage().iter_blocks(batch_size=batch_size, tx_fields=('sender', 'recipient', 'amount')):
+        for block in batch:
+            _accumulate_block(block, balances, days)
+    return balances, days
+
+@timed_db
+async def rebuild_rollups(batch_size=ROLLUP_BATCH_SIZE):
+    """Rebuild balances/rollups from blocks; the engine swaps the new values in at once.
+
+    Blocks written while the rebuild runs are not included; run check_rollups() afterwards.
+    """
+    balances, days = await compute_rollups(batch_size)
+    await get_storage().replace_rollups(balances, days, batch_size)
+    return {'accounts': len(balances), 'days': len(days)}
+
+def _same_numbers(stored, expected, fields):
+    return all(abs((stored or {}).get(f, 0) - expected.get(f, 0)) < 1e-6 for f in fields)
+
+@timed_db
+async def check_rollups(batch_size=ROLLUP_BATCH_SIZE):
+    """Compare stored balances/rollups with a full recomputation; returns the mismatches"""
+    balances, days = await compute_rollups(batch_size)
+    stored_balances, stored_days = await get_storage().load_rollups()
+    mismatches = []
+    for name, stored_docs, expected_docs, fields in (
+        ('balances', stored_balances, balances, ('received', 'sent', 'count_in', 'count_out')),
+        ('rollups', stored_days, days, ('count', 'volume', 'blocks')),
+    ):
+        for key, doc in stored_docs.items():
+            expected = expected_docs.get(key, {})
+            if not _same_numbers(doc, expected, fields):
+                mismatches.append({'collection': name, 'key': key, 'stored': {f: doc.get(f) for f in fields},
+                                   'expected': {f: expected.get(f, 0) for f in fields}})
+        for key in expected_docs.keys() - stored_docs.keys():
+            mismatches.append({'collection': name, 'key': key, 'stored': None, 'expected': expected_docs[key]})
+    return mismatches
@@ -0,0 +1,57 @@
+"""Encode response JSON trực tiếp từ document MongoDB.
+
+Thay cho to_serializable() (dựng lại toàn bộ dict/list để đổi ObjectId và
+datetime thành chuỗi) rồi json.dumps: dumps() đổi các kiểu BSON ngay trong
+lúc encode, không tạo bản sao trung gian. Dùng orjson nếu đã cài, nếu không
+thì json của thư viện chuẩn với cùng định dạng output.
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson là tuỳ chọn
+    orjson = None
+
+
+def bson_default(value):
+    """Encode the BSON types json/orjson do not know natively"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.hex()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    def dumps(obj):
+        """Serialize obj (Mongo documents included) to compact UTF-8 JSON bytes"""
+        # orjson tự encode datetime giống isoformat(); chỉ ObjectId & co. qua default
+        return orjson.dumps(obj, default=bson_default)
+else:
+    _encoder = json.JSONEncoder(
+        ensure_ascii=False, allow_nan=False, separators=(',', ':'), default=bson_default,
+    )
+
+    def dumps(obj):
+        """Serialize obj (Mongo documents included) to compact UTF-8 JSON bytes"""
+        return _encoder.encode(obj).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that accepts raw Mongo documents and renders them with dumps()"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
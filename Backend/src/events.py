@@ -0,0 +1,96 @@
+"""Phát sự kiện (block mới, trạng thái payment) tới các subscriber của /api/stream.
+
+EventHub là pub/sub trong process: mỗi sự kiện được mã hoá thành một
+frame SSE đúng một lần rồi đưa vào hàng đợi có giới hạn của từng
+subscriber. Subscriber đọc chậm làm đầy hàng đợi thì bị đánh dấu `lagged`
+và bỏ qua sự kiện mới, thay vì giữ bộ nhớ không giới hạn; stream sẽ đọc
+lại block còn thiếu từ MongoDB (xem src/stream.py).
+
+Nguồn sự kiện là change stream của MongoDB khi có replica set, nếu không
+thì save_block()/update_payment() gọi publish_local() trong chính worker.
+"""
+
+import asyncio
+import os
+
+from .encoder import dumps
+from .metrics import Counter, Gauge
+
+STREAM_QUEUE_SIZE = int(os.getenv('STREAM_QUEUE_SIZE', '256'))
+STREAM_MAX_SUBSCRIBERS = int(os.getenv('STREAM_MAX_SUBSCRIBERS', '10000'))
+
+
+def sse_frame(event, data, event_id=None):
+    """One Server-Sent Events frame (bytes); `data` is JSON-encoded on one line"""
+    head = f'id: {event_id}\n' if event_id is not None else ''
+    return (head + f'event: {event}\n').encode() + b'data: ' + dumps(data) + b'\n\n'
+
+
+class Subscription:
+    __slots__ = ('queue', 'lagged')
+
+    def __init__(self, size):
+        self.queue = asyncio.Queue(maxsize=size)
+        self.lagged = False
+
+
+class EventHub:
+    def __init__(self, queue_size=STREAM_QUEUE_SIZE, max_subscribers=STREAM_MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        # 'local' (save_block/update_payment phát trực tiếp) hoặc 'changestream'
+        self.source = 'local'
+        self.published = 0
+        self.dropped = 0
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    def subscribe(self):
+        """New subscription, or None when max_subscribers is reached"""
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        sub = Subscription(self.queue_size)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        self._subscribers.discard(sub)
+
+    def publish(self, kind, data, event_id=None):
+        """Send one event to every subscriber; (kind, event_id, frame) is what they receive"""
+        if not self._subscribers:
+            return
+        item = (kind, event_id, sse_frame(kind, data, event_id))
+        self.published += 1
+        for sub in self._subscribers:
+            if sub.lagged:
+                continue
+            try:
+                sub.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                sub.lagged = True
+                self.dropped += 1
+
+    def publish_local(self, kind, data, event_id=None):
+        """Publish from a write path; ignored while a change stream is the source"""
+        if self.source == 'local':
+            self.publish(kind, data, event_id)
+
+
+hub = EventHub()
+
+Gauge('financechain_stream_subscribers', 'Open /api/stream connections', callback=lambda: hub.subscribers)
+Counter('financechain_stream_events_total', 'Events published to stream subscribers', callback=lambda: hub.published)
+Counter('financechain_stream_dropped_total', 'Subscribers that fell behind and were resynced from MongoDB',
+        callback=lambda: hub.dropped)
+
+
+def block_event(block):
+    """Event payload for a block document: no signed_message, like the block list endpoints"""
+    event = {k: v for k, v in block.items() if k != 'transactions'}
+    event['transactions'] = [{k: v for k, v in tx.items() if k != 'signed_message'}
+                             for tx in block.get('transactions', [])]
+    return event
@@ -0,0 +1,43 @@
+"""Xuất toàn bộ blocks / transactions dạng NDJSON (mỗi document một dòng).
+
+Đọc từ storage (Storage.export_batches) theo từng lô `batch_size` và yield từng khối
+bytes, nên bộ nhớ dùng chỉ phụ thuộc kích thước lô chứ không phụ thuộc số
+block. Dùng chung cho GET /api/export/* và scripts/export_data.py.
+"""
+
+import os
+import zlib
+
+from .database import get_storage
+from .encoder import dumps
+
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+MAX_EXPORT_BATCH_SIZE = 10000
+
+# Blocks xuất theo index, transactions theo _id (đều đi theo index có sẵn)
+EXPORT_COLLECTIONS = ('blocks', 'transactions')
+
+
+def encode_batch(docs):
+    """NDJSON bytes for a list of documents"""
+    return b''.join(dumps(doc) + b'\n' for doc in docs)
+
+
+async def iter_ndjson(collection, filters=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yield NDJSON chunks of up to `batch_size` documents from `collection`.
+
+    `filters` may hold after_index (blocks) or mined (transactions).
+    """
+    batch_size = max(1, min(batch_size, MAX_EXPORT_BATCH_SIZE))
+    async for batch in get_storage().export_batches(collection, filters, batch_size):
+        yield encode_batch(batch)
+
+
+async def gzip_chunks(chunks, level=6):
+    """Compress a stream of byte chunks into one gzip member"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
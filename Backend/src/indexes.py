@@ -0,0 +1,130 @@
+"""Khai báo index MongoDB cho các truy vấn nóng và công cụ quản lý chúng.
+
+Mọi index cần thiết được khai báo một chỗ trong REQUIRED_INDEXES. Hàm
+ensure_indexes() (và ensure_indexes_async() dùng lúc khởi động) có thể
+chạy nhiều lần (idempotent): chỉ tạo index còn thiếu. index_report() liệt
+kê index thiếu / thừa / không được dùng, và explain_hot_queries() kiểm
+tra các truy vấn nóng chạy bằng IXSCAN.
+"""
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+REQUIRED_INDEXES = {
+    'transactions': [
+        # GET /api/transactions: keyset pagination theo (created_at, _id) giảm dần
+        IndexModel([('created_at', DESCENDING), ('_id', DESCENDING)], name='created_at_id'),
+        # Lọc theo người gửi / người nhận (API + thống kê trong scripts/view_data.py)
+        IndexModel([('sender', ASCENDING), ('created_at', DESCENDING)], name='sender_created_at'),
+        IndexModel([('recipient', ASCENDING), ('created_at', DESCENDING)], name='recipient_created_at'),
+        # expire_pending_transactions(): delete_many({'mined': False, 'created_at': ...}) lúc khởi động
+        IndexModel([('mined', ASCENDING)], name='mined'),
+    ],
+    'blocks': [
+        # Thứ tự chuỗi; unique để chặn trùng index khi ghi song song
+        IndexModel([('index', ASCENDING)], name='index_unique', unique=True),
+        # Tìm block chưa có hash (backfill lúc khởi động) / tra cứu block theo hash
+        IndexModel([('hash', ASCENDING)], name='hash'),
+    ],
+    'payments': [
+        IndexModel([('created_at', DESCENDING)], name='created_at'),
+    ],
+}
+
+# (collection, filter, sort) của các truy vấn nóng trong src/ và scripts/
+HOT_QUERIES = [
+    ('transactions', {}, [('created_at', DESCENDING), ('_id', DESCENDING)]),
+    ('transactions', {}, [('created_at', DESCENDING)]),
+    ('transactions', {'mined': False}, None),
+    ('transactions', {'sender': 'alice'}, [('created_at', DESCENDING)]),
+    ('transactions', {'recipient': 'bob'}, [('created_at', DESCENDING)]),
+    ('blocks', {}, [('index', ASCENDING)]),
+    ('blocks', {'index': {'$gt': 0}}, [('index', ASCENDING)]),
+    ('blocks', {'hash': None}, [('index', ASCENDING)]),
+    ('payments', {}, [('created_at', DESCENDING)]),
+]
+
+
+def _missing(models, existing):
+    return [m for m in models if m.document['name'] not in existing]
+
+
+def _index_error(errors, coll_name, model, e):
+    if isinstance(e, DuplicateKeyError):
+        # Dữ liệu cũ có giá trị trùng -> không tạo được unique index
+        errors.setdefault(coll_name, []).append(f"{model.document['name']}: duplicate keys ({e})")
+    else:
+        errors.setdefault(coll_name, []).append(f"{model.document['name']}: {e}")
+
+
+def ensure_indexes(db):
+    """Create every declared index that is missing; returns {collection: [errors]}"""
+    errors = {}
+    for coll_name, models in REQUIRED_INDEXES.items():
+        for model in _missing(models, db[coll_name].index_information()):
+            try:
+                db[coll_name].create_indexes([model])
+            except OperationFailure as e:
+                _index_error(errors, coll_name, model, e)
+    return errors
+
+
+async def ensure_indexes_async(db):
+    """ensure_indexes() for a Motor database (startup)"""
+    errors = {}
+    for coll_name, models in REQUIRED_INDEXES.items():
+        for model in _missing(models, await db[coll_name].index_information()):
+            try:
+                await db[coll_name].create_indexes([model])
+            except OperationFailure as e:
+                _index_error(errors, coll_name, model, e)
+    return errors
+
+
+def index_report(db):
+    """Report missing, undeclared and unused indexes per collection"""
+    report = {}
+    for coll_name, models in REQUIRED_INDEXES.items():
+        declared = {m.document['name'] for m in models}
+        existing = set(db[coll_name].index_information()) - {'_id_'}
+        unused = []
+        try:
+            for stat in db[coll_name].aggregate([{'$indexStats': {}}]):
+                if stat['name'] != '_id_' and stat.get('accesses', {}).get('ops', 0) == 0:
+                    unused.append(stat['name'])
+        except OperationFailure:
+            # $indexStats không khả dụng (quyền hạn hoặc phiên bản server)
+            unused = None
+        report[coll_name] = {
+            'missing': sorted(declared - existing),
+            'undeclared': sorted(existing - declared),
+            'unused': sorted(unused) if unused is not None else None,
+        }
+    return report
+
+
+def _plan_stages(plan):
+    """Collect every stage name in an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.append(plan['stage'])
+        for key in ('inputStage', 'queryPlan', 'winningPlan'):
+            if key in plan:
+                stages.extend(_plan_stages(plan[key]))
+        for child in plan.get('inputStages', []):
+            stages.extend(_plan_stages(child))
+    return stages
+
+
+def explain_hot_queries(db):
+    """Explain each hot query; returns a list of (collection, filter, sort, stages)"""
+    results = []
+    for coll_name, query, sort in HOT_QUERIES:
+        cursor = db[coll_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.limit(100).explain()
+        stages = _plan_stages(plan.get('queryPlanner', {}).get('winningPlan', {}))
+        results.append((coll_name, query, sort, stages))
+    return results
@@ -0,0 +1,385 @@
+"""Nạp dữ liệu hàng loạt: đọc stream JSON / NDJSON / CSV, gom thành block và ghi theo lô.
+
+Bản ghi được đọc dần từ file (không json.load cả file), đổi định dạng cũ
+owner/category/isIncome sang sender/recipient ngay khi đọc, rồi gom
+`block_size` giao dịch thành một block có liên kết hash. Mỗi vòng ghi
+`batch_blocks` block bằng một lần Storage.insert_blocks (với Mongo:
+insert_many không ordered, transactions và blocks ghi song song), và lưu
+checkpoint vào state `ingest_state` để chạy lại thì nạp tiếp từ chỗ dừng.
+Balances/rollups được tính lại một lần khi xong.
+
+Mỗi lô được nối vào đỉnh chuỗi dưới chain_lock(), lock dùng chung với block
+producer: đỉnh chuỗi (index, hash) đọc lại trong lock rồi cấp index đỉnh + 1
+trở đi, nên có thể chạy (vd. scripts/import_data.py) khi backend đang chạy;
+block của producer chỉ xen vào giữa hai lô.
+"""
+
+import asyncio
+import csv
+import gzip
+import hashlib
+import json
+import os
+import re
+import struct
+import time
+from datetime import datetime
+from itertools import islice
+
+from bson import ObjectId
+
+from .chain import attach_transactions, compute_block_hash, get_chain_tip
+from .database import CHAIN_TAG, chain_lock, get_storage, rebuild_rollups, response_cache
+from .logs import logger
+from .signatures import verifier
+
+INGEST_BLOCK_SIZE = int(os.getenv('INGEST_BLOCK_SIZE', '1000'))
+INGEST_BATCH_BLOCKS = int(os.getenv('INGEST_BATCH_BLOCKS', '20'))
+READ_CHUNK_SIZE = 1 << 20
+
+FORMATS = ('json', 'ndjson', 'csv')
+_WHITESPACE = re.compile(r'[ \t\r\n]*')
+_TRUE_STRINGS = {'1', 'true', 'yes', 'y', 'on'}
+
+
+# Đọc bản ghi
+
+def detect_format(path):
+    """Guess the input format from the file extension (.gz is looked through)"""
+    name = path[:-3] if path.endswith('.gz') else path
+    ext = os.path.splitext(name)[1].lower()
+    if ext in ('.ndjson', '.jsonl'):
+        return 'ndjson'
+    if ext == '.csv':
+        return 'csv'
+    return 'json'
+
+
+def open_source(path):
+    # newline='' để module csv tự xử lý xuống dòng trong ô
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def iter_json_array(f, chunk_size=READ_CHUNK_SIZE):
+    """Yield the elements of a top-level JSON array, reading `chunk_size` characters at a time.
+
+    A top-level object ({"transactions": [...]}, the old seed.json layout) is
+    loaded whole.
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = '', 0, False
+    expect = 'open'
+    while True:
+        pos = _WHITESPACE.match(buf, pos).end()
+        if pos == len(buf):
+            if eof:
+                break
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        ch = buf[pos]
+        if expect == 'open':
+            if ch == '{':
+                data = json.loads(buf[pos:] + f.read())
+                yield from data.get('transactions', [])
+                return
+            if ch != '[':
+                raise ValueError('expected a JSON array')
+            pos += 1
+            expect = 'first'
+        elif ch == ']' and expect in ('first', 'separator'):
+            return
+        elif expect == 'separator':
+            if ch != ',':
+                raise ValueError(f'expected "," in JSON array, got {ch!r}')
+            pos += 1
+            expect = 'item'
+        else:
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                obj, end = None, None
+            # Phần tử bị cắt ngang bởi ranh giới chunk (số ở cuối buffer cũng có thể chưa đủ)
+            if end is None or (end == len(buf) and not eof):
+                if eof:
+                    raise ValueError('invalid JSON array element')
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+            yield obj
+            pos = end
+            expect = 'separator'
+    raise ValueError('unterminated JSON array')
+
+
+def iter_ndjson(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_records(f, fmt):
+    """Yield raw records (dicts) from an open text file in format `fmt`"""
+    if fmt == 'ndjson':
+        return iter_ndjson(f)
+    if fmt == 'csv':
+        return csv.DictReader(f)
+    if fmt == 'json':
+        return iter_json_array(f)
+    raise ValueError(f'unknown format {fmt!r}, expected one of {", ".join(FORMATS)}')
+
+
+# Chuyển đổi bản ghi
+
+def _number(value):
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        text = str(value).strip()
+        return int(text) if re.fullmatch(r'-?\d+', text) else float(text)
+    except ValueError:
+        return None
+
+
+def _truthy(value):
+    if isinstance(value, str):
+        return value.strip().lower() in _TRUE_STRINGS
+    return bool(value)
+
+
+def _created_at(record):
+    created = record.get('created_at')
+    if isinstance(created, datetime):
+        return created
+    if isinstance(created, str) and created:
+        try:
+            return datetime.fromisoformat(created.replace('Z', '+00:00')).replace(tzinfo=None)
+        except ValueError:
+            pass
+    ts = _number(record.get('timestamp'))
+    if ts is None:
+        return None
+    if ts > 1e11:
+        ts /= 1000  # Date.now() của JS tính bằng millisecond
+    return datetime.utcfromtimestamp(ts)
+
+
+def convert_record(record):
+    """Map an import/seed record to a transaction document, or None if it is unusable.
+
+    Records are either sender/recipient/amount or the old models.Transaction
+    layout owner/category/isIncome: income becomes category -> owner and an
+    expense owner -> category.
+    """
+    if not isinstance(record, dict):
+        return None
+    amount = _number(record.get('amount'))
+    if amount is None:
+        return None
+    if record.get('sender') not in (None, '') and record.get('recipient') not in (None, ''):
+        sender, recipient = record['sender'], record['recipient']
+    elif record.get('owner') not in (None, ''):
+        owner = record['owner']
+        category = record.get('category') or 'unknown'
+        if _truthy(record.get('isIncome')):
+            sender, recipient = category, owner
+        else:
+            sender, recipient = owner, category
+    else:
+        return None
+    tx = {"sender": sender, "recipient": recipient, "amount": amount, "mined": True}
+    # Chữ ký ví: tên trường của POST /api/transactions hoặc của document đã export
+    signature = record.get('signature')
+    message = record.get('signed_message', record.get('message'))
+    address = record.get('wallet_address', record.get('address'))
+    if all(isinstance(v, str) and v for v in (signature, message, address)):
+        tx.update(wallet_address=address, signature=signature, signed_message=message)
+    created = _created_at(record)
+    if created is not None:
+        tx['created_at'] = created
+    return tx
+
+
+# Pipeline ghi
+
+def _block_object_id(started, key, block_no):
+    # _id của block cố định theo (lần nạp, số thứ tự block) để khi nạp tiếp
+    # có thể xoá phần lô đang ghi dở trước khi checkpoint kịp cập nhật
+    digest = hashlib.sha1(f'{key}:{block_no}'.encode()).digest()
+    return ObjectId(struct.pack('>I', started) + digest[:8])
+
+
+def _take(records, count):
+    """Convert the next `count` records; returns (transactions, records_read)"""
+    raw = list(islice(records, count))
+    return [tx for tx in map(convert_record, raw) if tx is not None], len(raw)
+
+
+async def _check_signatures(txs):
+    """Drop transactions whose wallet signature does not match; returns (kept, rejected count).
+
+    Signed records are kept unchecked when eth_account is not installed.
+    """
+    signed = [i for i, tx in enumerate(txs) if 'signature' in tx]
+    if not signed or not verifier.available:
+        return txs, 0
+    recovered = await verifier.recover_many([(txs[i]['signed_message'], txs[i]['signature']) for i in signed])
+    bad = {i for i, address in zip(signed, recovered)
+           if isinstance(address, Exception) or address.lower() != txs[i]['wallet_address'].lower()}
+    if not bad:
+        return txs, 0
+    return [tx for i, tx in enumerate(txs) if i not in bad], len(bad)
+
+
+async def _load_checkpoint(storage, key):
+    return await storage.get_state('ingest_state', key) if key else None
+
+
+async def ingest_in_progress(key):
+    """True if an unfinished checkpoint exists for `key`"""
+    doc = await _load_checkpoint(get_storage(), key)
+    return bool(doc) and not doc.get('done')
+
+
+async def ingest_records(records, key=None, block_size=INGEST_BLOCK_SIZE, batch_blocks=INGEST_BATCH_BLOCKS,
+                         rollups=True, verify_signatures=True, progress=None):
+    """Write records from an iterator as hash-linked blocks; returns the ingest stats.
+
+    With `key` the position is checkpointed after every batch and a later
+    call with the same key (and the same records) continues from there.
+    Signed records are checked in batches with verifier.recover_many and
+    counted as invalid on mismatch. `progress(stats)` is called after every batch.
+    """
+    storage = get_storage()
+    block_size = max(1, block_size)
+    checkpoint = await _load_checkpoint(storage, key)
+    if checkpoint and checkpoint.get('done'):
+        return {**checkpoint, 'resumed': True, 'skipped_run': True}
+
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    stats = {'records': 0, 'transactions': 0, 'invalid': 0, 'blocks': 0, 'index': None, 'resumed': False}
+    if checkpoint:
+        for field in ('records', 'transactions', 'invalid', 'blocks', 'index'):
+            stats[field] = checkpoint.get(field, stats[field])
+        stats['resumed'] = True
+        started = checkpoint['started']
+        batch_blocks = checkpoint.get('batch_blocks', batch_blocks)
+        block_size = checkpoint.get('block_size', block_size)
+        # Bỏ qua phần đã nạp; lô có thể đã ghi dở sau checkpoint chỉ được xoá khi vẫn là đỉnh chuỗi
+        await loop.run_in_executor(None, lambda: next(islice(records, stats['records'], stats['records']), None))
+        stale = [_block_object_id(started, key, stats['blocks'] + i) for i in range(batch_blocks)]
+        async with chain_lock():
+            kept = await storage.block_indexes(stale)
+            tip = await storage.chain_tip()
+            if kept and tip and tip[0] == max(kept.values()):
+                await storage.delete_blocks(stale)
+                kept = {}
+        if kept:
+            # Producer đã nối block lên trên lô ghi dở: giữ các block đó để không làm đứt previous_hash,
+            # lô kế tiếp bỏ qua nhóm giao dịch đã có block và chỉ ghi phần còn thiếu ở đỉnh chuỗi
+            logger.warning('keeping partially ingested blocks below the chain tip',
+                           extra={'fields': {'key': key, 'blocks': len(kept)}})
+    else:
+        started = int(time.time())
+        kept = {}
+
+    per_batch = block_size * batch_blocks
+    reading = loop.run_in_executor(None, _take, records, per_batch)
+    while True:
+        txs, read = await reading
+        if not read:
+            break
+        # Đọc + chuyển đổi lô kế tiếp trong thread trong khi ghi lô hiện tại
+        reading = loop.run_in_executor(None, _take, records, per_batch)
+        stats['records'] += read
+        stats['invalid'] += read - len(txs)
+        if verify_signatures:
+            txs, rejected = await _check_signatures(txs)
+            stats['invalid'] += rejected
+        if not txs:
+            continue
+
+        groups = [txs[i:i + block_size] for i in range(0, len(txs), block_size)]
+        now = datetime.utcnow()
+        prepared = []
+        kept_indexes = []
+        for n, group in enumerate(groups):
+            block_id = (_block_object_id(started, key, stats['blocks'] + n) if key else ObjectId())
+            if str(block_id) in kept:
+                kept_indexes.append(kept[str(block_id)])
+                continue
+            latest = None
+            for tx in group:
+                tx['_id'] = ObjectId()
+                tx.setdefault('created_at', now)
+                if latest is None or tx['created_at'] > latest:
+                    latest = tx['created_at']
+            prepared.append((block_id, group, latest))
+
+        kept = {}
+        blocks = []
+        if prepared:
+            async with chain_lock():
+                # Producer có thể vừa nối block từ lô trước: đọc lại đỉnh chuỗi trong lock
+                tip_index, tip_hash = await get_chain_tip()
+                first_index = 0 if tip_index is None else tip_index + 1
+                for n, (block_id, group, latest) in enumerate(prepared):
+                    index = first_index + n
+                    block = {
+                        "_id": block_id,
+                        "index": index,
+                        # Thời điểm block = giao dịch mới nhất, để rollups theo ngày khớp với dữ liệu gốc
+                        "timestamp": (latest - datetime(1970, 1, 1)).total_seconds(),
+                        "label": f"{len(group)} giao dịch (Block #{index})",
+                        "previous_hash": tip_hash,
+                        "created_at": now,
+                    }
+                    attach_transactions(block, group)
+                    block["hash"] = tip_hash = compute_block_hash(block)
+                    for tx in group:
+                        tx['block_id'] = str(block_id)
+                    blocks.append(block)
+
+                await storage.insert_blocks(blocks, [tx for _, group, _ in prepared for tx in group])
+            response_cache.invalidate(CHAIN_TAG)
+        stats['transactions'] += len(txs)
+        stats['blocks'] += len(groups)
+        stats['index'] = max([block['index'] for block in blocks] + kept_indexes)
+        if key:
+            await storage.set_state('ingest_state', key, {
+                **{f: stats[f] for f in ('records', 'transactions', 'invalid', 'blocks', 'index')},
+                'started': started, 'block_size': block_size,
+                'batch_blocks': batch_blocks, 'done': False, 'updated_at': time.time(),
+            })
+        if progress:
+            stats['elapsed'] = time.perf_counter() - start
+            progress(stats)
+
+    if rollups and stats['blocks']:
+        await rebuild_rollups()
+    if key:
+        await storage.set_state('ingest_state', key, {'done': True, 'updated_at': time.time()})
+    stats['elapsed'] = time.perf_counter() - start
+    return stats
+
+
+def checkpoint_key(path):
+    """Checkpoint id for a file: path + size + mtime, so an edited file starts over"""
+    st = os.stat(path)
+    return f'{os.path.abspath(path)}:{st.st_size}:{int(st.st_mtime)}'
+
+
+async def ingest_file(path, fmt=None, resume=True, **kwargs):
+    """Stream a JSON/NDJSON/CSV file (optionally .gz) into the chain; see ingest_records"""
+    fmt = fmt or detect_format(path)
+    key = checkpoint_key(path) if resume else None
+    with open_source(path) as f:
+        return await ingest_records(iter_records(f, fmt), key=key, **kwargs)
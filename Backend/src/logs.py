@@ -0,0 +1,188 @@
+"""Log có cấu trúc (JSON mỗi dòng), ghi qua hàng đợi để không chặn request.
+
+Handler gọi logger như bình thường; QueueHandler chỉ đẩy record vào một
+SimpleQueue, còn việc format + ghi stdout do QueueListener làm trên thread
+riêng. RequestLogMiddleware đo thời gian mỗi request, tách phần thời gian
+chờ MongoDB (cộng bởi decorator timed_db trên các hàm trong database.py)
+khỏi thời gian xử lý, và lấy mẫu theo route template:
+
+    LOG_SAMPLE="default=1,/api/transactions=0.1,/api/health=0"
+
+Route có tỉ lệ 0 chỉ được log khi lỗi 5xx; các route khác luôn log response
+4xx/5xx. LOG_FORMAT=text cho output dễ đọc khi phát triển.
+"""
+
+import contextvars
+import functools
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+from .encoder import dumps
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # json | text
+LOG_REQUESTS = os.getenv('LOG_REQUESTS', '1') != '0'
+LOG_SAMPLE = os.getenv('LOG_SAMPLE', 'default=1')
+# Không log các đường dẫn này (devtools của trình duyệt gọi liên tục)
+LOG_SKIP_PREFIXES = ('/devtools',)
+
+logger = logging.getLogger('financechain')
+request_logger = logger.getChild('request')
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg plus the record's `fields`"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        return dumps(entry).decode('utf-8')
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-5s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f'{k}={v}' for k, v in fields.items())
+        return line
+
+
+def setup_logging():
+    """Route the `financechain` loggers through a queue to a background writer thread"""
+    global _listener
+    if _listener is not None:
+        return
+    records = queue.SimpleQueue()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(TextFormatter() if LOG_FORMAT == 'text' else JsonFormatter())
+    _listener = logging.handlers.QueueListener(records, stream, respect_handler_level=False)
+    logger.handlers[:] = [logging.handlers.QueueHandler(records)]
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def parse_sample_rates(spec):
+    """'default=1,/api/x=0.1' -> {'default': 1.0, '/api/x': 0.1}"""
+    rates = {'default': 1.0}
+    for part in spec.split(','):
+        route, sep, value = part.strip().partition('=')
+        if not sep:
+            continue
+        try:
+            rates[route.strip()] = min(1.0, max(0.0, float(value)))
+        except ValueError:
+            continue
+    return rates
+
+
+# Thời gian chờ MongoDB của request hiện tại
+
+class RequestTimer:
+    __slots__ = ('db_seconds', 'db_ops')
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.db_ops = 0
+
+
+_current_timer = contextvars.ContextVar('request_timer', default=None)
+# Độ sâu lời gọi timed_db: hàm DB gọi hàm DB khác chỉ được tính một lần
+_db_depth = contextvars.ContextVar('db_depth', default=0)
+
+
+def timed_db(func):
+    """Add the wall time of an async DB function to the current request's DB time"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        timer = _current_timer.get()
+        if timer is None or _db_depth.get():
+            return await func(*args, **kwargs)
+        token = _db_depth.set(1)
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            timer.db_seconds += time.perf_counter() - start
+            timer.db_ops += 1
+            _db_depth.reset(token)
+    return wrapper
+
+
+class RequestLogMiddleware:
+    """ASGI middleware: one sampled log line per request with total, DB and handler time"""
+
+    def __init__(self, app, sample=LOG_SAMPLE, enabled=LOG_REQUESTS):
+        self.app = app
+        self.rates = parse_sample_rates(sample)
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.enabled or scope['path'].startswith(LOG_SKIP_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        timer = RequestTimer()
+        token = _current_timer.set(timer)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_timer.reset(token)
+            elapsed = time.perf_counter() - start
+            route = scope.get('route')
+            template = getattr(route, 'path', None) or 'unmatched'
+            rate = self.rates.get(template, self.rates['default'])
+            if rate == 0:
+                sampled = status >= 500
+            else:
+                sampled = status >= 400 or rate >= 1 or random.random() < rate
+            if sampled:
+                client = scope.get('client')
+                request_logger.info('request', extra={'fields': {
+                    'method': scope['method'],
+                    'route': template,
+                    'path': scope['path'],
+                    'status': status,
+                    'duration_ms': round(elapsed * 1000, 3),
+                    'db_ms': round(timer.db_seconds * 1000, 3),
+                    'handler_ms': round(max(0.0, elapsed - timer.db_seconds) * 1000, 3),
+                    'db_ops': timer.db_ops,
+                    'client': client[0] if client else None,
+                    'sample_rate': rate,
+                }})
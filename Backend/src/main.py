@@ -1,37 +1,75 @@
 import os
 import json
 import logging
+import asyncio
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from colorama import Fore, Style, init as colorama_init
 import time
 from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional
 from .database import (
-    init_mongodb, close_mongodb, 
-    save_transaction, get_all_transactions, clear_transactions,
-    save_block, get_all_blocks, get_block_count_sync,
-    save_payment, get_all_payments, get_payment, update_payment,
+    init_storage, close_storage, STORAGE_ENGINE,
+    get_transaction, expire_pending_transactions,
+    get_block_count,
+    save_payment, get_all_payments, get_payment, transition_payment,
+    encode_cursor, decode_cursor,
+    get_transactions_page, get_blocks_page,
+    get_stats_totals, get_account_stats, get_top_accounts, get_time_buckets,
+    STATS_BUCKET_FORMATS, get_balance, get_daily_rollups,
+    response_cache, CHAIN_TAG, PAYMENTS_TAG, payment_tag,
+    CACHE_SHARED, cache_sync, mongo_lock,
 )
+from .batch import BATCH_MAX_BYTES, BATCH_MAX_ITEMS, attach_signature, build_transaction, parse_batch, validate_batch
+from .encoder import FastJSONResponse
+from .export import EXPORT_BATCH_SIZE, gzip_chunks, iter_ndjson
+from .ingest import checkpoint_key, ingest_file, ingest_in_progress, ingest_records
+from .mempool import MEMPOOL_TX_TTL_S, DuplicateTransaction, MempoolError, MempoolFull
+from .producer import ProducerStopped, producer
+from .events import hub
+from .stream import change_feed, stream_events
+from .signatures import SignatureError, VerifierBusy, verifier
+from .logs import RequestLogMiddleware, logger, setup_logging, shutdown_logging
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, METRICS_ENABLED, MetricsMiddleware, render as render_metrics
+from .chain import backfill_block_hashes, shutdown_validation, validate_full, validate_incremental
 
-# eth signature verification
-try:
-    from eth_account.messages import encode_defunct
-    from eth_account import Account
-except Exception:
-    encode_defunct = None
-    Account = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    init_mongodb()
-    seed_data()
+    setup_logging()
+    await init_storage()
+    # Chạy nhiều worker (uvicorn --workers) thì chỉ một worker seed / backfill,
+    # các worker khác chờ lock rồi thấy dữ liệu đã có
+    async with mongo_lock('startup'):
+        # Seed nạp qua src/ingest.py, tự tính lại balances/rollups sau khi ghi
+        await seed_data()
+        # Block thiếu hash chỉ có trong dữ liệu MongoDB cũ
+        relinked = await backfill_block_hashes() if STORAGE_ENGINE == 'mongo' else 0
+        # Giao dịch chưa mine còn sót trong Mongo (đường ghi cũ) quá TTL của mempool
+        expired = await expire_pending_transactions(MEMPOOL_TX_TTL_S)
+    if expired:
+        print(Fore.CYAN + f'[mempool] Removed {expired} stale pending transactions')
+    if relinked:
+        print(Fore.CYAN + f'[chain] Added hash links to {relinked} blocks')
+    if CACHE_SHARED:
+        cache_sync.start()
+    await change_feed.start()
+    await producer.start()
     yield
     # Shutdown
-    await close_mongodb()
-
-app = FastAPI(title="Backend API", lifespan=lifespan)
+    await producer.stop()
+    await change_feed.stop()
+    if CACHE_SHARED:
+        await cache_sync.stop()
+    verifier.shutdown()
+    shutdown_validation()
+    shutdown_logging()
+    await close_storage()
+
+app = FastAPI(title="Backend API", lifespan=lifespan, default_response_class=FastJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -39,97 +77,47 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+# Thêm sau cùng nên nằm ngoài cùng: thời gian đo gồm cả CORS
+app.add_middleware(RequestLogMiddleware)
 colorama_init(autoreset=True)
 
-CHAIN = None  # Deprecated: Now using MongoDB
-
-def seed_data():
+async def seed_data():
     seed_file = os.path.join(os.path.dirname(__file__), '..', 'seed.json')
     seed_file = os.path.abspath(seed_file)
     use_sample = os.environ.get('SEED_SAMPLE') == '1'
-    seeded = False
-    
-    # Check if DB already has data
-    existing_blocks = get_block_count_sync()
-    if existing_blocks > 0:
+    seed_key = checkpoint_key(seed_file) if os.path.exists(seed_file) else None
+
+    # Check if DB already has data (trừ khi lần seed trước bị dừng giữa chừng)
+    existing_blocks = await get_block_count()
+    if existing_blocks > 0 and not (seed_key and await ingest_in_progress(seed_key)):
         print(Fore.CYAN + f'[seed] Database already has {existing_blocks} blocks, skipping seed')
-        return True
-    
-    from .database import get_sync_db
-    db = get_sync_db()
-    
+        return False
+
     if use_sample:
         # Sample data
-        tx1 = {"sender": "alice", "recipient": "bob", "amount": 10, "mined": True}
-        tx2 = {"sender": "carol", "recipient": "dave", "amount": 7, "mined": True}
-        db.transactions.insert_many([tx1, tx2])
-        
-        block_data = {
-            "index": 0,
-            "timestamp": time.time(),
-            "transactions": [tx1, tx2]
-        }
-        db.blocks.insert_one(block_data)
+        records = [
+            {"sender": "alice", "recipient": "bob", "amount": 10},
+            {"sender": "carol", "recipient": "dave", "amount": 7},
+        ]
+        await ingest_records(iter(records))
         print(Fore.CYAN + '[seed] Loaded sample seed data from env SEED_SAMPLE=1')
-        seeded = True
-        
-    elif os.path.exists(seed_file):
+        return True
+
+    if seed_key:
         try:
-            with open(seed_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Handle both array and object formats
-            transactions = data if isinstance(data, list) else data.get('transactions', [])
-            
-            tx_docs = []
-            for tx in transactions:
-                # Support both old format (owner/category) and new format (sender/recipient)
-                if 'sender' in tx and 'recipient' in tx:
-                    tx_docs.append({
-                        "sender": tx['sender'],
-                        "recipient": tx['recipient'],
-                        "amount": tx['amount'],
-                        "mined": True
-                    })
-                elif 'owner' in tx:
-                    # Convert old format
-                    owner = tx['owner']
-                    category = tx.get('category', 'unknown')
-                    amount = tx['amount']
-                    if tx.get('isIncome'):
-                        tx_docs.append({"sender": category, "recipient": owner, "amount": amount, "mined": True})
-                    else:
-                        tx_docs.append({"sender": owner, "recipient": category, "amount": amount, "mined": True})
-            
-            if tx_docs:
-                db.transactions.insert_many(tx_docs)
-                block_data = {
-                    "index": 0,
-                    "timestamp": time.time(),
-                    "transactions": tx_docs
-                }
-                db.blocks.insert_one(block_data)
-                print(Fore.CYAN + f"[seed] Loaded {len(tx_docs)} transactions from {seed_file}")
-                seeded = True
+            # Đọc dần seed.json (JSON/NDJSON/CSV), đổi định dạng cũ owner/category khi đọc
+            stats = await ingest_file(seed_file)
         except Exception as e:
             print(Fore.RED + f"[seed] Failed to load seed data: {e}")
-    else:
-        print(Fore.YELLOW + '[seed] No seed.json; starting with empty chain')
-    return seeded
-
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    # Log đơn giản: in 1 dòng cho mỗi request (ngoại trừ /devtools)
-    path = request.url.path or ""
-    response = await call_next(request)
-
-    if not path.startswith('/devtools'):
-        addr = request.client.host if request.client else "-"
-        status = response.status_code
-        # Không dùng màu ANSI (PowerShell đôi khi không hiển thị) — in dạng đơn giản
-        print(f'{addr} - "{request.method} {path} HTTP/1.1" {status}')
+            return False
+        if stats['transactions']:
+            print(Fore.CYAN + f"[seed] Loaded {stats['transactions']} transactions in {stats['blocks']} blocks from {seed_file}")
+            return True
+        return False
 
-    return response
+    print(Fore.YELLOW + '[seed] No seed.json; starting with empty chain')
+    return False
 
 @app.get("/")
 def index():
@@ -146,124 +134,402 @@ def index():
 
 @app.get("/api/health")
 def health():
-    return JSONResponse({"status": "ok"})
+    return FastJSONResponse({"status": "ok"})
+
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus scrape; METRICS_ENABLED=0 thì không có số liệu
+    if not METRICS_ENABLED:
+        return FastJSONResponse({"ok": False, "error": "metrics disabled"}, status_code=404)
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def parse_time_param(value):
+    """Parse a time filter given as epoch seconds or ISO 8601; returns a naive UTC datetime"""
+    if value is None or value == '':
+        return None
+    try:
+        return datetime.utcfromtimestamp(float(value))
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = datetime.utcfromtimestamp(parsed.timestamp())
+    return parsed
+
+
+async def cached_response(request: Request, tags, build):
+    """Serve a GET from response_cache, calling `build()` (-> FastJSONResponse) on a miss.
+
+    Chỉ cache response 200; If-None-Match khớp ETag thì trả 304 không cần body.
+    """
+    key = request.url.path + '?' + '&'.join(sorted(request.url.query.split('&')))
+    entry = response_cache.get(key)
+    if entry is None:
+        snapshot = response_cache.snapshot(tags)
+        response = await build()
+        if response.status_code != 200:
+            return response
+        entry = response_cache.put(key, response.body, tags, snapshot)
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and entry.etag in [t.strip() for t in if_none_match.split(',')]:
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
 
 @app.get("/api/transactions")
-async def transactions_get():
-    pending = await get_all_transactions()
-    blocks = await get_all_blocks()
-    return JSONResponse({
+async def transactions_get(
+    request: Request,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    sender: Optional[str] = None,
+    recipient: Optional[str] = None,
+    mined: Optional[bool] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+):
+    # Keyset pagination: "current" theo (created_at, _id) giảm dần, "chain" theo index tăng dần.
+    # next_cursor gói vị trí của cả hai; luồng nào đã hết thì không còn trong cursor.
+    return await cached_response(request, (CHAIN_TAG,), lambda: transactions_page(
+        limit, cursor, sender, recipient, mined, since, until))
+
+
+async def transactions_page(limit, cursor, sender, recipient, mined, since, until):
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    try:
+        since_dt = parse_time_param(since)
+        until_dt = parse_time_param(until)
+    except ValueError:
+        return FastJSONResponse({"ok": False, "error": "invalid time range"}, status_code=400)
+
+    if cursor:
+        try:
+            position = decode_cursor(cursor)
+        except ValueError:
+            return FastJSONResponse({"ok": False, "error": "invalid cursor"}, status_code=400)
+    else:
+        position = {"tx": None, "blk": None}
+
+    tx_filters = {"sender": sender, "recipient": recipient, "mined": mined, "since": since_dt, "until": until_dt}
+
+    pending, blocks = [], []
+    next_position = {}
+    try:
+        if "tx" in position:
+            pending, next_tx = await get_transactions_page(limit, position["tx"], tx_filters)
+            if next_tx is not None:
+                next_position["tx"] = next_tx
+        if "blk" in position:
+            blocks, next_blk = await get_blocks_page(limit, position["blk"], sender, recipient, since_dt, until_dt)
+            if next_blk is not None:
+                next_position["blk"] = next_blk
+    except (ValueError, TypeError):
+        return FastJSONResponse({"ok": False, "error": "invalid cursor"}, status_code=400)
+
+    return FastJSONResponse({
         "current": pending,
         "chain": blocks,
+        "next_cursor": encode_cursor(next_position) if next_position else None,
     })
 
+BLOCK_WAIT_TIMEOUT = float(os.environ.get('BLOCK_WAIT_TIMEOUT', '10'))
+
+
+async def inclusion_response(tx_id, wait, payload):
+    """Response for a queued transaction: 202 right away, or 200 once mined if `wait`"""
+    if wait:
+        try:
+            included = await producer.wait_for(tx_id, timeout=BLOCK_WAIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            included = None
+        except MempoolError as e:
+            # Bị giao dịch fee cao hơn đẩy ra hoặc hết hạn trong mempool trước khi được ghi
+            return mempool_error_response(e, payload)
+        except Exception as e:
+            return FastJSONResponse({"ok": False, "error": f"block write failed: {e}"}, status_code=500)
+        if included:
+            return FastJSONResponse({**payload, "status": "mined", **included})
+    return FastJSONResponse({**payload, "status": "pending"}, status_code=202)
+
+
+def mempool_error(error):
+    """Response body and status for a transaction the mempool refused"""
+    if isinstance(error, DuplicateTransaction):
+        return {"ok": False, "error": str(error), "transaction_id": error.tx_id}, 409
+    if isinstance(error, MempoolFull):
+        return {"ok": False, "error": error.reason, "retry_after": error.retry_after}, 429
+    return {"ok": False, "error": str(error)}, 503
+
+
+def mempool_error_response(error, payload=None):
+    body, status = mempool_error(error)
+    headers = {"Retry-After": str(error.retry_after)} if isinstance(error, MempoolFull) else None
+    return FastJSONResponse({**(payload or {}), **body}, status_code=status, headers=headers)
+
+
+@app.get("/api/transactions/{tx_id}")
+async def transaction_detail(tx_id: str):
+    if producer.is_pending(tx_id):
+        return FastJSONResponse({"transaction": {"_id": tx_id, "mined": False}, "status": "pending"})
+    tx = await get_transaction(tx_id)
+    if not tx:
+        return FastJSONResponse({"ok": False, "error": "not found"}, status_code=404)
+    return FastJSONResponse({"transaction": tx, "status": "mined" if tx.get("mined") else "pending"})
+
+
 @app.post("/api/transactions")
-async def transactions_post(request: Request):
+async def transactions_post(request: Request, wait: bool = False):
     try:
         body = await request.json()
     except Exception:
-        return JSONResponse({"ok": False, "error": "invalid JSON"}, status_code=400)
+        return FastJSONResponse({"ok": False, "error": "invalid JSON"}, status_code=400)
 
     if not isinstance(body, dict):
-        return JSONResponse({"ok": False, "error": "expected JSON object"}, status_code=400)
+        return FastJSONResponse({"ok": False, "error": "expected JSON object"}, status_code=400)
 
-    sender = body.get('sender')
-    recipient = body.get('recipient')
-    amount = body.get('amount')
-    tx_hash = body.get('tx_hash')  # optional on-chain tx hash
-    tx_meta = body.get('tx_meta')  # optional on-chain metadata (from/to, gas, block, ...)
-    # optional on-chain signature fields
-    signature = body.get('signature')
-    signed_message = body.get('message')
-    signer_address = body.get('address')
-    
-    if sender and recipient and amount is not None:
-        # Save transaction
-        tx_data = {
-            "sender": sender,
-            "recipient": recipient,
-            "amount": amount,
-            "mined": False,
-        }
-        # attach on-chain tx hash + metadata if provided
-        if tx_hash:
-            tx_data["hash"] = tx_hash
-        if isinstance(tx_meta, dict):
-            tx_data["onchain"] = tx_meta
-        # If signature provided, verify it matches signer_address
-        if signature and signed_message and signer_address and Account is not None:
-            try:
-                msg = encode_defunct(text=signed_message)
-                recovered = Account.recover_message(msg, signature=signature)
-                if recovered.lower() != signer_address.lower():
-                    return JSONResponse({"ok": False, "error": "signature mismatch"}, status_code=400)
-                # attach wallet info
-                tx_data['wallet_address'] = signer_address
-                tx_data['signature'] = signature
-                tx_data['signed_message'] = signed_message
-            except Exception as e:
-                return JSONResponse({"ok": False, "error": f"signature verify failed: {e}"}, status_code=400)
-        from bson import ObjectId
-        tx_id = await save_transaction(tx_data)
-        # Log transaction saved
-        try:
-            print(f"[tx] Saved transaction {tx_id} {sender}->{recipient} amount={amount}")
-        except Exception:
-            # Best-effort logging
-            pass
-        
-        # Mine block with this transaction
-        from .database import get_block_count
-        block_index = await get_block_count()
-
-        # Tạo label dễ đọc cho block, ví dụ: "Alice → Bob (Block #3)"
-        label = f"{sender} → {recipient} (Block #{block_index})"
-
-        block_data = {
-            "index": block_index,
-            "timestamp": time.time(),
-            "transactions": [tx_data],
-            "label": label,
-        }
-        block_id = await save_block(block_data)
-        # Log block mined
+    try:
+        tx_data, signed = build_transaction(body)
+    except ValueError as e:
+        return FastJSONResponse({"ok": False, "error": str(e)}, status_code=400)
+    # If signature provided, verify it matches signer_address
+    if signed:
+        message, signature, signer_address = signed
+        # Khôi phục địa chỉ trên worker pool (có cache), không chặn event loop
         try:
-            print(f"[block] Mined block #{block_index} id={block_id} label='{label}' txs={len(block_data.get('transactions', []))}")
-        except Exception:
-            pass
-        # Mark transaction as mined
-        from .database import get_async_db
-        db = get_async_db()
-        await db.transactions.update_one({"_id": ObjectId(tx_id)}, {"$set": {"mined": True, "block_id": block_id}})
+            if not await verifier.verify(message, signature, signer_address):
+                return FastJSONResponse({"ok": False, "error": "signature mismatch"}, status_code=400)
+        except VerifierBusy:
+            return FastJSONResponse({"ok": False, "error": "signature verifier busy, retry later"},
+                                    status_code=503, headers={"Retry-After": "1"})
+        except (SignatureError, AttributeError, TypeError) as e:
+            return FastJSONResponse({"ok": False, "error": f"signature verify failed: {e}"}, status_code=400)
+        # attach wallet info
+        attach_signature(tx_data, signed)
+    try:
+        tx_id = producer.submit(tx_data)
+    except MempoolError as e:
+        return mempool_error_response(e)
+    logger.debug('transaction queued', extra={'fields': {
+        'tx_id': tx_id, 'sender': tx_data['sender'], 'recipient': tx_data['recipient'], 'amount': tx_data['amount']}})
+    return await inclusion_response(tx_id, wait, {"ok": True, "transaction_id": tx_id})
+
+
+async def read_body_limited(request: Request, limit):
+    """Request body, or None as soon as it is known to be larger than `limit` bytes"""
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > limit:
+        return None
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+@app.post("/api/transactions/batch")
+async def transactions_batch(request: Request, wait: bool = False):
+    # JSON array hoặc NDJSON; kết quả theo từng phần tử (index = vị trí trong body) kèm báo cáo throughput
+    start = time.perf_counter()
+    body = await read_body_limited(request, BATCH_MAX_BYTES)
+    if body is None:
+        return FastJSONResponse({"ok": False, "error": f"request body too large (max {BATCH_MAX_BYTES} bytes)"},
+                                status_code=413)
+    try:
+        items = parse_batch(body, request.headers.get("content-type", ""))
+    except ValueError as e:
+        return FastJSONResponse({"ok": False, "error": str(e)}, status_code=400)
+    if len(items) > BATCH_MAX_ITEMS:
+        return FastJSONResponse({"ok": False, "error": f"too many transactions (max {BATCH_MAX_ITEMS})"},
+                                status_code=413)
+    parsed = time.perf_counter()
+    results, accepted = await validate_batch(items)
+    validated = time.perf_counter()
+    queued_items, overloaded, stopped = [], None, None
+    for (position, _), result in zip(accepted, producer.submit_many([tx_data for _, tx_data in accepted])):
+        if isinstance(result, MempoolError):
+            body, _ = mempool_error(result)
+            results[position] = {"index": position, **body}
+            if isinstance(result, MempoolFull):
+                overloaded = result
+            elif isinstance(result, ProducerStopped):
+                stopped = result
+            continue
+        results[position] = {"index": position, "ok": True, "transaction_id": result, "status": "pending"}
+        queued_items.append((position, result))
+    tx_ids = [tx_id for _, tx_id in queued_items]
+    queued = time.perf_counter()
+
+    mined = 0
+    if wait and tx_ids:
+        done = await producer.wait_many(tx_ids, timeout=BLOCK_WAIT_TIMEOUT)
+        for position, tx_id in queued_items:
+            included = done.get(tx_id)
+            if isinstance(included, MempoolError):
+                body, _ = mempool_error(included)
+                results[position] = {"index": position, **body, "transaction_id": tx_id}
+            elif isinstance(included, Exception):
+                results[position] = {"index": position, "ok": False, "transaction_id": tx_id,
+                                     "error": f"block write failed: {included}"}
+            elif included:
+                results[position].update(status="mined", **included)
+                mined += 1
+    elapsed = time.perf_counter() - start
+    report = {
+        "rows": len(items),
+        "accepted": len(tx_ids),
+        "rejected": len(items) - len(tx_ids),
+        "mined": mined if wait else None,
+        "elapsed_ms": round(elapsed * 1000, 2),
+        "rows_per_s": round(len(items) / elapsed, 1) if elapsed else None,
+        "phases_ms": {
+            "parse": round((parsed - start) * 1000, 2),
+            "validate": round((validated - parsed) * 1000, 2),
+            "queue": round((queued - validated) * 1000, 2),
+            "wait": round((time.perf_counter() - queued) * 1000, 2) if wait else None,
+        },
+    }
+    if not tx_ids and overloaded:
+        # Không nhận được giao dịch nào vì mempool quá tải: client gửi lại sau Retry-After
+        return FastJSONResponse({"ok": False, "error": overloaded.reason, "results": results, "report": report},
+                                status_code=429, headers={"Retry-After": str(overloaded.retry_after)})
+    if not tx_ids and stopped:
+        return FastJSONResponse({"ok": False, "error": str(stopped), "results": results, "report": report},
+                                status_code=503)
+    if not tx_ids:
+        return FastJSONResponse({"ok": False, "error": "no valid transactions", "results": results, "report": report},
+                                status_code=400)
+    return FastJSONResponse({"ok": True, "results": results, "report": report},
+                            status_code=200 if wait and mined == len(tx_ids) else 202)
+
+
+@app.get("/api/stream")
+async def stream(request: Request, last_index: Optional[int] = None):
+    # Server-Sent Events: block mới + trạng thái payment; Last-Event-ID (EventSource tự gửi khi
+    # kết nối lại) được ưu tiên hơn ?last_index=
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id:
         try:
-            print(f"[block] Marked tx {tx_id} as mined in block {block_id}")
-        except Exception:
+            last_index = int(last_event_id)
+        except ValueError:
             pass
-        return JSONResponse({"ok": True, "transaction_id": tx_id, "block_id": block_id})
-    
-    return JSONResponse({"ok": False, "error": "missing fields"}, status_code=400)
+    if hub.subscribers >= hub.max_subscribers:
+        return FastJSONResponse({"ok": False, "error": "too many subscribers"}, status_code=503,
+                                headers={"Retry-After": "5"})
+    return StreamingResponse(stream_events(last_index), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/api/chain/verify")
+async def chain_verify(full: bool = False):
+    # Mặc định chỉ kiểm tra các block mới sau checkpoint; full=true đọc lại toàn bộ chuỗi
+    result = await (validate_full() if full else validate_incremental())
+    return FastJSONResponse(result, status_code=200 if result["valid"] else 409)
+
+
+@app.get("/api/signatures/stats")
+async def signature_stats():
+    return FastJSONResponse({"signatures": verifier.stats()})
+
+
+@app.get("/api/stats")
+async def stats_totals():
+    return FastJSONResponse({"stats": await get_stats_totals()})
+
+
+@app.get("/api/stats/accounts/{account}")
+async def stats_account(account: str):
+    return FastJSONResponse({"stats": await get_account_stats(account)})
+
+
+@app.get("/api/stats/top")
+async def stats_top(by: str = "sender", limit: int = 5):
+    if by not in ("sender", "recipient"):
+        return FastJSONResponse({"ok": False, "error": "by must be sender or recipient"}, status_code=400)
+    limit = max(1, min(limit, 100))
+    return FastJSONResponse({"by": by, "top": await get_top_accounts(by, limit)})
+
+
+@app.get("/api/stats/timeseries")
+async def stats_timeseries(interval: str = "day", since: Optional[str] = None, until: Optional[str] = None):
+    if interval not in STATS_BUCKET_FORMATS:
+        return FastJSONResponse({"ok": False, "error": "interval must be day or month"}, status_code=400)
+    try:
+        since_dt = parse_time_param(since)
+        until_dt = parse_time_param(until)
+    except ValueError:
+        return FastJSONResponse({"ok": False, "error": "invalid time range"}, status_code=400)
+    buckets = await get_time_buckets(interval, since_dt, until_dt)
+    return FastJSONResponse({"interval": interval, "buckets": buckets})
+
+
+@app.get("/api/balances/{account}")
+async def balance_get(account: str):
+    balance = await get_balance(account)
+    if not balance:
+        return FastJSONResponse({"ok": False, "error": "not found"}, status_code=404)
+    return FastJSONResponse({"balance": balance})
+
+
+@app.get("/api/rollups/daily")
+async def rollups_daily(since: Optional[str] = None, until: Optional[str] = None):
+    # since/until dạng YYYY-MM-DD (ngày UTC)
+    return FastJSONResponse({"rollups": await get_daily_rollups(since, until)})
+
+
+def export_response(collection, filters, batch_size, gzip):
+    """Stream a collection as NDJSON (or .ndjson.gz) attachment"""
+    chunks = iter_ndjson(collection, filters, batch_size)
+    filename = f"{collection}.ndjson"
+    media_type = "application/x-ndjson"
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(chunks, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+@app.get("/api/export/blocks")
+async def export_blocks(after_index: Optional[int] = None, batch_size: int = EXPORT_BATCH_SIZE, gzip: bool = False):
+    # after_index: chỉ xuất các block sau lần backup trước
+    return export_response("blocks", {"after_index": after_index}, batch_size, gzip)
+
+
+@app.get("/api/export/transactions")
+async def export_transactions(mined: Optional[bool] = None, batch_size: int = EXPORT_BATCH_SIZE, gzip: bool = False):
+    return export_response("transactions", {"mined": mined}, batch_size, gzip)
 
 
 @app.get("/api/payments")
-async def payments_list():
-    payments = await get_all_payments()
-    return JSONResponse({"payments": payments})
+async def payments_list(request: Request):
+    async def build():
+        return FastJSONResponse({"payments": await get_all_payments()})
+    return await cached_response(request, (PAYMENTS_TAG,), build)
 
 
 @app.get("/api/payments/{payment_id}")
-async def payment_detail(payment_id: str):
-    payment = await get_payment(payment_id)
-    if not payment:
-        return JSONResponse({"ok": False, "error": "not found"}, status_code=404)
-    return JSONResponse({"payment": payment})
+async def payment_detail(request: Request, payment_id: str):
+    async def build():
+        payment = await get_payment(payment_id)
+        if not payment:
+            return FastJSONResponse({"ok": False, "error": "not found"}, status_code=404)
+        return FastJSONResponse({"payment": payment})
+    return await cached_response(request, (payment_tag(payment_id),), build)
 
 
 @app.post("/api/payments")
-async def payments_create(request: Request):
+async def payments_create(request: Request, wait: bool = False):
     try:
         body = await request.json()
     except Exception:
-        return JSONResponse({"ok": False, "error": "invalid JSON"}, status_code=400)
+        return FastJSONResponse({"ok": False, "error": "invalid JSON"}, status_code=400)
 
     payer = body.get('payer')
     payee = body.get('payee')
@@ -271,58 +537,49 @@ async def payments_create(request: Request):
     currency = body.get('currency', 'USD')
 
     if not (payer and payee and amount is not None):
-        return JSONResponse({"ok": False, "error": "missing fields"}, status_code=400)
+        return FastJSONResponse({"ok": False, "error": "missing fields"}, status_code=400)
+    if not (isinstance(payer, str) and isinstance(payee, str)):
+        return FastJSONResponse({"ok": False, "error": "payer and payee must be strings"}, status_code=400)
 
     payment = {
         "payer": payer,
         "payee": payee,
         "amount": amount,
         "currency": currency,
-        "status": "pending",
+        # Giao dịch được gửi ngay bên dưới: confirm song song sẽ nhận 409
+        "status": "confirming",
         "created_at": time.time()
     }
 
     payment_id = await save_payment(payment)
 
-    # Create a blockchain transaction and mine a block immediately (simple integration)
+    # Create a blockchain transaction; the producer confirms the payment when the block is sealed
     tx_data = {
         "sender": payer,
         "recipient": payee,
         "amount": amount,
         "mined": False
     }
-    tx_id = await save_transaction(tx_data)
-
-    from .database import get_block_count
-    block_index = await get_block_count()
-    label = f"{payer} → {payee} (Block #{block_index})"
-    block_data = {
-        "index": block_index,
-        "timestamp": time.time(),
-        "transactions": [tx_data],
-        "label": label,
-    }
-    block_id = await save_block(block_data)
-
-    # mark tx mined
-    from .database import get_async_db
-    from bson import ObjectId
-    db = get_async_db()
-    await db.transactions.update_one({"_id": ObjectId(tx_id)}, {"$set": {"mined": True, "block_id": block_id}})
-
-    # update payment status and link tx/block
-    await update_payment(payment_id, {"status": "confirmed", "transaction_id": tx_id, "block_id": block_id, "confirmed_at": time.time()})
-
-    return JSONResponse({"ok": True, "payment_id": payment_id, "transaction_id": tx_id, "block_id": block_id})
+    try:
+        tx_id = producer.submit(tx_data, payment_id=payment_id)
+    except MempoolError as e:
+        # Trả payment về pending để có thể gửi lại qua POST /api/payments/{id}/confirm
+        await transition_payment(payment_id, 'confirming', {"status": "pending"})
+        return mempool_error_response(e, {"payment_id": payment_id})
+    return await inclusion_response(tx_id, wait, {"ok": True, "payment_id": payment_id, "transaction_id": tx_id})
 
 
 @app.post("/api/payments/{payment_id}/confirm")
-async def payments_confirm(payment_id: str):
+async def payments_confirm(payment_id: str, wait: bool = False):
     payment = await get_payment(payment_id)
     if not payment:
-        return JSONResponse({"ok": False, "error": "not found"}, status_code=404)
-    if payment.get('status') == 'confirmed':
-        return JSONResponse({"ok": False, "error": "already confirmed"}, status_code=400)
+        return FastJSONResponse({"ok": False, "error": "not found"}, status_code=404)
+    # Chuyển pending → confirming có điều kiện: confirm lặp lại hoặc đồng thời (kể cả ở worker khác) nhận 409
+    if not await transition_payment(payment_id, 'pending', {"status": "confirming"}):
+        current = await get_payment(payment_id)
+        status = current.get('status') if current else None
+        return FastJSONResponse({"ok": False, "error": f"payment is {status}", "payment_id": payment_id},
+                                status_code=409)
 
     # create tx + block similarly
     tx_data = {
@@ -331,21 +588,14 @@ async def payments_confirm(payment_id: str):
         "amount": payment.get('amount'),
         "mined": False
     }
-    tx_id = await save_transaction(tx_data)
-    from .database import get_block_count
-    block_index = await get_block_count()
-    label = f"{payment.get('payer')} → {payment.get('payee')} (Block #{block_index})"
-    block_data = {"index": block_index, "timestamp": time.time(), "transactions": [tx_data], "label": label}
-    block_id = await save_block(block_data)
-
-    from .database import get_async_db
-    from bson import ObjectId
-    db = get_async_db()
-    await db.transactions.update_one({"_id": ObjectId(tx_id)}, {"$set": {"mined": True, "block_id": block_id}})
-
-    await update_payment(payment_id, {"status": "confirmed", "transaction_id": tx_id, "block_id": block_id, "confirmed_at": time.time()})
-
-    return JSONResponse({"ok": True, "payment_id": payment_id, "transaction_id": tx_id, "block_id": block_id})
+    try:
+        tx_id = producer.submit(tx_data, payment_id=payment_id)
+    except MempoolError as e:
+        # Trả payment về pending để có thể gửi lại qua POST /api/payments/{id}/confirm
+        await transition_payment(payment_id, 'confirming', {"status": "pending"})
+        return mempool_error_response(e, {"payment_id": payment_id})
+    return await inclusion_response(tx_id, wait, {"ok": True, "payment_id": payment_id, "transaction_id": tx_id})
 
 if __name__ == "__main__":
-    print("Run with: uvicorn src.main:app --host 127.0.0.1 --port 5000 --reload")
\ No newline at end of file
+    print("Run with: uvicorn src.main:app --host 127.0.0.1 --port 5000 --reload --no-access-log")
+    print("Multi-process: WEB_CONCURRENCY=4 uvicorn src.main:app --host 127.0.0.1 --port 5000 --no-access-log")
\ No newline at end of file
@@ -0,0 +1,216 @@
+"""Mempool của block producer: giao dịch đã nhận nhưng chưa ghi vào block.
+
+Thay cho hàng đợi không giới hạn trước đây:
+- Sức chứa MEMPOOL_CAPACITY giao dịch. Khi đầy, giao dịch mới có fee cao hơn
+  đẩy giao dịch fee thấp nhất (nhận sau cùng) ra; nếu không thì bị từ chối và
+  API trả 429 kèm Retry-After ước lượng từ tốc độ producer ghi block.
+- Mỗi sender giữ tối đa MEMPOOL_SENDER_QUOTA giao dịch đang chờ.
+- Producer lấy giao dịch theo fee giảm dần, cùng fee thì theo thứ tự nhận.
+- Giao dịch trùng hash on-chain (tx_hash) với giao dịch đang chờ hoặc vừa ghi
+  gần đây bị từ chối (DuplicateTransaction).
+- Giao dịch chờ quá MEMPOOL_TX_TTL_S giây bị bỏ khi producer lấy lô kế tiếp.
+Mỗi worker có mempool riêng, giới hạn tính theo từng worker.
+"""
+
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import OrderedDict
+
+from .metrics import Counter
+
+MEMPOOL_CAPACITY = int(os.getenv('MEMPOOL_CAPACITY', '50000'))
+MEMPOOL_SENDER_QUOTA = int(os.getenv('MEMPOOL_SENDER_QUOTA', '1000'))
+MEMPOOL_TX_TTL_S = float(os.getenv('MEMPOOL_TX_TTL_S', '300'))
+# Số hash giao dịch đã ghi được nhớ để chặn gửi lại ngay sau khi block được ghi
+MEMPOOL_RECENT_HASHES = int(os.getenv('MEMPOOL_RECENT_HASHES', '100000'))
+# Giới hạn Retry-After (giây) trả cho client
+RETRY_AFTER_MIN_S = 1
+RETRY_AFTER_MAX_S = 60
+
+MEMPOOL_DROPPED = Counter('financechain_mempool_dropped_total',
+                          'Transactions refused or removed by the mempool', labels=('reason',))
+
+
+class MempoolError(Exception):
+    pass
+
+
+class MempoolFull(MempoolError):
+    """Admission refused because of capacity or sender quota; retry_after is in seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class DuplicateTransaction(MempoolError):
+    """A transaction with the same tx hash is pending or was just sealed"""
+
+    def __init__(self, tx_id):
+        super().__init__('duplicate transaction')
+        self.tx_id = tx_id
+
+
+class TransactionExpired(MempoolError):
+    pass
+
+
+class _Entry:
+    __slots__ = ('item', 'fee', 'seq', 'added', 'sender', 'hash')
+
+    def __init__(self, item, fee, seq, added, sender, tx_hash):
+        self.item = item
+        self.fee = fee
+        self.seq = seq
+        self.added = added
+        self.sender = sender
+        self.hash = tx_hash
+
+
+class Mempool:
+    """Bounded priority pool of PendingTx items keyed by tx_id"""
+
+    def __init__(self, capacity=MEMPOOL_CAPACITY, sender_quota=MEMPOOL_SENDER_QUOTA, ttl=MEMPOOL_TX_TTL_S,
+                 recent_hashes=MEMPOOL_RECENT_HASHES):
+        self.capacity = max(1, capacity)
+        self.sender_quota = sender_quota
+        self.ttl = ttl
+        self.recent_hashes = recent_hashes
+        # Theo thứ tự nhận: giao dịch cũ nhất ở đầu (dùng cho expire)
+        self._entries = OrderedDict()
+        # Hai heap xoá lười: (-fee, seq) để lấy ra, (fee, -seq) để chọn giao dịch bị đẩy ra
+        self._best = []
+        self._worst = []
+        self._by_sender = {}
+        self._hashes = {}
+        self._recent = OrderedDict()
+        self._seq = itertools.count()
+        # Tốc độ ghi block (giao dịch/giây, trung bình trượt) để tính Retry-After
+        self._drain_rate = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, item, now=None):
+        """Admit a PendingTx; returns the item it evicted or None.
+
+        Raises DuplicateTransaction or MempoolFull when the item is refused.
+        """
+        tx = item.tx_data
+        tx_hash = tx.get('hash')
+        if tx_hash:
+            existing = self._hashes.get(tx_hash) or self._recent.get(tx_hash)
+            if existing:
+                MEMPOOL_DROPPED.inc('duplicate')
+                raise DuplicateTransaction(existing)
+        sender = tx.get('sender')
+        if self.sender_quota > 0 and self._by_sender.get(sender, 0) >= self.sender_quota:
+            MEMPOOL_DROPPED.inc('quota')
+            raise MempoolFull('sender quota exceeded', self.retry_after(self._by_sender[sender]))
+        fee = tx.get('fee', 0)
+        evicted = None
+        if len(self._entries) >= self.capacity:
+            worst = self._peek(self._worst)
+            if worst is None or worst.fee >= fee:
+                MEMPOOL_DROPPED.inc('full')
+                raise MempoolFull('mempool full', self.retry_after(len(self._entries)))
+            self._remove(worst)
+            MEMPOOL_DROPPED.inc('evicted')
+            evicted = worst.item
+
+        entry = _Entry(item, fee, next(self._seq), time.monotonic() if now is None else now, sender, tx_hash)
+        self._entries[item.tx_id] = entry
+        self._by_sender[sender] = self._by_sender.get(sender, 0) + 1
+        if tx_hash:
+            self._hashes[tx_hash] = item.tx_id
+        heapq.heappush(self._best, (-fee, entry.seq, item.tx_id))
+        heapq.heappush(self._worst, (fee, -entry.seq, item.tx_id))
+        return evicted
+
+    def take(self, count):
+        """Remove and return up to `count` items, highest fee first"""
+        items = []
+        while len(items) < count:
+            entry = self._peek(self._best)
+            if entry is None:
+                break
+            heapq.heappop(self._best)
+            self._remove(entry)
+            items.append(entry.item)
+        self._compact()
+        return items
+
+    def expire(self, now=None):
+        """Remove and return the items that waited longer than the TTL"""
+        if self.ttl <= 0:
+            return []
+        cutoff = (time.monotonic() if now is None else now) - self.ttl
+        expired = []
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            if entry.added >= cutoff:
+                break
+            self._remove(entry)
+            expired.append(entry.item)
+        if expired:
+            MEMPOOL_DROPPED.inc('expired', amount=len(expired))
+            self._compact()
+        return expired
+
+    def mark_sealed(self, items):
+        """Remember the hashes of items written in a block for duplicate checks"""
+        if self.recent_hashes <= 0:
+            return
+        for item in items:
+            tx_hash = item.tx_data.get('hash')
+            if tx_hash:
+                self._recent[tx_hash] = item.tx_id
+        while len(self._recent) > self.recent_hashes:
+            self._recent.popitem(last=False)
+
+    def record_drain(self, count, seconds):
+        """Feed the sealing rate used for Retry-After"""
+        if count <= 0 or seconds <= 0:
+            return
+        rate = count / seconds
+        self._drain_rate = rate if self._drain_rate is None else 0.8 * self._drain_rate + 0.2 * rate
+
+    def retry_after(self, backlog=None):
+        """Seconds until `backlog` transactions (default: the whole pool) are likely sealed"""
+        backlog = len(self._entries) if backlog is None else backlog
+        if not self._drain_rate:
+            return RETRY_AFTER_MIN_S
+        return int(min(RETRY_AFTER_MAX_S, max(RETRY_AFTER_MIN_S, math.ceil(backlog / self._drain_rate))))
+
+    def _peek(self, heap):
+        # Bỏ các phần tử đã bị lấy/đẩy ra khỏi mempool (xoá lười)
+        while heap:
+            entry = self._entries.get(heap[0][2])
+            if entry is not None:
+                return entry
+            heapq.heappop(heap)
+        return None
+
+    def _remove(self, entry):
+        del self._entries[entry.item.tx_id]
+        left = self._by_sender[entry.sender] - 1
+        if left:
+            self._by_sender[entry.sender] = left
+        else:
+            del self._by_sender[entry.sender]
+        if entry.hash and self._hashes.get(entry.hash) == entry.item.tx_id:
+            del self._hashes[entry.hash]
+
+    def _compact(self):
+        # Dựng lại heap khi phần tử đã xoá chiếm quá nửa, giữ bộ nhớ tỉ lệ với số giao dịch đang chờ
+        limit = 2 * len(self._entries) + 1024
+        if len(self._best) > limit:
+            self._best = [e for e in self._best if e[2] in self._entries]
+            heapq.heapify(self._best)
+        if len(self._worst) > limit:
+            self._worst = [e for e in self._worst if e[2] in self._entries]
+            heapq.heapify(self._worst)
@@ -0,0 +1,329 @@
+"""Metrics dạng Prometheus (text format 0.0.4) cho endpoint /metrics.
+
+Không dùng prometheus_client: chỉ cần Counter / Gauge / Histogram có label,
+mỗi lần ghi là một phép cộng dưới lock (listener của pymongo chạy trên
+thread của driver). Các giá trị sẵn có trong object khác (backlog của
+producer, thống kê cache, hàng đợi chữ ký) dùng Gauge với callback, chỉ
+được đọc khi Prometheus scrape nên không tốn gì trên đường nóng.
+
+Số liệu tính theo từng process; chạy nhiều worker thì Prometheus scrape
+từng worker hoặc cộng lại theo label instance. METRICS_ENABLED=0 để tắt.
+"""
+
+import bisect
+import os
+import threading
+import time
+
+from pymongo import monitoring
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') != '0'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_registry = []
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, int) or (isinstance(value, float) and value.is_integer()):
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_str(names, values, extra=''):
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labels=(), register=True):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        if register:
+            _registry.append(self)
+
+    def _items(self):
+        """(label values, value) pairs, from the callback when there is one"""
+        if self.callback is not None:
+            result = self.callback()
+            if result is None:
+                return []
+            return list(result.items()) if isinstance(result, dict) else [((), result)]
+        with self._lock:
+            return list(self._values.items())
+
+    def _header(self):
+        doc = self.documentation.replace('\\', '\\\\').replace('\n', '\\n')
+        return [f'# HELP {self.name} {doc}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    """Monotonic count; `inc(*label_values, amount=1)`, or read from `callback` at render time"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=(), callback=None, register=True):
+        super().__init__(name, documentation, labels, register)
+        self._values = {}
+        self.callback = callback
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = self._header()
+        for values, count in self._items():
+            lines.append(f'{self.name}{_label_str(self.labels, values)} {_format_value(count)}')
+        return lines
+
+
+class Gauge(_Metric):
+    """Value that goes up and down.
+
+    Với callback (Counter cũng vậy), giá trị được đọc lúc render: callback
+    trả về một số, hoặc dict {tuple giá trị label: số} khi có label.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labels=(), callback=None, register=True):
+        super().__init__(name, documentation, labels, register)
+        self._values = {}
+        self.callback = callback
+
+    def set(self, value, *label_values):
+        self._values[label_values] = value
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = self._header()
+        for values, value in self._items():
+            if value is None:
+                continue
+            lines.append(f'{self.name}{_label_str(self.labels, values)} {_format_value(value)}')
+        return lines
+
+
+class Histogram(_Metric):
+    """Bucketed observations; `observe(value, *label_values)`"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS, register=True):
+        super().__init__(name, documentation, labels, register)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [đếm từng bucket (không cộng dồn) + bucket +Inf, tổng]
+        self._series = {}
+
+    def observe(self, value, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def count(self, *label_values):
+        series = self._series.get(label_values)
+        return sum(series[0]) if series else 0
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = [(values, list(counts), total) for values, (counts, total) in self._series.items()]
+        for values, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f'{self.name}_bucket{_label_str(self.labels, values, le)} {cumulative}')
+            label_str = _label_str(self.labels, values)
+            lines.append(f'{self.name}_sum{label_str} {_format_value(total)}')
+            lines.append(f'{self.name}_count{label_str} {cumulative}')
+        return lines
+
+
+def render():
+    """All registered metrics in Prometheus text format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+# HTTP
+
+HTTP_REQUESTS = Counter('financechain_http_requests_total', 'HTTP requests by route template and status',
+                        ('method', 'route', 'status'))
+HTTP_LATENCY = Histogram('financechain_http_request_duration_seconds', 'HTTP request latency by route template',
+                         ('method', 'route'))
+HTTP_IN_FLIGHT = Gauge('financechain_http_requests_in_flight', 'HTTP requests currently being handled')
+
+
+class MetricsMiddleware:
+    """ASGI middleware: request count and latency per route template (không theo path để giữ ít label)"""
+
+    def __init__(self, app, enabled=METRICS_ENABLED):
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get('route')
+            template = getattr(route, 'path', None) or 'unmatched'
+            HTTP_LATENCY.observe(time.perf_counter() - start, scope['method'], template)
+            HTTP_REQUESTS.inc(scope['method'], template, str(status))
+
+
+# MongoDB
+
+MONGO_COMMAND_LATENCY = Histogram('financechain_mongo_command_duration_seconds',
+                                  'MongoDB command round-trip time by collection and command',
+                                  ('collection', 'command'), buckets=DB_BUCKETS)
+MONGO_COMMAND_FAILURES = Counter('financechain_mongo_command_failures_total',
+                                 'MongoDB commands that returned an error', ('collection', 'command'))
+MONGO_POOL_CONNECTIONS = Gauge('financechain_mongo_pool_connections', 'Open connections in the driver pool',
+                               ('client', 'address'))
+MONGO_POOL_IN_USE = Gauge('financechain_mongo_pool_connections_in_use', 'Connections checked out of the pool',
+                          ('client', 'address'))
+MONGO_POOL_WAIT = Histogram('financechain_mongo_pool_checkout_wait_seconds',
+                            'Time spent waiting for a pool connection', ('client',), buckets=DB_BUCKETS)
+MONGO_POOL_CHECKOUT_FAILURES = Counter('financechain_mongo_pool_checkout_failures_total',
+                                       'Connection checkouts that failed (pool timeout, connection error)',
+                                       ('client', 'reason'))
+
+# Lệnh quản trị / handshake không gắn với collection
+_ADMIN_COMMANDS = frozenset(('hello', 'ismaster', 'isMaster', 'ping', 'endSessions', 'buildInfo', 'saslStart',
+                             'saslContinue', 'killCursors'))
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Time every MongoDB command by collection and command name"""
+
+    def __init__(self):
+        # request_id -> collection; started/succeeded có thể chạy trên thread khác nhau
+        self._collections = {}
+
+    def started(self, event):
+        command = event.command_name
+        if command in _ADMIN_COMMANDS:
+            collection = ''
+        else:
+            collection = event.command.get(command)
+            if not isinstance(collection, str):
+                # getMore mang cursor id, tên collection nằm ở trường 'collection'
+                collection = event.command.get('collection', '')
+        self._collections[(event.connection_id, event.request_id)] = collection
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), '')
+        MONGO_COMMAND_LATENCY.observe(event.duration_micros / 1e6, collection, event.command_name)
+
+    def failed(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), '')
+        MONGO_COMMAND_LATENCY.observe(event.duration_micros / 1e6, collection, event.command_name)
+        MONGO_COMMAND_FAILURES.inc(collection, event.command_name)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Open / checked-out connections and checkout wait for one client"""
+
+    def __init__(self, client_name):
+        self.client_name = client_name
+        # Bắt đầu và kết thúc checkout cùng chạy trên một thread
+        self._local = threading.local()
+
+    def _address(self, event):
+        host, port = event.address
+        return f'{host}:{port}'
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        MONGO_POOL_CONNECTIONS.set(0, self.client_name, self._address(event))
+        MONGO_POOL_IN_USE.set(0, self.client_name, self._address(event))
+
+    def connection_created(self, event):
+        MONGO_POOL_CONNECTIONS.inc(self.client_name, self._address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        MONGO_POOL_CONNECTIONS.dec(self.client_name, self._address(event))
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self._local.started = None
+        MONGO_POOL_CHECKOUT_FAILURES.inc(self.client_name, str(event.reason))
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, 'started', None)
+        if started is not None:
+            MONGO_POOL_WAIT.observe(time.perf_counter() - started, self.client_name)
+            self._local.started = None
+        MONGO_POOL_IN_USE.inc(self.client_name, self._address(event))
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_IN_USE.dec(self.client_name, self._address(event))
+
+
+def mongo_listeners(client_name):
+    """event_listeners for a MongoClient / AsyncIOMotorClient (empty when metrics are off)"""
+    if not METRICS_ENABLED:
+        return []
+    return [CommandMetrics(), PoolMetrics(client_name)]
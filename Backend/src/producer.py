@@ -0,0 +1,330 @@
+"""Block producer: gom giao dịch vào mempool và mine nhiều giao dịch mỗi block.
+
+Thay cho việc mỗi request tự insert tx, đếm block, insert block một giao
+dịch rồi cập nhật tx, các endpoint chỉ cần submit() rồi trả về ngay. Một
+task nền lấy giao dịch từ mempool (có giới hạn, xem src/mempool.py) theo fee
+giảm dần và niêm phong block khi đủ
+BLOCK_MAX_TXS giao dịch hoặc sau BLOCK_MAX_WAIT_MS kể từ giao dịch đầu
+tiên, ghi bằng insert_many / bulk_write (giống BlockChain.mine_block).
+
+Khi chạy nhiều worker, mỗi worker có producer riêng. Block được nối vào
+đỉnh chuỗi dưới chain_lock() (lock của storage, dùng chung với nạp hàng
+loạt trong src/ingest.py) bằng cách insert với index = đỉnh + 1: unique
+index trên blocks.index vẫn đóng vai compare-and-swap, nếu đỉnh đã nhớ cũ
+thì nhận DuplicateKeyError, đọc lại đỉnh chuỗi (index, hash) rồi tính lại
+hash và thử lại. Mempool,
+is_pending() và wait_for() chỉ biết giao dịch do chính worker đó nhận.
+"""
+
+import asyncio
+import os
+import time
+
+from bson import ObjectId
+
+from .chain import attach_transactions, compute_block_hash, get_chain_tip
+from .database import (
+    chain_lock, delete_transactions, get_storage, save_block, save_transactions,
+    transition_payment, update_payments,
+)
+from .logs import logger
+from .mempool import Mempool, MempoolError, MempoolFull, TransactionExpired
+from .metrics import Counter, Gauge, Histogram
+from .storage import DuplicateKeyError
+
+BLOCK_MAX_TXS = int(os.getenv('BLOCK_MAX_TXS', '100'))
+BLOCK_MAX_WAIT_MS = float(os.getenv('BLOCK_MAX_WAIT_MS', '100'))
+# Số lần thử lại khi worker khác vừa ghi block ở cùng index
+BLOCK_APPEND_RETRIES = int(os.getenv('BLOCK_APPEND_RETRIES', '20'))
+
+BLOCKS_MINED = Counter('financechain_blocks_mined_total', 'Blocks sealed by the producer')
+BLOCK_SEAL_FAILURES = Counter('financechain_block_seal_failures_total', 'Block writes that failed')
+BLOCK_TRANSACTIONS = Histogram('financechain_block_transactions', 'Transactions per sealed block',
+                               buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000))
+BLOCK_APPEND_CONFLICTS = Counter('financechain_block_append_conflicts_total',
+                                 'Block appends retried because another worker took the index')
+BLOCK_SEAL_SECONDS = Histogram('financechain_block_seal_duration_seconds',
+                               'Time to write a block and its transactions')
+
+
+class ProducerStopped(MempoolError):
+    """The sealing task is not running (not started, stopped or crashed); nothing can be queued"""
+
+
+class PendingTx:
+    """A queued transaction plus the future resolved when its block is sealed"""
+
+    __slots__ = ('tx_id', 'tx_data', 'payment_id', 'future')
+
+    def __init__(self, tx_id, tx_data, payment_id, future):
+        self.tx_id = tx_id
+        self.tx_data = tx_data
+        self.payment_id = payment_id
+        self.future = future
+
+
+class BlockProducer:
+    def __init__(self, max_txs=BLOCK_MAX_TXS, max_wait_ms=BLOCK_MAX_WAIT_MS):
+        self.max_txs = max(1, max_txs)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.mempool = Mempool()
+        self._wakeup = None
+        self._idle = False
+        self._stopping = False
+        self._task = None
+        self._pending = {}
+        self._tip_index = None
+        self._tip_hash = None
+        self._background = set()
+
+    async def start(self):
+        """Read the chain tip, then start the background sealing task on the running event loop.
+
+        Errors reading the storage are raised here so the app fails at startup
+        instead of accepting transactions nobody will seal.
+        """
+        await self._check_unique_index()
+        self._tip_index, self._tip_hash = await get_chain_tip()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        self._task.add_done_callback(self._on_exit)
+
+    def _on_exit(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error('block producer stopped', exc_info=task.exception())
+
+    async def stop(self):
+        """Seal whatever is still in the mempool, then stop the background task"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        # Task đã dừng vì lỗi thì lỗi đã được ghi log trong _on_exit
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    def submit(self, tx_data, payment_id=None):
+        """Queue a transaction for the next block; returns its transaction id.
+
+        If payment_id is given the payment is marked confirmed in the same
+        block write; the caller moves it to 'confirming' first and it goes back
+        to 'pending' if the transaction is dropped. Raises MempoolFull or DuplicateTransaction when the
+        mempool refuses it, ProducerStopped when the sealing task is not running.
+        """
+        self._check_running()
+        tx_id = self._enqueue(tx_data, payment_id)
+        self._notify()
+        return tx_id
+
+    def submit_many(self, txs):
+        """Queue many transactions at once; returns a transaction id or the mempool error per item.
+
+        They are sealed BLOCK_MAX_TXS per block like single submissions, with
+        one wakeup for the whole group.
+        """
+        try:
+            self._check_running()
+        except ProducerStopped as e:
+            return [e] * len(txs)
+        results = []
+        for tx_data in txs:
+            try:
+                results.append(self._enqueue(tx_data, None))
+            except MempoolError as e:
+                results.append(e)
+        self._notify()
+        return results
+
+    def _check_running(self):
+        if self._task is None or self._task.done():
+            raise ProducerStopped('block producer is not running')
+
+    def _enqueue(self, tx_data, payment_id):
+        tx_id = ObjectId()
+        tx_data['_id'] = tx_id
+        future = asyncio.get_running_loop().create_future()
+        # Tránh cảnh báo "exception was never retrieved" khi không ai chờ kết quả
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        item = PendingTx(str(tx_id), tx_data, payment_id, future)
+        evicted = self.mempool.add(item)
+        self._pending[item.tx_id] = item
+        if evicted is not None:
+            self._drop([evicted], MempoolFull('evicted by higher-fee transaction', self.mempool.retry_after()))
+        return item.tx_id
+
+    def _notify(self):
+        if self._idle or len(self.mempool) >= self.max_txs:
+            self._wakeup.set()
+
+    def _drop(self, items, error):
+        payment_ids = []
+        for item in items:
+            self._pending.pop(item.tx_id, None)
+            if not item.future.done():
+                item.future.set_exception(error)
+            if item.payment_id:
+                payment_ids.append(item.payment_id)
+        if payment_ids:
+            task = asyncio.get_running_loop().create_task(self._release_payments(payment_ids))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+    async def _release_payments(self, payment_ids):
+        """Put payments whose transaction was dropped back to pending so they can be confirmed again"""
+        for payment_id in payment_ids:
+            try:
+                await transition_payment(payment_id, 'confirming', {"status": "pending"})
+            except Exception:
+                logger.exception('payment release failed', extra={'fields': {'payment_id': payment_id}})
+
+    def is_pending(self, tx_id):
+        """True while the transaction is queued and not yet written in a block"""
+        return tx_id in self._pending
+
+    async def wait_for(self, tx_id, timeout=None):
+        """Wait until the transaction is sealed; returns {block_id, block_index}"""
+        item = self._pending.get(tx_id)
+        if item is None:
+            return None
+        return await asyncio.wait_for(asyncio.shield(item.future), timeout)
+
+    async def wait_many(self, tx_ids, timeout=None):
+        """Wait until all given transactions are sealed or `timeout` passes.
+
+        Returns {tx_id: {block_id, block_index} or the exception} for the ones
+        that finished; still-pending, cancelled and unknown ids are left out.
+        """
+        futures = {tx_id: self._pending[tx_id].future for tx_id in tx_ids if tx_id in self._pending}
+        if futures:
+            await asyncio.wait(futures.values(), timeout=timeout)
+        return {tx_id: f.exception() or f.result() for tx_id, f in futures.items() if f.done() and not f.cancelled()}
+
+    @property
+    def backlog(self):
+        return len(self._pending)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not len(self.mempool):
+                if self._stopping:
+                    break
+                self._idle = True
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                self._idle = False
+                continue
+            deadline = loop.time() + self.max_wait
+            while len(self.mempool) < self.max_txs and not self._stopping:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            self._drop(self.mempool.expire(), TransactionExpired('transaction expired in mempool'))
+            batch = self.mempool.take(self.max_txs)
+            if batch:
+                await self._seal(batch)
+
+    async def _check_unique_index(self):
+        if not await get_storage().block_index_unique():
+            logger.warning('blocks.index is not unique; concurrent workers can fork the chain '
+                           '(run scripts/manage_indexes.py apply)')
+
+    async def _append(self, block_data, batch, transactions=None):
+        """Insert the block right after the current chain tip; returns its index"""
+        # Nạp hàng loạt (src/ingest.py) cũng nối vào đỉnh chuỗi dưới cùng lock
+        async with chain_lock():
+            return await self._append_at_tip(block_data, batch, transactions)
+
+    async def _append_at_tip(self, block_data, batch, transactions):
+        for _ in range(BLOCK_APPEND_RETRIES):
+            block_index = 0 if self._tip_index is None else self._tip_index + 1
+            if len(batch) == 1:
+                tx = batch[0].tx_data
+                # Tạo label dễ đọc cho block, ví dụ: "Alice → Bob (Block #3)"
+                label = f"{tx.get('sender')} → {tx.get('recipient')} (Block #{block_index})"
+            else:
+                label = f"{len(batch)} giao dịch (Block #{block_index})"
+            block_data.update({
+                "index": block_index,
+                "timestamp": time.time(),
+                "label": label,
+                "previous_hash": self._tip_hash,
+            })
+            block_data["hash"] = compute_block_hash(block_data)
+            try:
+                await save_block(block_data, transactions)
+            except DuplicateKeyError:
+                # Worker khác hoặc ingest đã ghi block ở index này: đọc lại đỉnh chuỗi rồi thử lại
+                BLOCK_APPEND_CONFLICTS.inc()
+                self._tip_index, self._tip_hash = await get_chain_tip()
+                continue
+            self._tip_index, self._tip_hash = block_index, block_data["hash"]
+            return block_index
+        raise RuntimeError(f'could not append block after {BLOCK_APPEND_RETRIES} attempts')
+
+    async def _seal(self, batch):
+        block_id = ObjectId()
+        start = time.perf_counter()
+        try:
+            tx_docs = []
+            for item in batch:
+                item.tx_data['mined'] = True
+                item.tx_data['block_id'] = str(block_id)
+                tx_docs.append(item.tx_data)
+            await save_transactions(tx_docs)
+
+            block_data = attach_transactions({"_id": block_id}, tx_docs)
+            # Block dạng reference không chứa giao dịch: truyền kèm cho sự kiện stream và rollups
+            block_index = await self._append(block_data, batch, None if "transactions" in block_data else tx_docs)
+            label = block_data["label"]
+        except Exception as e:
+            BLOCK_SEAL_FAILURES.inc()
+            logger.exception('block seal failed', extra={'fields': {'txs': len(batch)}})
+            try:
+                # Giao dịch đã ghi với mined=True trỏ tới block không tồn tại: xoá đi
+                await delete_transactions([item.tx_data['_id'] for item in batch])
+            except Exception:
+                logger.exception('orphaned transaction cleanup failed', extra={'fields': {'block_id': str(block_id)}})
+            self._drop(batch, e)
+            return
+        elapsed = time.perf_counter() - start
+        BLOCKS_MINED.inc()
+        BLOCK_TRANSACTIONS.observe(len(batch))
+        BLOCK_SEAL_SECONDS.observe(elapsed)
+        self.mempool.record_drain(len(batch), elapsed)
+        self.mempool.mark_sealed(batch)
+        logger.info('block mined', extra={'fields': {
+            'block_index': block_index, 'block_id': str(block_id), 'label': label, 'txs': len(batch)}})
+
+        now = time.time()
+        try:
+            await update_payments([
+                (item.payment_id, {"status": "confirmed", "transaction_id": item.tx_id,
+                                   "block_id": str(block_id), "confirmed_at": now})
+                for item in batch if item.payment_id
+            ])
+        except Exception:
+            # Block đã ghi xong; payment sẽ còn ở trạng thái confirming
+            logger.exception('payment confirmation failed', extra={'fields': {'block_index': block_index}})
+
+        result = {"block_id": str(block_id), "block_index": block_index}
+        for item in batch:
+            self._pending.pop(item.tx_id, None)
+            if not item.future.done():
+                item.future.set_result(result)
+
+
+producer = BlockProducer()
+
+Gauge('financechain_producer_backlog', 'Transactions accepted but not yet written in a block',
+      callback=lambda: producer.backlog)
+Gauge('financechain_mempool_depth', 'Transactions waiting in the mempool', callback=lambda: len(producer.mempool))
+Gauge('financechain_mempool_capacity', 'Mempool capacity', callback=lambda: producer.mempool.capacity)
@@ -0,0 +1,213 @@
+"""Kiểm tra chữ ký ví (eth personal_sign) ngoài event loop.
+
+Account.recover_message (khôi phục địa chỉ bằng ECDSA secp256k1) tốn vài
+ms CPU mỗi lần; gọi thẳng trong handler async sẽ chặn mọi request khác.
+SignatureVerifier chạy việc này trên một pool giới hạn số worker (process
+pool mặc định, vì backend thuần Python của eth_keys giữ GIL), gom các
+request trùng (message, signature) đang chạy vào cùng một future và nhớ
+kết quả trong một LRU cache. recover_many() gửi theo lô cho nạp hàng loạt.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .metrics import Counter, Gauge
+
+try:
+    from eth_account import Account
+    from eth_account.messages import encode_defunct
+except Exception:
+    encode_defunct = None
+    Account = None
+
+SIGNATURE_POOL = os.getenv('SIGNATURE_POOL', 'process')  # process | thread
+SIGNATURE_WORKERS = int(os.getenv('SIGNATURE_WORKERS', str(min(4, os.cpu_count() or 1))))
+SIGNATURE_CACHE_SIZE = int(os.getenv('SIGNATURE_CACHE_SIZE', '10000'))
+SIGNATURE_BATCH_SIZE = int(os.getenv('SIGNATURE_BATCH_SIZE', '64'))
+# Số chữ ký tối đa được chờ trong hàng đợi; vượt quá thì request nhận 503 thay vì xếp hàng vô hạn
+SIGNATURE_MAX_PENDING = int(os.getenv('SIGNATURE_MAX_PENDING', '1000'))
+LATENCY_WINDOW = 1000
+
+
+class SignatureError(Exception):
+    """The signature could not be recovered (malformed message or signature)"""
+
+
+class VerifierBusy(Exception):
+    """Too many signatures are already waiting for the pool"""
+
+
+def _recover_batch(pairs):
+    """Recover signer addresses for [(message, signature)]; runs inside the pool.
+
+    Returns one (address, None) or (None, error) per pair so that a bad
+    signature does not fail the whole batch.
+    """
+    results = []
+    for message, signature in pairs:
+        try:
+            address = Account.recover_message(encode_defunct(text=message), signature=signature)
+            results.append((address, None))
+        except Exception as e:
+            results.append((None, str(e) or type(e).__name__))
+    return results
+
+
+class SignatureVerifier:
+    def __init__(self, pool=SIGNATURE_POOL, workers=SIGNATURE_WORKERS, cache_size=SIGNATURE_CACHE_SIZE,
+                 max_pending=SIGNATURE_MAX_PENDING):
+        self.pool_kind = pool
+        self.max_pending = max_pending
+        self.workers = max(1, workers)
+        self.cache_size = cache_size
+        self._executor = None
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._slots = None
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.cache_hits = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    @property
+    def available(self):
+        return Account is not None
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.pool_kind == 'thread':
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='sigverify')
+            else:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            self._slots = asyncio.Semaphore(self.workers)
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _cache_get(self, key):
+        result = self._cache.get(key)
+        if result is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+        return result
+
+    def _cache_put(self, key, result):
+        if self.cache_size <= 0:
+            return
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _run_batch(self, pairs, bounded=True):
+        """Run one batch on the pool, at most `workers` batches at a time"""
+        executor = self._get_executor()
+        if bounded and self.max_pending > 0 and self.waiting + len(pairs) > self.max_pending:
+            raise VerifierBusy(f'{self.waiting} signatures already waiting')
+        start = time.perf_counter()
+        self.waiting += len(pairs)
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= len(pairs)
+        self.running += len(pairs)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, _recover_batch, pairs)
+        finally:
+            self.running -= len(pairs)
+            self._slots.release()
+            # Latency tính cả thời gian chờ trong hàng đợi
+            elapsed = (time.perf_counter() - start) * 1000
+            self._latencies.extend([elapsed] * min(len(pairs), LATENCY_WINDOW))
+
+    def _record(self, key, result):
+        self.completed += 1
+        if result[1] is not None:
+            self.failed += 1
+        self._cache_put(key, result)
+
+    async def recover(self, message, signature):
+        """Address that signed `message`; raises SignatureError if it cannot be recovered"""
+        if not self.available:
+            raise SignatureError('eth_account is not installed')
+        key = (message, signature)
+        result = self._cache_get(key)
+        if result is None:
+            future = self._inflight.get(key)
+            if future is None:
+                # Request trùng (retry, gửi lại) đang chạy thì chờ chung một kết quả
+                future = asyncio.ensure_future(self._run_batch([key]))
+                self._inflight[key] = future
+                try:
+                    [result] = await asyncio.shield(future)
+                    self._record(key, result)
+                finally:
+                    self._inflight.pop(key, None)
+            else:
+                [result] = await asyncio.shield(future)
+        address, error = result
+        if error is not None:
+            raise SignatureError(error)
+        return address
+
+    async def verify(self, message, signature, address):
+        """True if `address` (any case) signed `message`"""
+        return (await self.recover(message, signature)).lower() == address.lower()
+
+    async def recover_many(self, pairs, batch_size=SIGNATURE_BATCH_SIZE):
+        """Recover many (message, signature) pairs; returns an address or SignatureError per pair"""
+        if not self.available:
+            raise SignatureError('eth_account is not installed')
+        results = [None] * len(pairs)
+        todo = {}
+        for i, key in enumerate(pairs):
+            cached = self._cache_get(key)
+            if cached is not None:
+                results[i] = cached
+            else:
+                todo.setdefault(key, []).append(i)
+        keys = list(todo)
+        batches = [keys[i:i + batch_size] for i in range(0, len(keys), max(1, batch_size))]
+        for batch, batch_results in zip(batches, await asyncio.gather(*[self._run_batch(b, bounded=False) for b in batches])):
+            for key, result in zip(batch, batch_results):
+                self._record(key, result)
+                for i in todo[key]:
+                    results[i] = result
+        return [SignatureError(error) if error is not None else address for address, error in results]
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+
+        def pct(p):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 3) if latencies else None
+
+        return {
+            "available": self.available,
+            "pool": self.pool_kind,
+            "workers": self.workers,
+            "queue_depth": self.waiting,
+            "max_pending": self.max_pending,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cache_hits": self.cache_hits,
+            "cache_size": len(self._cache),
+            "latency_ms": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99)},
+        }
+
+
+verifier = SignatureVerifier()
+
+Gauge('financechain_signature_queue_depth', 'Signatures waiting for a verifier worker', callback=lambda: verifier.waiting)
+Gauge('financechain_signature_running', 'Signatures being recovered right now', callback=lambda: verifier.running)
+Counter('financechain_signature_verifications_total', 'Signature recoveries by result', ('result',),
+        callback=lambda: {('ok',): verifier.completed - verifier.failed, ('error',): verifier.failed,
+                          ('cached',): verifier.cache_hits})
@@ -0,0 +1,5 @@
+"""Lớp lưu trữ: giao diện Storage và các engine (mongo, sqlite), chọn bằng STORAGE_ENGINE."""
+
+from .base import DEFAULT_BATCH_SIZE, DuplicateKeyError, Storage  # noqa: F401
+
+ENGINES = ('mongo', 'sqlite')
@@ -0,0 +1,237 @@
+"""Giao diện lưu trữ chung cho các engine (STORAGE_ENGINE=mongo | sqlite).
+
+Storage gom mọi thao tác đọc/ghi dữ liệu mà src/database.py cần: giao dịch,
+block, payment, balances/rollups, thống kê, checkpoint
+(chain_state, ingest_state) và lock giữa các worker. Engine chỉ lưu và đọc
+document; cache response, sự kiện stream và tính rollups vẫn nằm ở
+src/database.py nên mọi engine cho kết quả giống nhau. Document đi vào và đi
+ra giống document Motor trả về: _id là ObjectId, thời gian là datetime UTC
+naive (độ chính xác millisecond).
+"""
+
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from bson import ObjectId
+
+# Kích thước lô mặc định khi đọc block tuần tự (kiểm tra chuỗi, tính rollups, export)
+DEFAULT_BATCH_SIZE = 1000
+# Các trường lọc của danh sách giao dịch (GET /api/transactions)
+TRANSACTION_FILTERS = ('sender', 'recipient', 'mined', 'since', 'until')
+
+
+class DuplicateKeyError(Exception):
+    """A block with the same index (or a document with the same _id) already exists"""
+
+
+def tx_position(doc):
+    """Keyset position (created_at, _id) of a transaction document"""
+    created = doc.get('created_at')
+    return [created.isoformat() if isinstance(created, datetime) else None, str(doc['_id'])]
+
+
+def parse_tx_position(position):
+    """(created_at or None, ObjectId) from a tx_position(); raises ValueError if malformed"""
+    try:
+        created, oid = position
+        oid = ObjectId(oid)
+        created = datetime.fromisoformat(created) if created is not None else None
+    except Exception:
+        raise ValueError('invalid cursor')
+    return created, oid
+
+
+class Storage(ABC):
+    """Persistence used by src/database.py; one instance per process"""
+
+    name = None
+
+    async def close(self):
+        """Release connections / file handles"""
+
+    # Giao dịch
+
+    @abstractmethod
+    async def insert_transactions(self, transactions):
+        """Insert documents as given (an _id is added when missing); returns their ids as strings.
+
+        Raises DuplicateKeyError if an _id is taken; the other documents may or may not be written.
+        """
+
+    @abstractmethod
+    async def get_transaction(self, tx_id):
+        """Full transaction document, or None (also for a malformed id)"""
+
+    @abstractmethod
+    async def list_transactions(self):
+        """All transactions newest first, without signed_message"""
+
+    @abstractmethod
+    async def transactions_page(self, limit, after=None, filters=None):
+        """One page in (created_at desc, _id desc) order after keyset position `after`.
+
+        `filters` may hold sender, recipient, mined and since/until (datetimes on
+        created_at). Documents without created_at sort last. Returns
+        (transactions, next_position); next_position is None on the last page.
+        """
+
+    @abstractmethod
+    async def delete_pending_transactions(self, before):
+        """Delete unmined transactions created before `before` or without created_at; returns how many"""
+
+    @abstractmethod
+    async def delete_transactions(self, tx_ids):
+        """Delete transactions by _id (ObjectIds); returns how many"""
+
+    # Block
+
+    @abstractmethod
+    async def insert_block(self, block):
+        """Insert one block; raises DuplicateKeyError if its index is taken"""
+
+    @abstractmethod
+    async def insert_blocks(self, blocks, transactions):
+        """Bulk-insert blocks and their transactions (ingest); order between the two is not guaranteed.
+
+        Raises DuplicateKeyError like insert_transactions / insert_block.
+        """
+
+    @abstractmethod
+    async def delete_blocks(self, block_ids):
+        """Delete blocks by _id together with the transactions pointing to them"""
+
+    @abstractmethod
+    async def block_indexes(self, block_ids):
+        """Index of each stored block among `block_ids`, as {str(_id): index}"""
+
+    @abstractmethod
+    async def blocks_page(self, limit, after_index=None, sender=None, recipient=None, since=None, until=None):
+        """One page of blocks in ascending index order, transactions filled in, without signed_message.
+
+        sender/recipient keep blocks holding a transaction from/to that account;
+        since/until (datetimes) apply to the block timestamp. Returns
+        (blocks, next_index); next_index is None on the last page.
+        """
+
+    @abstractmethod
+    async def iter_blocks(self, after_index=None, batch_size=DEFAULT_BATCH_SIZE, tx_fields=None):
+        """Async iterator over lists of full blocks (transactions filled in) in index order.
+
+        `tx_fields` is a hint that only these transaction fields are needed.
+        """
+
+    @abstractmethod
+    async def count_blocks(self):
+        """Number of stored blocks"""
+
+    @abstractmethod
+    async def chain_tip(self):
+        """(index, hash) of the block with the highest index, or None"""
+
+    @abstractmethod
+    async def hydrate_blocks(self, blocks, full=False):
+        """Fill `transactions` of reference-layout blocks; without `full` signed_message is left out"""
+
+    async def block_index_unique(self):
+        """True if the store rejects two blocks with the same index"""
+        return True
+
+    # Payment
+
+    @abstractmethod
+    async def insert_payment(self, payment):
+        """Insert a payment document; returns its id as a string"""
+
+    @abstractmethod
+    async def list_payments(self):
+        """All payments, newest created_at first"""
+
+    @abstractmethod
+    async def get_payment(self, payment_id):
+        """Payment document, or None (also for a malformed id)"""
+
+    @abstractmethod
+    async def update_payments(self, updates):
+        """Set fields for many (payment_id, fields) pairs; returns how many documents changed.
+
+        Raises ValueError for a malformed payment id.
+        """
+
+    @abstractmethod
+    async def update_payment_if(self, payment_id, status, fields):
+        """Set fields on one payment only while its status is `status`, atomically.
+
+        Returns True if the payment matched; False if it is missing, malformed
+        or in another status.
+        """
+
+    # Balances / rollups
+
+    @abstractmethod
+    async def apply_rollups(self, balances, days):
+        """Add per-account and per-day deltas (upserting missing keys)"""
+
+    @abstractmethod
+    async def replace_rollups(self, balances, days, batch_size=DEFAULT_BATCH_SIZE):
+        """Replace all balances and daily rollups with the given values"""
+
+    @abstractmethod
+    async def load_rollups(self):
+        """(balances, days): every stored balance / daily rollup keyed by account / day"""
+
+    @abstractmethod
+    async def get_balance(self, account):
+        """{received, sent, count_in, count_out} of one account, or None"""
+
+    @abstractmethod
+    async def daily_rollups(self, since=None, until=None):
+        """[{count, volume, blocks, day}] with since <= day < until ('YYYY-MM-DD'), oldest first"""
+
+    # Thống kê (chỉ số tiền dạng số được cộng)
+
+    @abstractmethod
+    async def stats_totals(self):
+        """{transactions, volume, pending, blocks} across the whole ledger"""
+
+    @abstractmethod
+    async def account_totals(self, field, account):
+        """{count, total} of transactions whose `field` (sender/recipient) is `account`"""
+
+    @abstractmethod
+    async def top_accounts(self, field, limit):
+        """[{total, count, account}] grouped on sender/recipient, largest total first"""
+
+    @abstractmethod
+    async def time_buckets(self, fmt, since=None, until=None):
+        """[{count, volume, period}] grouped by strftime `fmt` of created_at, oldest first"""
+
+    # Checkpoint (chain_state, ingest_state) và lock
+
+    @abstractmethod
+    async def get_state(self, collection, key):
+        """State document {_id: key, ...} or None"""
+
+    @abstractmethod
+    async def set_state(self, collection, key, fields):
+        """Upsert state `key`, setting `fields`"""
+
+    @abstractmethod
+    async def delete_state(self, collection, key):
+        """Remove state `key`"""
+
+    @abstractmethod
+    async def acquire_lock(self, name, owner, ttl):
+        """Take or renew lock `name` for `ttl` seconds; False if another owner holds it"""
+
+    @abstractmethod
+    async def release_lock(self, name, owner):
+        """Release lock `name` if `owner` holds it"""
+
+    # Export
+
+    @abstractmethod
+    async def export_batches(self, collection, filters=None, batch_size=DEFAULT_BATCH_SIZE):
+        """Async iterator over lists of stored documents of 'blocks' (by index) or 'transactions' (by _id).
+
+        `filters` may hold after_index (blocks) or mined (transactions).
+        """
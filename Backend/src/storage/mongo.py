@@ -0,0 +1,401 @@
+"""Engine MongoDB (STORAGE_ENGINE=mongo, mặc định) qua Motor.
+
+Dùng database của MongoConnection trong src/database.py; collection, index
+(src/indexes.py) và định dạng document giữ nguyên như trước khi có lớp
+Storage. Block dạng reference (BLOCK_LAYOUT=reference) được đọc kèm giao
+dịch bằng một lệnh $in cho mỗi lô.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError as MongoDuplicateKeyError
+
+from .base import DEFAULT_BATCH_SIZE, DuplicateKeyError, Storage, parse_tx_position, tx_position
+
+# Projection cho các endpoint danh sách: bỏ các trường lớn client không dùng,
+# để driver không phải decode chúng (signed_message chỉ cần khi kiểm tra chữ ký)
+TRANSACTION_LIST_PROJECTION = {'signed_message': 0}
+BLOCK_LIST_PROJECTION = {'transactions.signed_message': 0}
+# Giao dịch đọc lại cho block dạng reference: bỏ block_id (block đã biết), như bản nhúng
+TX_IN_BLOCK_PROJECTION = {'block_id': 0}
+TX_IN_BLOCK_LIST_PROJECTION = {'block_id': 0, 'signed_message': 0}
+
+# collection -> thứ tự xuất (đều đi theo index có sẵn)
+EXPORT_SORTS = {
+    'blocks': [('index', 1)],
+    'transactions': [('_id', 1)],
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _object_id(value):
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+
+def _only_duplicates(error):
+    """True if every write error of a BulkWriteError is a duplicate key (E11000)"""
+    errors = error.details.get('writeErrors', [])
+    return bool(errors) and not error.details.get('writeConcernErrors') and all(e.get('code') == 11000 for e in errors)
+
+
+def build_transaction_filter(sender=None, recipient=None, mined=None, since=None, until=None):
+    """Build a Mongo filter for the transaction list endpoint"""
+    query = {}
+    if sender:
+        query['sender'] = sender
+    if recipient:
+        query['recipient'] = recipient
+    if mined is not None:
+        query['mined'] = mined
+    if since is not None or until is not None:
+        created = {}
+        if since is not None:
+            created['$gte'] = since
+        if until is not None:
+            created['$lt'] = until
+        query['created_at'] = created
+    return query
+
+
+def _after_tx_position(position):
+    """Filter selecting transactions after `position` in (created_at desc, _id desc) order"""
+    created, oid = parse_tx_position(position)
+    if created is None:
+        # Documents without created_at (legacy seed data) sort last
+        return {'created_at': None, '_id': {'$lt': oid}}
+    return {'$or': [
+        {'created_at': {'$lt': created}},
+        {'created_at': created, '_id': {'$lt': oid}},
+        {'created_at': None},
+    ]}
+
+
+class MongoStorage(Storage):
+    name = 'mongo'
+
+    def __init__(self, db, block_layout='embedded'):
+        self.db = db
+        self.block_layout = block_layout
+
+    # Giao dịch
+
+    async def insert_transactions(self, transactions):
+        try:
+            result = await self.db.transactions.insert_many(transactions, ordered=False)
+        except BulkWriteError as e:
+            if _only_duplicates(e):
+                raise DuplicateKeyError(str(e)) from e
+            raise
+        return [str(oid) for oid in result.inserted_ids]
+
+    async def get_transaction(self, tx_id):
+        oid = _object_id(tx_id)
+        if oid is None:
+            return None
+        return await self.db.transactions.find_one({'_id': oid})
+
+    async def list_transactions(self):
+        cursor = self.db.transactions.find({}, TRANSACTION_LIST_PROJECTION).sort('created_at', -1)
+        return await cursor.to_list(length=None)
+
+    async def transactions_page(self, limit, after=None, filters=None):
+        query = build_transaction_filter(**(filters or {}))
+        clauses = [query] if query else []
+        if after is not None:
+            clauses.append(_after_tx_position(after))
+        if len(clauses) > 1:
+            mongo_filter = {'$and': clauses}
+        else:
+            mongo_filter = clauses[0] if clauses else {}
+        cursor = self.db.transactions.find(mongo_filter, TRANSACTION_LIST_PROJECTION)
+        docs = await cursor.sort([('created_at', -1), ('_id', -1)]).limit(limit + 1).to_list(length=limit + 1)
+        next_position = tx_position(docs[limit - 1]) if len(docs) > limit else None
+        return docs[:limit], next_position
+
+    async def delete_pending_transactions(self, before):
+        result = await self.db.transactions.delete_many({'mined': False, 'created_at': {'$not': {'$gte': before}}})
+        return result.deleted_count
+
+    async def delete_transactions(self, tx_ids):
+        result = await self.db.transactions.delete_many({'_id': {'$in': list(tx_ids)}})
+        return result.deleted_count
+
+    # Block
+
+    async def insert_block(self, block):
+        try:
+            result = await self.db.blocks.insert_one(block)
+        except MongoDuplicateKeyError as e:
+            raise DuplicateKeyError(str(e)) from e
+        return str(result.inserted_id)
+
+    async def insert_blocks(self, blocks, transactions):
+        try:
+            await asyncio.gather(
+                self.db.transactions.insert_many(transactions, ordered=False),
+                self.db.blocks.insert_many(blocks, ordered=False),
+            )
+        except BulkWriteError as e:
+            if _only_duplicates(e):
+                raise DuplicateKeyError(str(e)) from e
+            raise
+
+    async def delete_blocks(self, block_ids):
+        await self.db.transactions.delete_many({'block_id': {'$in': [str(b) for b in block_ids]}})
+        await self.db.blocks.delete_many({'_id': {'$in': list(block_ids)}})
+
+    async def block_indexes(self, block_ids):
+        cursor = self.db.blocks.find({'_id': {'$in': list(block_ids)}}, {'index': 1})
+        return {str(doc['_id']): doc['index'] async for doc in cursor}
+
+    async def _hydrate(self, blocks, projection):
+        refs = [b for b in blocks if 'tx_ids' in b and 'transactions' not in b]
+        if not refs:
+            return blocks
+        ids = [tx_id for b in refs for tx_id in b['tx_ids']]
+        by_id = {}
+        async for tx in self.db.transactions.find({'_id': {'$in': ids}}, projection):
+            by_id[tx['_id']] = tx
+        for b in refs:
+            b['transactions'] = [by_id[tx_id] for tx_id in b['tx_ids'] if tx_id in by_id]
+        return blocks
+
+    async def hydrate_blocks(self, blocks, full=False):
+        return await self._hydrate(blocks, TX_IN_BLOCK_PROJECTION if full else TX_IN_BLOCK_LIST_PROJECTION)
+
+    async def _account_filter(self, sender=None, recipient=None):
+        """Filter for blocks holding a transaction from `sender` / to `recipient`.
+
+        Reference-layout blocks have no sender/recipient, so with BLOCK_LAYOUT=reference
+        their ids are looked up through the transactions indexes.
+        """
+        embedded = {}
+        if sender:
+            embedded['transactions.sender'] = sender
+        if recipient:
+            embedded['transactions.recipient'] = recipient
+        if not embedded or self.block_layout != 'reference':
+            return embedded
+        tx_query = {key.split('.', 1)[1]: value for key, value in embedded.items()}
+        block_ids = await self.db.transactions.distinct('block_id', {**tx_query, 'mined': True})
+        return {'$or': [embedded, {'_id': {'$in': [ObjectId(b) for b in block_ids if ObjectId.is_valid(b)]}}]}
+
+    async def blocks_page(self, limit, after_index=None, sender=None, recipient=None, since=None, until=None):
+        mongo_filter = await self._account_filter(sender, recipient)
+        if since is not None or until is not None:
+            mongo_filter['timestamp'] = {}
+            if since is not None:
+                mongo_filter['timestamp']['$gte'] = (since - EPOCH).total_seconds()
+            if until is not None:
+                mongo_filter['timestamp']['$lt'] = (until - EPOCH).total_seconds()
+        if after_index is not None:
+            mongo_filter['index'] = {'$gt': after_index}
+        cursor = self.db.blocks.find(mongo_filter, BLOCK_LIST_PROJECTION).sort('index', 1).limit(limit + 1)
+        docs = await cursor.to_list(length=limit + 1)
+        next_index = docs[limit - 1]['index'] if len(docs) > limit else None
+        return await self._hydrate(docs[:limit], TX_IN_BLOCK_LIST_PROJECTION), next_index
+
+    async def iter_blocks(self, after_index=None, batch_size=DEFAULT_BATCH_SIZE, tx_fields=None):
+        projection, tx_projection = None, TX_IN_BLOCK_PROJECTION
+        if tx_fields:
+            projection = {'index': 1, 'timestamp': 1, 'tx_ids': 1, **{f'transactions.{f}': 1 for f in tx_fields}}
+            tx_projection = {'_id': 1, **{f: 1 for f in tx_fields}}
+        query = {'index': {'$gt': after_index}} if after_index is not None else {}
+        cursor = self.db.blocks.find(query, projection).sort('index', 1).batch_size(batch_size)
+        batch = await cursor.to_list(length=batch_size)
+        while batch:
+            yield await self._hydrate(batch, tx_projection)
+            batch = await cursor.to_list(length=batch_size)
+
+    async def count_blocks(self):
+        return await self.db.blocks.count_documents({})
+
+    async def chain_tip(self):
+        last = await self.db.blocks.find_one({}, sort=[('index', -1)], projection={'index': 1, 'hash': 1})
+        return (last['index'], last.get('hash')) if last else None
+
+    async def block_index_unique(self):
+        indexes = await self.db.blocks.index_information()
+        return any(info.get('unique') and list(info['key']) == [('index', 1)] for info in indexes.values())
+
+    # Payment
+
+    async def insert_payment(self, payment):
+        result = await self.db.payments.insert_one(payment)
+        return str(result.inserted_id)
+
+    async def list_payments(self):
+        return await self.db.payments.find().sort('created_at', -1).to_list(length=None)
+
+    async def get_payment(self, payment_id):
+        oid = _object_id(payment_id)
+        if oid is None:
+            return None
+        return await self.db.payments.find_one({'_id': oid})
+
+    async def update_payments(self, updates):
+        ops = []
+        for payment_id, fields in updates:
+            oid = _object_id(payment_id)
+            if oid is None:
+                raise ValueError(f'invalid payment id {payment_id!r}')
+            ops.append(UpdateOne({'_id': oid}, {'$set': fields}))
+        res = await self.db.payments.bulk_write(ops, ordered=False)
+        return res.modified_count
+
+    async def update_payment_if(self, payment_id, status, fields):
+        oid = _object_id(payment_id)
+        if oid is None:
+            return False
+        res = await self.db.payments.update_one({'_id': oid, 'status': status}, {'$set': fields})
+        return res.matched_count == 1
+
+    # Balances / rollups
+
+    async def apply_rollups(self, balances, days):
+        if balances:
+            await self.db.balances.bulk_write(
+                [UpdateOne({'_id': acc}, {'$inc': inc}, upsert=True) for acc, inc in balances.items()],
+                ordered=False,
+            )
+        if days:
+            await self.db.rollups.bulk_write(
+                [UpdateOne({'_id': day}, {'$inc': inc}, upsert=True) for day, inc in days.items()],
+                ordered=False,
+            )
+
+    async def replace_rollups(self, balances, days, batch_size=DEFAULT_BATCH_SIZE):
+        # Ghi vào collection tạm rồi renameCollection: đọc song song không thấy dữ liệu dở dang
+        for name, docs in (('balances', balances), ('rollups', days)):
+            staging = self.db[f'{name}_rebuild']
+            await staging.drop()
+            items = [{'_id': key, **values} for key, values in docs.items()]
+            for i in range(0, len(items), batch_size):
+                await staging.insert_many(items[i:i + batch_size], ordered=False)
+            if items:
+                await staging.rename(name, dropTarget=True)
+            else:
+                await self.db[name].drop()
+
+    async def load_rollups(self):
+        loaded = []
+        for name in ('balances', 'rollups'):
+            docs = {}
+            async for doc in self.db[name].find({}):
+                docs[doc.pop('_id')] = doc
+            loaded.append(docs)
+        return tuple(loaded)
+
+    async def get_balance(self, account):
+        doc = await self.db.balances.find_one({'_id': account})
+        if doc:
+            doc.pop('_id')
+        return doc
+
+    async def daily_rollups(self, since=None, until=None):
+        query = {}
+        if since:
+            query.setdefault('_id', {})['$gte'] = since
+        if until:
+            query.setdefault('_id', {})['$lt'] = until
+        rollups = []
+        async for doc in self.db.rollups.find(query).sort('_id', 1):
+            doc['day'] = doc.pop('_id')
+            rollups.append(doc)
+        return rollups
+
+    # Thống kê (tính trong Mongo bằng $group; chỉ kết quả gộp rời khỏi server)
+
+    async def stats_totals(self):
+        pipeline = [{'$group': {
+            '_id': None,
+            'transactions': {'$sum': 1},
+            'volume': {'$sum': '$amount'},
+            'pending': {'$sum': {'$cond': [{'$eq': ['$mined', True]}, 0, 1]}},
+        }}, {'$project': {'_id': 0}}]
+        docs = await self.db.transactions.aggregate(pipeline).to_list(length=1)
+        totals = docs[0] if docs else {'transactions': 0, 'volume': 0, 'pending': 0}
+        totals['blocks'] = await self.db.blocks.estimated_document_count()
+        return totals
+
+    async def account_totals(self, field, account):
+        pipeline = [
+            {'$match': {field: account}},
+            {'$group': {'_id': None, 'count': {'$sum': 1}, 'total': {'$sum': '$amount'}}},
+        ]
+        docs = await self.db.transactions.aggregate(pipeline).to_list(length=1)
+        return {'count': docs[0]['count'], 'total': docs[0]['total']} if docs else {'count': 0, 'total': 0}
+
+    async def top_accounts(self, field, limit):
+        pipeline = [
+            {'$group': {'_id': f'${field}', 'total': {'$sum': '$amount'}, 'count': {'$sum': 1}}},
+            {'$sort': {'total': -1}},
+            {'$limit': limit},
+            {'$project': {'_id': 0, 'account': '$_id', 'total': 1, 'count': 1}},
+        ]
+        return await self.db.transactions.aggregate(pipeline).to_list(length=limit)
+
+    async def time_buckets(self, fmt, since=None, until=None):
+        query = build_transaction_filter(since=since, until=until)
+        query.setdefault('created_at', {})['$type'] = 'date'
+        pipeline = [
+            {'$match': query},
+            {'$group': {
+                '_id': {'$dateToString': {'format': fmt, 'date': '$created_at'}},
+                'count': {'$sum': 1},
+                'volume': {'$sum': '$amount'},
+            }},
+            {'$sort': {'_id': 1}},
+            {'$project': {'_id': 0, 'period': '$_id', 'count': 1, 'volume': 1}},
+        ]
+        return await self.db.transactions.aggregate(pipeline).to_list(length=None)
+
+    # Checkpoint và lock
+
+    async def get_state(self, collection, key):
+        return await self.db[collection].find_one({'_id': key})
+
+    async def set_state(self, collection, key, fields):
+        await self.db[collection].update_one({'_id': key}, {'$set': fields}, upsert=True)
+
+    async def delete_state(self, collection, key):
+        await self.db[collection].delete_one({'_id': key})
+
+    async def acquire_lock(self, name, owner, ttl):
+        now = datetime.utcnow()
+        try:
+            # Upsert chỉ khớp khi lock là của mình hoặc đã hết hạn; nếu không, insert trùng _id -> DuplicateKeyError
+            await self.db.locks.update_one(
+                {'_id': name, '$or': [{'owner': owner}, {'expires_at': {'$lte': now}}]},
+                {'$set': {'owner': owner, 'expires_at': now + timedelta(seconds=ttl)}},
+                upsert=True,
+            )
+        except MongoDuplicateKeyError:
+            return False
+        return True
+
+    async def release_lock(self, name, owner):
+        await self.db.locks.delete_one({'_id': name, 'owner': owner})
+
+    # Export
+
+    async def export_batches(self, collection, filters=None, batch_size=DEFAULT_BATCH_SIZE):
+        filters = filters or {}
+        query = {}
+        if filters.get('after_index') is not None:
+            query['index'] = {'$gt': filters['after_index']}
+        if filters.get('mined') is not None:
+            query['mined'] = filters['mined']
+        cursor = self.db[collection].find(query).sort(EXPORT_SORTS[collection]).batch_size(batch_size)
+        batch = await cursor.to_list(length=batch_size)
+        while batch:
+            yield batch
+            batch = await cursor.to_list(length=batch_size)
@@ -0,0 +1,607 @@
+"""Engine SQLite nhúng (STORAGE_ENGINE=sqlite) cho triển khai một node.
+
+Một file SQLite ở chế độ WAL: ghi chỉ nối vào file -wal (không round-trip
+mạng), đọc không chặn ghi. Mỗi document được lưu nguyên dạng BSON trong cột
+`doc` nên đọc ra giống hệt Motor (ObjectId, datetime millisecond, thứ tự
+trường); các trường dùng để lọc/sắp xếp được chép ra cột riêng có index.
+Mọi lệnh chạy trên một thread riêng với một connection, event loop không bị
+chặn và các thao tác được tuần tự hoá như một writer duy nhất.
+
+Giao dịch luôn nằm trong bảng transactions (kể cả khi block nhúng bản sao),
+nên lọc block theo sender/recipient đi qua cột block_id cho cả hai layout.
+"""
+
+import asyncio
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import bson
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from .base import DEFAULT_BATCH_SIZE, DuplicateKeyError, Storage, parse_tx_position, tx_position
+
+EPOCH = datetime(1970, 1, 1)
+MILLISECOND = timedelta(milliseconds=1)
+# Số tham số tối đa mỗi lệnh IN (...) khi đọc giao dịch của block dạng reference
+IN_CHUNK = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    created_at INTEGER,
+    sender,
+    recipient,
+    mined INTEGER,
+    amount,
+    block_id TEXT,
+    doc BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_created_at_id ON transactions (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS transactions_sender ON transactions (sender, created_at DESC);
+CREATE INDEX IF NOT EXISTS transactions_recipient ON transactions (recipient, created_at DESC);
+CREATE INDEX IF NOT EXISTS transactions_block_id ON transactions (block_id);
+CREATE INDEX IF NOT EXISTS transactions_mined ON transactions (mined);
+CREATE TABLE IF NOT EXISTS blocks (
+    id TEXT PRIMARY KEY,
+    idx INTEGER NOT NULL UNIQUE,
+    timestamp REAL,
+    hash TEXT,
+    doc BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blocks_timestamp ON blocks (timestamp);
+CREATE TABLE IF NOT EXISTS payments (
+    id TEXT PRIMARY KEY,
+    created_at INTEGER,
+    doc BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS payments_created_at ON payments (created_at DESC, id DESC);
+CREATE TABLE IF NOT EXISTS balances (
+    account PRIMARY KEY,
+    received NOT NULL DEFAULT 0,
+    sent NOT NULL DEFAULT 0,
+    count_in NOT NULL DEFAULT 0,
+    count_out NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    day TEXT PRIMARY KEY,
+    count NOT NULL DEFAULT 0,
+    volume NOT NULL DEFAULT 0,
+    blocks NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS state (collection TEXT, key TEXT, doc BLOB NOT NULL, PRIMARY KEY (collection, key));
+CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL);
+"""
+
+BALANCE_FIELDS = ('received', 'sent', 'count_in', 'count_out')
+ROLLUP_FIELDS = ('count', 'volume', 'blocks')
+ACCOUNT_FIELDS = ('sender', 'recipient')
+TX_COLUMNS = 'id, created_at, sender, recipient, mined, amount, block_id, doc'
+
+
+def _ms(value):
+    """created_at as integer milliseconds (BSON precision), None if it is not a datetime"""
+    if not isinstance(value, datetime):
+        return None
+    return (value - EPOCH) // MILLISECOND
+
+
+def _column(value):
+    return value if isinstance(value, (str, int, float)) and not isinstance(value, bool) else None
+
+
+def _number(value):
+    # Giống $sum của Mongo: chỉ cộng giá trị kiểu số
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _encode(doc):
+    if '_id' not in doc:
+        doc['_id'] = ObjectId()
+    return bson.encode(doc)
+
+
+def _object_id(value):
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+
+def _tx_row(tx):
+    blob = _encode(tx)
+    mined = tx.get('mined')
+    return (str(tx['_id']), _ms(tx.get('created_at')), _column(tx.get('sender')), _column(tx.get('recipient')),
+            int(mined) if isinstance(mined, bool) else None, _number(tx.get('amount')), tx.get('block_id'), blob)
+
+
+def _block_row(block):
+    blob = _encode(block)
+    return str(block['_id']), block['index'], block.get('timestamp'), block.get('hash'), blob
+
+
+def _strip(doc, *fields):
+    for field in fields:
+        doc.pop(field, None)
+    return doc
+
+
+class SQLiteStorage(Storage):
+    name = 'sqlite'
+
+    def __init__(self, path, synchronous='NORMAL', busy_timeout_ms=5000):
+        self.path = path
+        self.synchronous = synchronous
+        self.busy_timeout_ms = busy_timeout_ms
+        self._conn = None
+        self._executor = None
+
+    async def open(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite')
+        await self._call(self._open)
+        return self
+
+    def _open(self):
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=self.busy_timeout_ms / 1000)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        conn.executescript(SCHEMA)
+        self._conn = conn
+
+    async def close(self):
+        if self._executor is None:
+            return
+        await self._call(self._close)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _docs(self, sql, params=()):
+        return [bson.decode(row[0]) for row in self._conn.execute(sql, params)]
+
+    # Giao dịch
+
+    async def insert_transactions(self, transactions):
+        return await self._call(self._insert_transactions, transactions)
+
+    def _insert_transactions(self, transactions):
+        rows = [_tx_row(tx) for tx in transactions]
+        try:
+            with self._conn:
+                self._conn.executemany(f'INSERT INTO transactions ({TX_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(str(e)) from e
+        return [row[0] for row in rows]
+
+    async def get_transaction(self, tx_id):
+        oid = _object_id(tx_id)
+        if oid is None:
+            return None
+        docs = await self._call(self._docs, 'SELECT doc FROM transactions WHERE id = ?', (str(oid),))
+        return docs[0] if docs else None
+
+    async def list_transactions(self):
+        docs = await self._call(self._docs, 'SELECT doc FROM transactions ORDER BY created_at DESC, id DESC')
+        return [_strip(doc, 'signed_message') for doc in docs]
+
+    async def transactions_page(self, limit, after=None, filters=None):
+        where, params = [], []
+        filters = filters or {}
+        for field in ACCOUNT_FIELDS:
+            if filters.get(field):
+                where.append(f'{field} = ?')
+                params.append(filters[field])
+        if filters.get('mined') is not None:
+            where.append('mined = ?')
+            params.append(int(filters['mined']))
+        if filters.get('since') is not None:
+            where.append('created_at >= ?')
+            params.append(_ms(filters['since']))
+        if filters.get('until') is not None:
+            where.append('created_at < ?')
+            params.append(_ms(filters['until']))
+        if after is not None:
+            created, oid = parse_tx_position(after)
+            if created is None:
+                # Giao dịch không có created_at xếp cuối (NULL nhỏ nhất trong SQLite)
+                where.append('created_at IS NULL AND id < ?')
+                params.append(str(oid))
+            else:
+                where.append('(created_at < ? OR (created_at = ? AND id < ?) OR created_at IS NULL)')
+                params.extend([_ms(created), _ms(created), str(oid)])
+        sql = 'SELECT doc FROM transactions'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+        docs = await self._call(self._docs, sql, (*params, limit + 1))
+        next_position = tx_position(docs[limit - 1]) if len(docs) > limit else None
+        return [_strip(doc, 'signed_message') for doc in docs[:limit]], next_position
+
+    async def delete_pending_transactions(self, before):
+        return await self._call(self._write, 'DELETE FROM transactions WHERE mined = 0 '
+                                'AND (created_at IS NULL OR created_at < ?)', (_ms(before),))
+
+    async def delete_transactions(self, tx_ids):
+        return await self._call(self._delete_transactions, [(str(tx_id),) for tx_id in tx_ids])
+
+    def _delete_transactions(self, ids):
+        with self._conn:
+            return self._conn.executemany('DELETE FROM transactions WHERE id = ?', ids).rowcount
+
+    def _write(self, sql, params=()):
+        with self._conn:
+            return self._conn.execute(sql, params).rowcount
+
+    # Block
+
+    async def insert_block(self, block):
+        return await self._call(self._insert_block, block)
+
+    def _insert_block(self, block):
+        row = _block_row(block)
+        try:
+            with self._conn:
+                self._conn.execute('INSERT INTO blocks (id, idx, timestamp, hash, doc) VALUES (?, ?, ?, ?, ?)', row)
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(str(e)) from e
+        return row[0]
+
+    async def insert_blocks(self, blocks, transactions):
+        await self._call(self._insert_blocks, blocks, transactions)
+
+    def _insert_blocks(self, blocks, transactions):
+        tx_rows = [_tx_row(tx) for tx in transactions]
+        block_rows = [_block_row(block) for block in blocks]
+        try:
+            with self._conn:
+                self._conn.executemany(f'INSERT INTO transactions ({TX_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                       tx_rows)
+                self._conn.executemany('INSERT INTO blocks (id, idx, timestamp, hash, doc) VALUES (?, ?, ?, ?, ?)',
+                                       block_rows)
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(str(e)) from e
+
+    async def delete_blocks(self, block_ids):
+        await self._call(self._delete_blocks, [(str(b),) for b in block_ids])
+
+    def _delete_blocks(self, ids):
+        with self._conn:
+            self._conn.executemany('DELETE FROM transactions WHERE block_id = ?', ids)
+            self._conn.executemany('DELETE FROM blocks WHERE id = ?', ids)
+
+    async def block_indexes(self, block_ids):
+        return await self._call(self._block_indexes, [str(b) for b in block_ids])
+
+    def _block_indexes(self, ids):
+        found = {}
+        for i in range(0, len(ids), IN_CHUNK):
+            chunk = ids[i:i + IN_CHUNK]
+            sql = f'SELECT id, idx FROM blocks WHERE id IN ({", ".join("?" * len(chunk))})'
+            found.update(self._conn.execute(sql, chunk).fetchall())
+        return found
+
+    def _hydrate(self, blocks, full):
+        """Fill reference-layout blocks from the transactions table; list view drops signed_message"""
+        omit = ('block_id',) if full else ('block_id', 'signed_message')
+        refs = [b for b in blocks if 'tx_ids' in b and 'transactions' not in b]
+        ids = [str(tx_id) for b in refs for tx_id in b['tx_ids']]
+        by_id = {}
+        for i in range(0, len(ids), IN_CHUNK):
+            chunk = ids[i:i + IN_CHUNK]
+            sql = f'SELECT id, doc FROM transactions WHERE id IN ({", ".join("?" * len(chunk))})'
+            for tx_id, blob in self._conn.execute(sql, chunk):
+                by_id[tx_id] = _strip(bson.decode(blob), *omit)
+        for b in refs:
+            b['transactions'] = [by_id[str(tx_id)] for tx_id in b['tx_ids'] if str(tx_id) in by_id]
+        if not full:
+            for b in blocks:
+                for tx in b.get('transactions', []):
+                    tx.pop('signed_message', None)
+        return blocks
+
+    async def hydrate_blocks(self, blocks, full=False):
+        return await self._call(self._hydrate, blocks, full)
+
+    async def blocks_page(self, limit, after_index=None, sender=None, recipient=None, since=None, until=None):
+        return await self._call(self._blocks_page, limit, after_index, sender, recipient, since, until)
+
+    def _blocks_page(self, limit, after_index, sender, recipient, since, until):
+        where, params = [], []
+        for field, account in zip(ACCOUNT_FIELDS, (sender, recipient)):
+            if account:
+                where.append(f'id IN (SELECT block_id FROM transactions WHERE {field} = ?)')
+                params.append(account)
+        if since is not None:
+            where.append('timestamp >= ?')
+            params.append((since - EPOCH).total_seconds())
+        if until is not None:
+            where.append('timestamp < ?')
+            params.append((until - EPOCH).total_seconds())
+        if after_index is not None:
+            where.append('idx > ?')
+            params.append(after_index)
+        sql = 'SELECT doc FROM blocks'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        docs = self._docs(sql + ' ORDER BY idx LIMIT ?', (*params, limit + 1))
+        next_index = docs[limit - 1]['index'] if len(docs) > limit else None
+        return self._hydrate(docs[:limit], full=False), next_index
+
+    async def iter_blocks(self, after_index=None, batch_size=DEFAULT_BATCH_SIZE, tx_fields=None):
+        while True:
+            batch = await self._call(self._blocks_after, after_index, batch_size, True)
+            if not batch:
+                return
+            yield batch
+            after_index = batch[-1]['index']
+
+    def _blocks_after(self, after_index, batch_size, hydrate):
+        if after_index is None:
+            docs = self._docs('SELECT doc FROM blocks ORDER BY idx LIMIT ?', (batch_size,))
+        else:
+            docs = self._docs('SELECT doc FROM blocks WHERE idx > ? ORDER BY idx LIMIT ?', (after_index, batch_size))
+        return self._hydrate(docs, full=True) if hydrate else docs
+
+    async def count_blocks(self):
+        return await self._call(self._scalar, 'SELECT COUNT(*) FROM blocks')
+
+    def _scalar(self, sql, params=()):
+        return self._conn.execute(sql, params).fetchone()[0]
+
+    async def chain_tip(self):
+        row = await self._call(self._row, 'SELECT idx, hash FROM blocks ORDER BY idx DESC LIMIT 1')
+        return tuple(row) if row else None
+
+    def _row(self, sql, params=()):
+        return self._conn.execute(sql, params).fetchone()
+
+    # Payment
+
+    async def insert_payment(self, payment):
+        return await self._call(self._insert_payment, payment)
+
+    def _insert_payment(self, payment):
+        blob = _encode(payment)
+        try:
+            with self._conn:
+                self._conn.execute('INSERT INTO payments (id, created_at, doc) VALUES (?, ?, ?)',
+                                   (str(payment['_id']), _ms(payment.get('created_at')), blob))
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(str(e)) from e
+        return str(payment['_id'])
+
+    async def list_payments(self):
+        return await self._call(self._docs, 'SELECT doc FROM payments ORDER BY created_at DESC, id DESC')
+
+    async def get_payment(self, payment_id):
+        oid = _object_id(payment_id)
+        if oid is None:
+            return None
+        docs = await self._call(self._docs, 'SELECT doc FROM payments WHERE id = ?', (str(oid),))
+        return docs[0] if docs else None
+
+    async def update_payments(self, updates):
+        ids = []
+        for payment_id, _ in updates:
+            oid = _object_id(payment_id)
+            if oid is None:
+                raise ValueError(f'invalid payment id {payment_id!r}')
+            ids.append(str(oid))
+        return await self._call(self._update_payments, [(pid, fields) for pid, (_, fields) in zip(ids, updates)])
+
+    def _update_payments(self, updates):
+        modified = 0
+        with self._conn:
+            for payment_id, fields in updates:
+                row = self._row('SELECT doc FROM payments WHERE id = ?', (payment_id,))
+                if row is None:
+                    continue
+                # Như $set: trường có sẵn giữ vị trí, trường mới thêm vào cuối; không đổi gì thì không ghi
+                doc = {**bson.decode(row[0]), **fields}
+                blob = bson.encode(doc)
+                if blob != row[0]:
+                    self._conn.execute('UPDATE payments SET created_at = ?, doc = ? WHERE id = ?',
+                                       (_ms(doc.get('created_at')), blob, payment_id))
+                    modified += 1
+        return modified
+
+    async def update_payment_if(self, payment_id, status, fields):
+        oid = _object_id(payment_id)
+        if oid is None:
+            return False
+        return await self._call(self._update_payment_if, str(oid), status, fields)
+
+    def _update_payment_if(self, payment_id, status, fields):
+        # Đọc và ghi trong cùng một transaction trên luồng ghi duy nhất nên không xen được
+        with self._conn:
+            row = self._row('SELECT doc FROM payments WHERE id = ?', (payment_id,))
+            if row is None:
+                return False
+            doc = bson.decode(row[0])
+            if doc.get('status') != status:
+                return False
+            doc = {**doc, **fields}
+            self._conn.execute('UPDATE payments SET created_at = ?, doc = ? WHERE id = ?',
+                               (_ms(doc.get('created_at')), bson.encode(doc), payment_id))
+        return True
+
+    # Balances / rollups
+
+    async def apply_rollups(self, balances, days):
+        await self._call(self._apply_rollups, balances, days)
+
+    def _apply_rollups(self, balances, days):
+        with self._conn:
+            self._conn.executemany(
+                'INSERT INTO balances (account, received, sent, count_in, count_out) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (account) DO UPDATE SET received = received + excluded.received, '
+                'sent = sent + excluded.sent, count_in = count_in + excluded.count_in, '
+                'count_out = count_out + excluded.count_out',
+                [(acc, *(inc.get(f, 0) for f in BALANCE_FIELDS)) for acc, inc in balances.items()],
+            )
+            self._conn.executemany(
+                'INSERT INTO rollups (day, count, volume, blocks) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (day) DO UPDATE SET count = count + excluded.count, '
+                'volume = volume + excluded.volume, blocks = blocks + excluded.blocks',
+                [(day, *(inc.get(f, 0) for f in ROLLUP_FIELDS)) for day, inc in days.items()],
+            )
+
+    async def replace_rollups(self, balances, days, batch_size=DEFAULT_BATCH_SIZE):
+        await self._call(self._replace_rollups, balances, days)
+
+    def _replace_rollups(self, balances, days):
+        # Một transaction: đọc song song thấy bản cũ cho tới khi commit
+        with self._conn:
+            self._conn.execute('DELETE FROM balances')
+            self._conn.execute('DELETE FROM rollups')
+            self._conn.executemany('INSERT INTO balances (account, received, sent, count_in, count_out) '
+                                   'VALUES (?, ?, ?, ?, ?)',
+                                   [(acc, *(v.get(f, 0) for f in BALANCE_FIELDS)) for acc, v in balances.items()])
+            self._conn.executemany('INSERT INTO rollups (day, count, volume, blocks) VALUES (?, ?, ?, ?)',
+                                   [(day, *(v.get(f, 0) for f in ROLLUP_FIELDS)) for day, v in days.items()])
+
+    async def load_rollups(self):
+        return await self._call(self._load_rollups)
+
+    def _load_rollups(self):
+        balances = {row[0]: dict(zip(BALANCE_FIELDS, row[1:])) for row in self._conn.execute(
+            'SELECT account, received, sent, count_in, count_out FROM balances')}
+        days = {row[0]: dict(zip(ROLLUP_FIELDS, row[1:])) for row in self._conn.execute(
+            'SELECT day, count, volume, blocks FROM rollups')}
+        return balances, days
+
+    async def get_balance(self, account):
+        row = await self._call(self._row, 'SELECT received, sent, count_in, count_out FROM balances '
+                               'WHERE account = ?', (account,))
+        return dict(zip(BALANCE_FIELDS, row)) if row else None
+
+    async def daily_rollups(self, since=None, until=None):
+        where, params = [], []
+        if since:
+            where.append('day >= ?')
+            params.append(since)
+        if until:
+            where.append('day < ?')
+            params.append(until)
+        sql = 'SELECT count, volume, blocks, day FROM rollups'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        rows = await self._call(self._rows, sql + ' ORDER BY day', params)
+        return [dict(zip((*ROLLUP_FIELDS, 'day'), row)) for row in rows]
+
+    def _rows(self, sql, params=()):
+        return self._conn.execute(sql, params).fetchall()
+
+    # Thống kê
+
+    async def stats_totals(self):
+        return await self._call(self._stats_totals)
+
+    def _stats_totals(self):
+        count, volume, pending = self._row(
+            'SELECT COUNT(*), COALESCE(SUM(amount), 0), COALESCE(SUM(CASE WHEN mined = 1 THEN 0 ELSE 1 END), 0) '
+            'FROM transactions')
+        blocks = self._scalar('SELECT COUNT(*) FROM blocks')
+        return {'transactions': count, 'volume': volume, 'pending': pending, 'blocks': blocks}
+
+    async def account_totals(self, field, account):
+        if field not in ACCOUNT_FIELDS:
+            raise ValueError(f'unknown account field {field!r}')
+        count, total = await self._call(self._row, f'SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM transactions '
+                                        f'WHERE {field} = ?', (account,))
+        return {'count': count, 'total': total}
+
+    async def top_accounts(self, field, limit):
+        if field not in ACCOUNT_FIELDS:
+            raise ValueError(f'unknown account field {field!r}')
+        rows = await self._call(self._rows, f'SELECT COALESCE(SUM(amount), 0) AS total, COUNT(*), {field} '
+                                f'FROM transactions GROUP BY {field} ORDER BY total DESC LIMIT ?', (limit,))
+        return [{'total': total, 'count': count, 'account': account} for total, count, account in rows]
+
+    async def time_buckets(self, fmt, since=None, until=None):
+        where, params = ['created_at IS NOT NULL'], [fmt]
+        if since is not None:
+            where.append('created_at >= ?')
+            params.append(_ms(since))
+        if until is not None:
+            where.append('created_at < ?')
+            params.append(_ms(until))
+        rows = await self._call(
+            self._rows,
+            "SELECT COUNT(*), COALESCE(SUM(amount), 0), strftime(?, created_at / 1000, 'unixepoch') AS period "
+            f"FROM transactions WHERE {' AND '.join(where)} GROUP BY period ORDER BY period",
+            params,
+        )
+        return [{'count': count, 'volume': volume, 'period': period} for count, volume, period in rows]
+
+    # Checkpoint và lock
+
+    async def get_state(self, collection, key):
+        docs = await self._call(self._docs, 'SELECT doc FROM state WHERE collection = ? AND key = ?', (collection, key))
+        return docs[0] if docs else None
+
+    async def set_state(self, collection, key, fields):
+        await self._call(self._set_state, collection, key, fields)
+
+    def _set_state(self, collection, key, fields):
+        with self._conn:
+            row = self._row('SELECT doc FROM state WHERE collection = ? AND key = ?', (collection, key))
+            doc = {**(bson.decode(row[0]) if row else {'_id': key}), **fields}
+            self._conn.execute('INSERT OR REPLACE INTO state (collection, key, doc) VALUES (?, ?, ?)',
+                               (collection, key, bson.encode(doc)))
+
+    async def delete_state(self, collection, key):
+        await self._call(self._write, 'DELETE FROM state WHERE collection = ? AND key = ?', (collection, key))
+
+    async def acquire_lock(self, name, owner, ttl):
+        now = time.time()
+        # Chỉ ghi đè khi lock là của mình hoặc đã hết hạn; rowcount = 0 nghĩa là owner khác đang giữ
+        changed = await self._call(
+            self._write,
+            'INSERT INTO locks (name, owner, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at '
+            'WHERE locks.owner = excluded.owner OR locks.expires_at <= ?',
+            (name, owner, now + ttl, now),
+        )
+        return changed > 0
+
+    async def release_lock(self, name, owner):
+        await self._call(self._write, 'DELETE FROM locks WHERE name = ? AND owner = ?', (name, owner))
+
+    # Export
+
+    async def export_batches(self, collection, filters=None, batch_size=DEFAULT_BATCH_SIZE):
+        filters = filters or {}
+        if collection == 'blocks':
+            after = filters.get('after_index')
+            while True:
+                batch = await self._call(self._blocks_after, after, batch_size, False)
+                if not batch:
+                    return
+                yield batch
+                after = batch[-1]['index']
+        mined = filters.get('mined')
+        after = ''
+        while True:
+            if mined is None:
+                sql, params = 'SELECT id, doc FROM transactions WHERE id > ? ORDER BY id LIMIT ?', (after, batch_size)
+            else:
+                sql = 'SELECT id, doc FROM transactions WHERE mined = ? AND id > ? ORDER BY id LIMIT ?'
+                params = (int(mined), after, batch_size)
+            rows = await self._call(self._rows, sql, params)
+            if not rows:
+                return
+            yield [bson.decode(blob) for _, blob in rows]
+            after = rows[-1][0]
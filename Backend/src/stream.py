@@ -0,0 +1,161 @@
+"""GET /api/stream: đẩy block mới và thay đổi trạng thái payment qua Server-Sent Events.
+
+Client (EventSource) nhận:
+    event: block    id: <index>   data: block (không có signed_message)
+    event: payment                data: {payment_id, status, ...}
+    event: resync                 data: {reason} -- client nên tải lại toàn bộ
+
+Kết nối lại với Last-Event-ID (EventSource tự gửi) hoặc ?last_index=N thì
+các block bị lỡ được đọc lại từ storage trước khi nhận sự kiện trực tiếp.
+Subscriber rảnh chỉ là một coroutine chờ hàng đợi, cộng một dòng comment
+heartbeat mỗi STREAM_HEARTBEAT_S để proxy không cắt kết nối.
+
+ChangeStreamFeed dùng change stream của MongoDB (cần replica set, kể cả
+single-node) nên mọi worker thấy block do worker khác ghi. Không có
+replica set thì dùng sự kiện trong process (src/events.py): khi chạy nhiều
+worker, subscriber chỉ nhận sự kiện của worker mình. STORAGE_ENGINE=sqlite
+luôn dùng sự kiện trong process (chỉ một worker).
+"""
+
+import asyncio
+import os
+
+from .chain import get_chain_tip
+from .database import STORAGE_ENGINE, get_async_db, get_blocks_page, hydrate_blocks
+from .events import block_event, hub, sse_frame
+from .logs import logger
+
+STREAM_HEARTBEAT_S = float(os.getenv('STREAM_HEARTBEAT_S', '15'))
+# Lỡ nhiều block hơn số này thì gửi resync thay vì đọc lại từng block
+STREAM_CATCHUP_LIMIT = int(os.getenv('STREAM_CATCHUP_LIMIT', '1000'))
+STREAM_SOURCE = os.getenv('STREAM_SOURCE', 'auto')  # auto | local
+# Thời gian EventSource chờ trước khi tự kết nối lại (ms)
+STREAM_RETRY_MS = int(os.getenv('STREAM_RETRY_MS', '3000'))
+
+CHANGE_PIPELINE = [
+    {'$match': {'$or': [
+        {'ns.coll': 'blocks', 'operationType': 'insert'},
+        {'ns.coll': 'payments', 'operationType': 'update',
+         'updateDescription.updatedFields.status': {'$exists': True}},
+    ]}},
+    {'$project': {'fullDocument.transactions.signed_message': 0}},
+]
+
+
+class ChangeStreamFeed:
+    """Feed the hub from a MongoDB change stream when the deployment supports one"""
+
+    def __init__(self, events=hub):
+        self.hub = events
+        self._task = None
+        self._stream = None
+
+    async def start(self):
+        """Open the change stream (falls back to in-process events); returns the source in use"""
+        if STREAM_SOURCE == 'local' or STORAGE_ENGINE != 'mongo':
+            return 'local'
+        db = get_async_db()
+        try:
+            stream = db.watch(CHANGE_PIPELINE)
+            # Lệnh aggregate chỉ chạy ở lần đọc đầu tiên: server không có replica set báo lỗi tại đây
+            first = await stream.try_next()
+        except Exception as e:
+            logger.info('change stream unavailable, using in-process events', extra={'fields': {'error': str(e)}})
+            return 'local'
+        self.hub.source = 'changestream'
+        if first is not None:
+            await self._dispatch(first)
+        self._stream = stream
+        self._task = asyncio.create_task(self._run())
+        return 'changestream'
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._stream is not None:
+            await self._stream.close()
+            self._stream = None
+        self.hub.source = 'local'
+
+    async def _dispatch(self, change):
+        if change['ns']['coll'] == 'blocks':
+            block = change['fullDocument']
+            # Block dạng reference chỉ có tx_ids: đọc giao dịch trước khi phát
+            await hydrate_blocks([block])
+            self.hub.publish('block', block_event(block), block.get('index'))
+        else:
+            fields = change['updateDescription']['updatedFields']
+            self.hub.publish('payment', {'payment_id': str(change['documentKey']['_id']), **fields})
+
+    async def _run(self):
+        while True:
+            try:
+                async for change in self._stream:
+                    await self._dispatch(change)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('change stream failed; reopening')
+                await asyncio.sleep(1)
+            # Mở lại từ resume token để không mất sự kiện
+            token = self._stream.resume_token
+            await self._stream.close()
+            self._stream = get_async_db().watch(CHANGE_PIPELINE, resume_after=token)
+
+
+change_feed = ChangeStreamFeed()
+
+
+async def _catch_up(after_index):
+    """Frames for blocks after `after_index` from storage; returns (frames, last_index)"""
+    blocks, more = await get_blocks_page(STREAM_CATCHUP_LIMIT, after_index)
+    if more is not None:
+        tip_index, _ = await get_chain_tip()
+        return [sse_frame('resync', {'reason': 'too_far_behind', 'last_index': tip_index}, tip_index)], tip_index
+    frames = [sse_frame('block', block_event(b), b['index']) for b in blocks]
+    return frames, blocks[-1]['index'] if blocks else after_index
+
+
+async def stream_events(last_index=None, heartbeat=STREAM_HEARTBEAT_S):
+    """Async generator of SSE frames for one client"""
+    sub = hub.subscribe()
+    if sub is None:
+        return
+    try:
+        yield f'retry: {STREAM_RETRY_MS}\n\n'.encode()
+        # Đăng ký trước rồi mới đọc DB: block ghi trong lúc đọc nằm sẵn trong hàng đợi, lọc trùng theo index
+        if last_index is None:
+            last_index, _ = await get_chain_tip()
+        else:
+            frames, last_index = await _catch_up(last_index)
+            for frame in frames:
+                yield frame
+        while True:
+            if sub.lagged:
+                # Hàng đợi đầy: bỏ phần còn lại, đọc lại block từ MongoDB và báo client tải lại phần khác
+                while not sub.queue.empty():
+                    sub.queue.get_nowait()
+                sub.lagged = False
+                yield sse_frame('resync', {'reason': 'lagged'})
+                frames, last_index = await _catch_up(last_index)
+                for frame in frames:
+                    yield frame
+                continue
+            try:
+                kind, event_id, frame = await asyncio.wait_for(sub.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield b': ping\n\n'
+                continue
+            if kind == 'block' and event_id is not None:
+                if last_index is not None and event_id <= last_index:
+                    continue
+                last_index = event_id
+            yield frame
+    finally:
+        hub.unsubscribe(sub)
@@ -0,0 +1,36 @@
+"""Cấu hình chung cho pytest: chạy từ thư mục Backend (python -m pytest tests)."""
+
+import os
+import sys
+from contextlib import asynccontextmanager
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """Factory of httpx clients for the app (lifespan included) on a fresh sqlite file.
+
+    Dùng trong test đồng bộ: `async with api() as client:` bên trong asyncio.run().
+    """
+    httpx = pytest.importorskip('httpx')
+    from src import database, main
+
+    path = str(tmp_path / 'api.db')
+    monkeypatch.setattr(main, 'STORAGE_ENGINE', 'sqlite')
+    monkeypatch.setattr(main, 'init_storage', lambda: database.init_storage('sqlite', sqlite_path=path))
+
+    @asynccontextmanager
+    async def client():
+        # Cache response là global của process: không để test trước trả kết quả cho test sau
+        main.response_cache.clear()
+        async with main.app.router.lifespan_context(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url='http://test') as http:
+                yield http
+
+    return client
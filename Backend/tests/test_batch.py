@@ -0,0 +1,71 @@
+"""parse_batch / validate_batch (src/batch.py) và giới hạn kích thước của POST /api/transactions/batch."""
+
+import asyncio
+import json
+
+import pytest
+
+from src.batch import InvalidItem, parse_batch, validate_batch
+
+GOOD = {'sender': 'alice', 'recipient': 'bob', 'amount': 5}
+
+
+def test_parse_json_array():
+    assert parse_batch(json.dumps([GOOD, {'a': 1}]).encode()) == [GOOD, {'a': 1}]
+    with pytest.raises(ValueError, match='invalid JSON'):
+        parse_batch(b'[{"sender": ')
+
+
+def test_parse_ndjson_keeps_bad_lines_in_place():
+    body = b'\n'.join([json.dumps(GOOD).encode(), b'{oops', b'', b'  ' + json.dumps([1]).encode()])
+    items = parse_batch(body, 'application/x-ndjson')
+    assert items[0] == GOOD and items[2] == [1] and len(items) == 3
+    assert isinstance(items[1], InvalidItem) and items[1].error == 'invalid JSON'
+
+
+def test_ndjson_content_type_wins_over_leading_bracket():
+    assert parse_batch(b'[1]\n[2]', 'application/x-ndjson') == [[1], [2]]
+
+
+def test_parse_ndjson_stops_after_max_items():
+    body = b'\n'.join([json.dumps(GOOD).encode()] * 50) + b'\n{oops'
+    assert len(parse_batch(body, '', max_items=10)) == 11
+
+
+def test_validate_batch_reports_per_position():
+    items = [
+        GOOD,
+        InvalidItem('invalid JSON'),
+        [1, 2],
+        {'sender': 'alice', 'amount': 1},
+        {'sender': ['alice'], 'recipient': 'bob', 'amount': 1},
+        {**GOOD, 'tx_hash': {'h': 1}},
+        {**GOOD, 'fee': -1},
+        {**GOOD, 'fee': 2, 'tx_hash': '0xabc', 'tx_meta': {'chainId': 1}},
+    ]
+    results, accepted = asyncio.run(validate_batch(items))
+    assert [r and r['error'] for r in results] == [
+        None, 'invalid JSON', 'expected JSON object', 'missing fields', 'sender and recipient must be strings',
+        'tx_hash must be a string', 'invalid fee', None,
+    ]
+    assert [position for position, _ in accepted] == [0, 7]
+    assert accepted[1][1] == {'sender': 'alice', 'recipient': 'bob', 'amount': 5, 'mined': False, 'fee': 2,
+                              'hash': '0xabc', 'onchain': {'chainId': 1}}
+
+
+def test_api_rejects_oversized_batches(api, monkeypatch):
+    from src import main
+
+    async def scenario():
+        async with api() as client:
+            monkeypatch.setattr(main, 'BATCH_MAX_ITEMS', 2)
+            too_many = await client.post('/api/transactions/batch', json=[GOOD] * 3)
+            monkeypatch.setattr(main, 'BATCH_MAX_BYTES', 64)
+            too_big = await client.post('/api/transactions/batch', content=json.dumps([GOOD] * 2).encode())
+            bad = await client.post('/api/transactions/batch', content=b'{"not": "an array"')
+            return too_many, too_big, bad
+
+    too_many, too_big, bad = asyncio.run(scenario())
+    assert too_many.status_code == 413 and 'too many' in too_many.json()['error']
+    assert too_big.status_code == 413 and 'too large' in too_big.json()['error']
+    assert bad.status_code == 400
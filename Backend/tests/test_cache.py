@@ -0,0 +1,71 @@
+"""ResponseCache (src/database.py) và ETag / 304 của các GET được cache."""
+
+import asyncio
+
+from src.database import ResponseCache
+
+
+def test_put_get_and_etag():
+    cache = ResponseCache(ttl=60, max_entries=10, max_bytes=1000)
+    entry = cache.put('/a', b'{"x":1}', ('chain',))
+    assert cache.get('/a') is entry
+    assert entry.etag == ResponseCache.make_etag(b'{"x":1}') != ResponseCache.make_etag(b'{"x":2}')
+    assert cache.get('/missing') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_expired_entry_is_a_miss():
+    cache = ResponseCache(ttl=60)
+    cache.put('/a', b'1', ('chain',))
+    cache._entries['/a'].expires = 0
+    assert cache.get('/a') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_invalidate_drops_only_tagged_entries():
+    cache = ResponseCache(ttl=60)
+    cache.put('/chain', b'1', ('chain',))
+    cache.put('/payment', b'2', ('payments', 'payment:1'))
+    cache.put('/other-payment', b'3', ('payments', 'payment:2'))
+    cache.invalidate('payment:1')
+    assert cache.get('/payment') is None
+    assert cache.get('/chain') is not None and cache.get('/other-payment') is not None
+    cache.invalidate_family('payment')
+    assert cache.get('/other-payment') is None and cache.get('/chain') is not None
+
+
+def test_write_during_read_is_not_cached():
+    cache = ResponseCache(ttl=60)
+    snapshot = cache.snapshot(('chain',))
+    cache.invalidate('chain')
+    entry = cache.put('/a', b'stale', ('chain',), snapshot)
+    assert entry.body == b'stale' and cache.get('/a') is None
+
+
+def test_lru_and_size_limits():
+    cache = ResponseCache(ttl=60, max_entries=2, max_bytes=10)
+    cache.put('/a', b'aaa', ())
+    cache.put('/b', b'bbb', ())
+    cache.get('/a')
+    cache.put('/c', b'ccc', ())
+    assert cache.get('/b') is None and cache.get('/a') is not None
+    cache.put('/big', b'x' * 11, ())
+    assert cache.get('/big') is None
+    assert cache.stats()['evictions'] == 1 and cache.stats()['bytes'] == 6
+
+
+def test_api_etag_and_not_modified(api):
+    async def scenario():
+        async with api() as client:
+            first = await client.get('/api/transactions')
+            etag = first.headers['ETag']
+            cached = await client.get('/api/transactions', headers={'If-None-Match': etag})
+            await client.post('/api/transactions?wait=true', json={'sender': 'a', 'recipient': 'b', 'amount': 1})
+            changed = await client.get('/api/transactions', headers={'If-None-Match': etag})
+            return first, cached, changed
+
+    first, cached, changed = asyncio.run(scenario())
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'no-cache'
+    assert cached.status_code == 304 and cached.content == b''
+    assert changed.status_code == 200 and changed.headers['ETag'] != first.headers['ETag']
+    assert len(changed.json()['current']) == len(first.json()['current']) + 1
@@ -0,0 +1,39 @@
+"""Hash và Merkle root của block lưu trữ (src/chain.py)."""
+
+import hashlib
+
+from bson import ObjectId
+
+from models.merkle import merkle_root as tree_root
+from src.chain import _canonical, attach_transactions, compute_block_hash, merkle_root
+
+
+def txs(n):
+    return [{'_id': ObjectId(f'{i + 1:024x}'), 'sender': f'user{i}', 'recipient': 'bob', 'amount': i}
+            for i in range(n)]
+
+
+def test_duplicated_last_transaction_changes_root():
+    a, b, c = txs(3)
+    assert merkle_root([a, b, c]) != merkle_root([a, b, c, c])
+    assert merkle_root([a, b]) != merkle_root([a, b, b])
+
+
+def test_root_matches_in_memory_tree():
+    items = txs(5)
+    leaves = [hashlib.sha256(_canonical(tx)).digest() for tx in items]
+    assert merkle_root(items) == tree_root(leaves).hex()
+    assert merkle_root([]) == tree_root([]).hex()
+
+
+def test_root_ignores_block_id():
+    items = txs(3)
+    assert merkle_root([dict(tx, block_id='b1') for tx in items]) == merkle_root(items)
+
+
+def test_reference_block_hash_covers_duplicate_tx_ids():
+    items = txs(3)
+    block = attach_transactions({'index': 1, 'timestamp': 1.0, 'previous_hash': '0'}, items, 'reference')
+    tampered = attach_transactions({'index': 1, 'timestamp': 1.0, 'previous_hash': '0'}, items + items[-1:],
+                                   'reference')
+    assert compute_block_hash(block) != compute_block_hash(tampered)
@@ -0,0 +1,55 @@
+"""Các truy vấn nóng (src/indexes.py HOT_QUERIES) phải chạy bằng IXSCAN.
+
+Cần mongod theo MONGO_URI; dùng database riêng MONGO_DB_NAME + "_test_indexes"
+(bị xóa sau khi chạy). Không kết nối được thì bỏ qua.
+"""
+
+import os
+from datetime import datetime
+
+import pytest
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from src.indexes import HOT_QUERIES, ensure_indexes, explain_hot_queries
+
+load_dotenv()
+
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
+TEST_DB = os.getenv('MONGO_DB_NAME', 'financechain') + '_test_indexes'
+
+
+@pytest.fixture(scope='module')
+def db():
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command('ping')
+    except PyMongoError as e:
+        client.close()
+        pytest.skip(f'mongod not reachable at {MONGO_URI}: {e}')
+    client.drop_database(TEST_DB)
+    db = client[TEST_DB]
+    try:
+        yield db
+    finally:
+        client.drop_database(TEST_DB)
+        client.close()
+
+
+def test_hot_queries_use_indexes(db):
+    assert ensure_indexes(db) == {}
+    # Collection rỗng (hoặc chưa tồn tại) cho plan EOF, không phản ánh truy vấn thật
+    now = datetime.utcnow()
+    db.transactions.insert_many([
+        {'sender': f'user{i % 5}', 'recipient': f'user{i % 7}', 'amount': i, 'mined': i % 2 == 0, 'created_at': now}
+        for i in range(50)
+    ])
+    db.blocks.insert_many([{'index': i, 'hash': f'h{i}', 'timestamp': i} for i in range(20)])
+    db.payments.insert_many([{'amount': i, 'status': 'pending', 'created_at': now} for i in range(10)])
+
+    results = explain_hot_queries(db)
+    assert len(results) == len(HOT_QUERIES)
+    for coll_name, query, sort, stages in results:
+        assert 'COLLSCAN' not in stages, f'{coll_name}.find({query}).sort({sort}): {stages}'
+        assert 'IXSCAN' in stages, f'{coll_name}.find({query}).sort({sort}): {stages}'
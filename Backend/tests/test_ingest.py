@@ -0,0 +1,84 @@
+"""Nạp tiếp sau khi ingest_records dừng giữa chừng (src/ingest.py), trên sqlite file tạm.
+
+Lô ghi dở sau checkpoint chỉ được xoá khi vẫn là đỉnh chuỗi; nếu producer đã
+nối block lên trên thì các block đó được giữ lại và chuỗi vẫn liền mạch.
+"""
+
+import asyncio
+
+import pytest
+
+from src import database
+from src.chain import validate_incremental
+from src.ingest import _block_object_id, ingest_records
+from src.producer import BlockProducer
+
+KEY = 'test-import'
+RECORDS = [{'sender': f'user{n % 3}', 'recipient': 'shop', 'amount': n + 1} for n in range(12)]
+# 2 giao dịch mỗi block, 2 block mỗi lô: 3 lô, checkpoint sau mỗi lô
+OPTIONS = {'block_size': 2, 'batch_blocks': 2, 'rollups': False, 'verify_signatures': False}
+
+
+class Crash(Exception):
+    pass
+
+
+async def crash_after_first_batch(storage):
+    """Run an ingest that stops after writing the second batch but before checkpointing it"""
+    set_state = storage.set_state
+    calls = []
+
+    async def failing(collection, key, fields):
+        calls.append(key)
+        if len(calls) == 2:
+            raise Crash()
+        return await set_state(collection, key, fields)
+
+    storage.set_state = failing
+    try:
+        with pytest.raises(Crash):
+            await ingest_records(iter(RECORDS), key=KEY, **OPTIONS)
+    finally:
+        storage.set_state = set_state
+    return (await storage.get_state('ingest_state', KEY))['started']
+
+
+async def chain_summary(storage):
+    blocks = [block async for batch in storage.iter_blocks() for block in batch]
+    return {
+        'indexes': [block['index'] for block in blocks],
+        'amounts': sorted(tx['amount'] for block in blocks for tx in block['transactions']),
+        'valid': (await validate_incremental())['valid'],
+    }
+
+
+async def run(path, mine_on_top):
+    storage = await database.init_storage('sqlite', sqlite_path=path)
+    try:
+        started = await crash_after_first_batch(storage)
+        expected = [r['amount'] for r in RECORDS]
+        if mine_on_top:
+            # Lô 2 chỉ ghi được block đầu, rồi producer nối một block lên trên
+            await storage.delete_blocks([_block_object_id(started, KEY, 3)])
+            producer = BlockProducer(max_wait_ms=1)
+            await producer.start()
+            await producer.wait_for(producer.submit({'sender': 'alice', 'recipient': 'bob', 'amount': 100}))
+            await producer.stop()
+            expected.append(100)
+        stats = await ingest_records(iter(RECORDS), key=KEY, **OPTIONS)
+        return stats, await chain_summary(storage), sorted(expected)
+    finally:
+        await database.close_storage()
+
+
+def test_resume_rewrites_partial_batch_at_tip(tmp_path):
+    stats, chain, expected = asyncio.run(run(str(tmp_path / 'ingest.db'), mine_on_top=False))
+    assert stats['resumed'] and stats['transactions'] == 12 and stats['blocks'] == 6
+    assert chain == {'indexes': list(range(6)), 'amounts': expected, 'valid': True}
+
+
+def test_resume_keeps_partial_batch_below_producer_block(tmp_path):
+    stats, chain, expected = asyncio.run(run(str(tmp_path / 'ingest.db'), mine_on_top=True))
+    assert stats['resumed'] and stats['transactions'] == 12 and stats['blocks'] == 6
+    # Block 2 (nửa lô ghi dở) được giữ, block 3 là của producer, phần còn thiếu ghi tiếp ở đỉnh chuỗi
+    assert chain == {'indexes': list(range(7)), 'amounts': expected, 'valid': True}
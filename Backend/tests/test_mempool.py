@@ -0,0 +1,105 @@
+"""Mempool của block producer (src/mempool.py) và phản hồi 429 + Retry-After của API."""
+
+import asyncio
+
+import pytest
+
+from src.mempool import (
+    RETRY_AFTER_MAX_S, RETRY_AFTER_MIN_S, DuplicateTransaction, Mempool, MempoolFull,
+)
+from src.producer import PendingTx, producer
+
+
+def pending(n, sender='alice', fee=None, tx_hash=None):
+    tx = {'sender': sender, 'recipient': 'bob', 'amount': n}
+    if fee is not None:
+        tx['fee'] = fee
+    if tx_hash is not None:
+        tx['hash'] = tx_hash
+    return PendingTx(f'tx{n}', tx, None, None)
+
+
+def test_take_orders_by_fee_then_arrival():
+    pool = Mempool()
+    for n, fee in enumerate([1, 5, None, 5, 3]):
+        pool.add(pending(n, sender=f'user{n}', fee=fee))
+    assert [item.tx_id for item in pool.take(3)] == ['tx1', 'tx3', 'tx4']
+    assert [item.tx_id for item in pool.take(10)] == ['tx0', 'tx2']
+    assert len(pool) == 0
+
+
+def test_sender_quota():
+    pool = Mempool(sender_quota=2)
+    pool.add(pending(0))
+    pool.add(pending(1))
+    with pytest.raises(MempoolFull) as refused:
+        pool.add(pending(2))
+    assert refused.value.reason == 'sender quota exceeded'
+    pool.add(pending(3, sender='carol'))
+    # Lấy ra khỏi mempool thì sender lại có chỗ
+    pool.take(1)
+    pool.add(pending(4))
+
+
+def test_full_pool_evicts_lowest_fee_or_refuses():
+    pool = Mempool(capacity=2)
+    first, second = pending(0, fee=1), pending(1, fee=2)
+    pool.add(first)
+    pool.add(second)
+    assert pool.add(pending(2, fee=3)) is first
+    with pytest.raises(MempoolFull) as refused:
+        pool.add(pending(3, fee=2))
+    assert refused.value.reason == 'mempool full'
+    assert [item.tx_id for item in pool.take(2)] == ['tx2', 'tx1']
+
+
+def test_expire_after_ttl():
+    pool = Mempool(ttl=10)
+    pool.add(pending(0, sender='a'), now=0)
+    pool.add(pending(1, sender='b'), now=5)
+    assert pool.expire(now=9) == []
+    assert [item.tx_id for item in pool.expire(now=12)] == ['tx0']
+    assert [item.tx_id for item in pool.take(5)] == ['tx1']
+
+
+def test_duplicate_hash_pending_and_recently_sealed():
+    pool = Mempool()
+    pool.add(pending(0, tx_hash='0xabc'))
+    with pytest.raises(DuplicateTransaction) as dup:
+        pool.add(pending(1, tx_hash='0xabc'))
+    assert dup.value.tx_id == 'tx0'
+    pool.mark_sealed(pool.take(1))
+    with pytest.raises(DuplicateTransaction):
+        pool.add(pending(2, tx_hash='0xabc'))
+    pool.add(pending(3, tx_hash='0xdef'))
+
+
+def test_retry_after_follows_drain_rate():
+    pool = Mempool()
+    assert pool.retry_after(1000) == RETRY_AFTER_MIN_S
+    pool.record_drain(100, 1.0)
+    assert pool.retry_after(500) == 5
+    assert pool.retry_after(10 ** 6) == RETRY_AFTER_MAX_S
+    assert pool.retry_after(1) == RETRY_AFTER_MIN_S
+
+
+def test_api_returns_429_with_retry_after(api, monkeypatch):
+    async def scenario():
+        async with api() as client:
+            # Producer không niêm phong trong lúc test: giao dịch đầu vẫn chiếm quota của sender
+            monkeypatch.setattr(producer, 'mempool', Mempool(sender_quota=1))
+            monkeypatch.setattr(producer, 'max_wait', 60)
+            monkeypatch.setattr(producer, 'max_txs', 1000)
+            body = {'sender': 'alice', 'recipient': 'bob', 'amount': 1}
+            first = await client.post('/api/transactions', json=body)
+            second = await client.post('/api/transactions', json=body)
+            batch = await client.post('/api/transactions/batch', json=[body, body])
+            return first, second, batch
+
+    first, second, batch = asyncio.run(scenario())
+    assert first.status_code == 202
+    assert second.status_code == 429
+    assert second.headers['Retry-After'] == str(second.json()['retry_after'])
+    assert second.json()['error'] == 'sender quota exceeded'
+    assert batch.status_code == 429 and 'Retry-After' in batch.headers
+    assert [r['error'] for r in batch.json()['results']] == ['sender quota exceeded'] * 2
@@ -0,0 +1,63 @@
+"""Keyset pagination của GET /api/transactions: cursor (encode/decode) và đi hết các trang theo next_cursor."""
+
+import asyncio
+
+import pytest
+
+from src.database import decode_cursor, encode_cursor
+from src.ingest import ingest_records
+
+
+def test_cursor_round_trip():
+    position = {'tx': ['2026-01-30T23:00:00', '0' * 24], 'blk': 41}
+    token = encode_cursor(position)
+    assert '=' not in token and '/' not in token and '+' not in token
+    assert decode_cursor(token) == position
+
+
+@pytest.mark.parametrize('token', ['not base64!', encode_cursor(['a', 'b'])[:-2], encode_cursor([1, 2])])
+def test_malformed_cursor(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+
+async def walk(client, **params):
+    """Every page of /api/transactions from the first one, following next_cursor"""
+    pages, cursor = [], None
+    while True:
+        query = dict(params, **({'cursor': cursor} if cursor else {}))
+        response = await client.get('/api/transactions', params=query)
+        assert response.status_code == 200
+        page = response.json()
+        pages.append(page)
+        cursor = page['next_cursor']
+        if not cursor:
+            return pages
+
+
+def test_walk_all_pages(api):
+    records = [{'sender': f'user{n % 4}', 'recipient': 'shop', 'amount': n + 1} for n in range(25)]
+
+    async def scenario():
+        async with api() as client:
+            await ingest_records(iter(records), block_size=1, rollups=False, verify_signatures=False)
+            first = (await client.get('/api/transactions')).json()
+            pages = await walk(client, limit=7)
+            filtered = await walk(client, limit=3, sender='user1')
+            bad = await client.get('/api/transactions', params={'cursor': 'nope'})
+            return first, pages, filtered, bad
+
+    first, pages, filtered, bad = asyncio.run(scenario())
+    total = first['current']
+    assert len(total) >= 25 and first['next_cursor'] is None
+
+    txs = [tx['_id'] for page in pages for tx in page['current']]
+    assert sorted(txs) == sorted(tx['_id'] for tx in total)
+    assert all(len(page['current']) <= 7 for page in pages)
+    indexes = [block['index'] for page in pages for block in page['chain']]
+    assert indexes == list(range(len(indexes))) and len(indexes) >= 25
+
+    senders = {tx['sender'] for page in filtered for tx in page['current']}
+    assert senders == {'user1'}
+    assert sum(len(page['current']) for page in filtered) == sum(tx['sender'] == 'user1' for tx in total)
+    assert bad.status_code == 400 and bad.json()['error'] == 'invalid cursor'
@@ -0,0 +1,97 @@
+"""Đường niêm phong block của BlockProducer (src/producer.py) trên sqlite file tạm."""
+
+import asyncio
+
+import pytest
+
+from src import database, producer as producer_module
+from src.chain import validate_incremental
+from src.producer import BlockProducer, ProducerStopped
+
+
+def tx(n, fee=None):
+    data = {'sender': f'user{n}', 'recipient': 'shop', 'amount': n + 1, 'mined': False}
+    if fee is not None:
+        data['fee'] = fee
+    return data
+
+
+async def with_storage(path, scenario):
+    storage = await database.init_storage('sqlite', sqlite_path=path)
+    try:
+        return await scenario(storage)
+    finally:
+        await database.close_storage()
+
+
+def test_seals_blocks_of_max_txs_and_confirms_payments(tmp_path):
+    async def scenario(storage):
+        payment_id = await database.save_payment({'payer': 'user0', 'payee': 'shop', 'amount': 1,
+                                                  'status': 'confirming'})
+        producer = BlockProducer(max_txs=2, max_wait_ms=50)
+        await producer.start()
+        ids = [producer.submit(tx(0), payment_id=payment_id)] + producer.submit_many([tx(n) for n in range(1, 5)])
+        done = await producer.wait_many(ids, timeout=5)
+        await producer.stop()
+        stored = [await storage.get_transaction(tx_id) for tx_id in ids]
+        blocks = [block async for batch in storage.iter_blocks() for block in batch]
+        return ids, done, stored, blocks, await storage.get_payment(payment_id), await validate_incremental()
+
+    ids, done, stored, blocks, payment, validation = asyncio.run(with_storage(str(tmp_path / 'p.db'), scenario))
+    assert set(done) == set(ids)
+    assert [len(block['transactions']) for block in blocks] == [2, 2, 1]
+    assert [block['index'] for block in blocks] == [0, 1, 2]
+    for tx_id, doc in zip(ids, stored):
+        assert doc['mined'] and doc['block_id'] == done[tx_id]['block_id']
+    assert payment['status'] == 'confirmed' and payment['transaction_id'] == ids[0]
+    assert validation['valid'] and validation['checked'] == 3
+
+
+def test_higher_fee_sealed_first(tmp_path):
+    async def scenario(storage):
+        producer = BlockProducer(max_txs=2, max_wait_ms=50)
+        await producer.start()
+        # Gửi cả nhóm trong một lần nên producer lấy theo fee từ đầu
+        ids = producer.submit_many([tx(0, fee=1), tx(1), tx(2, fee=5), tx(3, fee=3)])
+        done = await producer.wait_many(ids, timeout=5)
+        await producer.stop()
+        return ids, done
+
+    ids, done = asyncio.run(with_storage(str(tmp_path / 'p.db'), scenario))
+    assert [done[tx_id]['block_index'] for tx_id in ids] == [1, 1, 0, 0]
+
+
+def test_failed_seal_drops_transactions_and_releases_payment(tmp_path, monkeypatch):
+    async def failing_save_block(block_data, transactions=None):
+        raise RuntimeError('disk full')
+
+    async def scenario(storage):
+        payment_id = await database.save_payment({'payer': 'user0', 'payee': 'shop', 'amount': 1,
+                                                  'status': 'confirming'})
+        producer = BlockProducer(max_txs=10, max_wait_ms=1)
+        await producer.start()
+        monkeypatch.setattr(producer_module, 'save_block', failing_save_block)
+        tx_id = producer.submit(tx(0), payment_id=payment_id)
+        with pytest.raises(RuntimeError):
+            await producer.wait_for(tx_id, timeout=5)
+        await producer.stop()
+        return (await storage.get_transaction(tx_id), await storage.count_blocks(),
+                (await storage.get_payment(payment_id))['status'], producer.is_pending(tx_id))
+
+    assert asyncio.run(with_storage(str(tmp_path / 'p.db'), scenario)) == (None, 0, 'pending', False)
+
+
+def test_submit_requires_running_task(tmp_path):
+    async def scenario(storage):
+        producer = BlockProducer()
+        with pytest.raises(ProducerStopped):
+            producer.submit(tx(0))
+        await producer.start()
+        producer._task.cancel()
+        await asyncio.sleep(0)
+        results = producer.submit_many([tx(1), tx(2)])
+        await producer.stop()
+        return results
+
+    results = asyncio.run(with_storage(str(tmp_path / 'p.db'), scenario))
+    assert [type(r) for r in results] == [ProducerStopped, ProducerStopped]
@@ -0,0 +1,302 @@
+"""Conformance của các engine lưu trữ (src/storage): cùng một kịch bản trên mongo và sqlite.
+
+Mỗi engine chạy kịch bản với cả hai BLOCK_LAYOUT. Kết quả từng bước phải
+khớp EXPECTED (những gì không phụ thuộc engine) và, với mongo, khớp từng bước
+với sqlite cùng layout. sqlite dùng file tạm; mongo dùng mongod theo MONGO_URI
+(database riêng MONGO_DB_NAME + "_test_storage", bị xóa sau khi chạy), không
+kết nối được thì dùng mongomock-motor, không có cả hai thì bỏ qua.
+"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from src import database
+from src.chain import GENESIS_PREVIOUS_HASH, attach_transactions, compute_block_hash
+from src.storage import DuplicateKeyError
+
+TEST_DB = database.MONGO_DB_NAME + '_test_storage'
+LAYOUTS = ('embedded', 'reference')
+T0 = datetime(2026, 1, 30, 23, 0)
+
+
+def oid(n):
+    """Deterministic ObjectId so both engines see the same ids"""
+    return ObjectId(f'{n:024x}')
+
+
+def normalize(value):
+    """Comparable form of a result (key order and ObjectId/datetime types ignored)"""
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+async def flatten(batches):
+    """Documents of an async iterator of batches (batch boundaries are only a memory bound)"""
+    docs = []
+    async for batch in batches:
+        assert batch, 'empty batch'
+        docs.extend(batch)
+    return docs
+
+
+# Kịch bản conformance: mỗi bước trả về (tên, kết quả) để so sánh giữa các engine
+
+def scenario_transactions():
+    txs = []
+    for n in range(12):
+        tx = {'_id': oid(n + 1), 'sender': f'user{n % 3}', 'recipient': f'user{3 + n % 2}', 'amount': n + 1,
+              'mined': n % 4 != 0, 'signed_message': f'msg {n}', 'signature': '0x' + f'{n:02x}' * 65}
+        if n != 5:
+            # Hai giao dịch chung created_at để kiểm tra thứ tự phụ theo _id; giao dịch 5 không có created_at
+            tx['created_at'] = T0 + timedelta(hours=n // 2)
+        txs.append(tx)
+    return txs
+
+
+async def conformance_steps(storage, layout):
+    steps = []
+
+    def record(name, value):
+        steps.append((name, normalize(value)))
+
+    txs = scenario_transactions()
+    record('insert_transactions', await storage.insert_transactions([dict(tx) for tx in txs]))
+    try:
+        await storage.insert_transactions([dict(txs[0])])
+        record('insert_transactions duplicate', 'no error')
+    except DuplicateKeyError:
+        record('insert_transactions duplicate', 'DuplicateKeyError')
+    record('get_transaction', await storage.get_transaction(str(oid(3))))
+    record('get_transaction missing', await storage.get_transaction(str(oid(999))))
+    record('get_transaction malformed', await storage.get_transaction('not-an-id'))
+    record('list_transactions', sorted(str(tx['_id']) + str('signed_message' in tx)
+                                       for tx in await storage.list_transactions()))
+
+    for filters in (None, {'sender': 'user1'}, {'mined': False}, {'recipient': 'user4', 'mined': True},
+                    {'since': T0 + timedelta(hours=1), 'until': T0 + timedelta(hours=4)}):
+        pages, after = [], None
+        while True:
+            docs, after = await storage.transactions_page(2, after, filters)
+            pages.append(docs)
+            if after is None:
+                break
+        record(f'transactions_page {filters}', pages)
+    try:
+        await storage.transactions_page(2, ['bad', 'cursor'])
+        record('transactions_page bad cursor', 'no error')
+    except ValueError:
+        record('transactions_page bad cursor', 'ValueError')
+
+    # Block theo `layout`; giao dịch đã mine nằm trong collection transactions ở cả hai layout
+    prev_hash = GENESIS_PREVIOUS_HASH
+    mined = [tx for tx in txs if tx['mined']]
+    for index in range(4):
+        block_id = oid(1000 + index)
+        group = [dict(tx, _id=oid(500 + index * 10 + i), block_id=str(block_id))
+                 for i, tx in enumerate(mined[index * 2:index * 2 + 2])]
+        await storage.insert_transactions([dict(tx) for tx in group])
+        block = attach_transactions({'_id': block_id}, group, layout)
+        block.update({'index': index, 'timestamp': (T0 - datetime(1970, 1, 1)).total_seconds() + index * 3600,
+                      'previous_hash': prev_hash, 'created_at': T0})
+        block['hash'] = prev_hash = compute_block_hash(block)
+        record(f'insert_block {index}', await storage.insert_block(block))
+    try:
+        await storage.insert_block({'_id': oid(1999), 'index': 1, 'timestamp': 0})
+        record('insert_block duplicate index', 'no error')
+    except DuplicateKeyError:
+        record('insert_block duplicate index', 'DuplicateKeyError')
+    record('block_index_unique', await storage.block_index_unique())
+    record('count_blocks', await storage.count_blocks())
+    record('chain_tip', await storage.chain_tip())
+    record('block_indexes', await storage.block_indexes([oid(1001), oid(1003), oid(1999)]))
+
+    for kwargs in ({}, {'sender': 'user1'}, {'recipient': 'user3'},
+                   {'since': T0 + timedelta(hours=1), 'until': T0 + timedelta(hours=3)}):
+        pages, after = [], None
+        while True:
+            blocks, after = await storage.blocks_page(3, after, **kwargs)
+            pages.append(blocks)
+            if after is None:
+                break
+        record(f'blocks_page {kwargs}', pages)
+    record('iter_blocks', await flatten(storage.iter_blocks(batch_size=3)))
+    record('iter_blocks after', await flatten(storage.iter_blocks(after_index=1, batch_size=3)))
+    fields = ('sender', 'recipient', 'amount')
+    record('iter_blocks tx_fields', [[{f: tx.get(f) for f in fields} for tx in block['transactions']]
+                                     for block in await flatten(storage.iter_blocks(batch_size=2, tx_fields=fields))])
+    refs = [{'_id': oid(1002), 'tx_ids': [oid(520), oid(521), oid(998)]}]
+    record('hydrate_blocks', await storage.hydrate_blocks([dict(b) for b in refs]))
+    record('hydrate_blocks full', await storage.hydrate_blocks([dict(b) for b in refs], full=True))
+
+    payment_ids = []
+    for n in range(3):
+        payment_ids.append(await storage.insert_payment({
+            '_id': oid(2000 + n), 'payer': 'user1', 'payee': 'user2', 'amount': n + 1,
+            'status': 'pending', 'created_at': T0 + timedelta(minutes=n)}))
+    record('insert_payment', payment_ids)
+    record('update_payments', await storage.update_payments([
+        (payment_ids[0], {'status': 'confirmed', 'block_id': 'b1'}),
+        (payment_ids[1], {'status': 'pending'}),
+        (str(oid(2999)), {'status': 'confirmed'}),
+    ]))
+    try:
+        await storage.update_payments([('not-an-id', {'status': 'x'})])
+        record('update_payments malformed', 'no error')
+    except ValueError:
+        record('update_payments malformed', 'ValueError')
+    record('update_payment_if', [await storage.update_payment_if(payment_ids[1], 'pending', {'status': 'confirming'}),
+                                 await storage.update_payment_if(payment_ids[1], 'pending', {'status': 'confirming'}),
+                                 await storage.update_payment_if(str(oid(2999)), 'pending', {'status': 'x'}),
+                                 await storage.update_payment_if('nope', 'pending', {'status': 'x'})])
+    record('list_payments', await storage.list_payments())
+    record('get_payment', [await storage.get_payment(payment_ids[0]), await storage.get_payment('nope')])
+
+    await storage.apply_rollups({'user1': {'received': 0, 'sent': 5, 'count_in': 0, 'count_out': 1},
+                                 'user3': {'received': 5, 'sent': 0, 'count_in': 1, 'count_out': 0}},
+                                {'2026-01-30': {'count': 1, 'volume': 5, 'blocks': 1}})
+    await storage.apply_rollups({'user1': {'received': 2, 'sent': 0, 'count_in': 1, 'count_out': 0}},
+                                {'2026-01-30': {'count': 1, 'volume': 2, 'blocks': 1},
+                                 '2026-01-31': {'count': 0, 'volume': 0, 'blocks': 1}})
+    record('get_balance', [await storage.get_balance('user1'), await storage.get_balance('nobody')])
+    record('daily_rollups', [await storage.daily_rollups(), await storage.daily_rollups('2026-01-31'),
+                             await storage.daily_rollups(None, '2026-01-31')])
+    record('load_rollups', await storage.load_rollups())
+    await storage.replace_rollups({'user9': {'received': 1, 'sent': 0, 'count_in': 1, 'count_out': 0}},
+                                  {'2026-02-01': {'count': 1, 'volume': 1, 'blocks': 1}}, batch_size=1)
+    record('replace_rollups', await storage.load_rollups())
+
+    record('stats_totals', await storage.stats_totals())
+    record('account_totals', [await storage.account_totals('sender', 'user1'),
+                              await storage.account_totals('recipient', 'user4'),
+                              await storage.account_totals('sender', 'nobody')])
+    record('top_accounts', [await storage.top_accounts('sender', 2), await storage.top_accounts('recipient', 5)])
+    record('time_buckets', [await storage.time_buckets('%Y-%m-%d'), await storage.time_buckets('%Y-%m'),
+                            await storage.time_buckets('%Y-%m-%d', T0 + timedelta(hours=2))])
+
+    record('get_state missing', await storage.get_state('chain_state', 'checkpoint'))
+    await storage.set_state('chain_state', 'checkpoint', {'index': 1, 'hash': 'h1'})
+    await storage.set_state('chain_state', 'checkpoint', {'index': 2, 'verified_at': 1.5})
+    record('set_state', await storage.get_state('chain_state', 'checkpoint'))
+    await storage.delete_state('chain_state', 'checkpoint')
+    record('delete_state', await storage.get_state('chain_state', 'checkpoint'))
+
+    record('acquire_lock', [await storage.acquire_lock('seed', 'a', 60), await storage.acquire_lock('seed', 'b', 60),
+                            await storage.acquire_lock('seed', 'a', 60)])
+    await storage.release_lock('seed', 'b')
+    record('release_lock other owner', await storage.acquire_lock('seed', 'b', 60))
+    await storage.release_lock('seed', 'a')
+    record('release_lock', await storage.acquire_lock('seed', 'b', -1))
+    record('expired lock', await storage.acquire_lock('seed', 'a', 60))
+
+    record('export blocks', await flatten(storage.export_batches('blocks', {'after_index': 0}, 2)))
+    record('export transactions', await flatten(storage.export_batches('transactions', {'mined': False}, 2)))
+
+    record('delete_pending_transactions', await storage.delete_pending_transactions(T0 + timedelta(hours=3)))
+    record('delete_transactions', [await storage.delete_transactions([oid(521), oid(998)]),
+                                   await storage.get_transaction(str(oid(521)))])
+    await storage.delete_blocks([oid(1003)])
+    record('delete_blocks', [await storage.count_blocks(), await storage.chain_tip(),
+                             await storage.get_transaction(str(oid(530)))])
+    block = {'_id': oid(1100), 'index': 10, 'timestamp': 0.0, 'hash': 'h', 'tx_ids': [oid(600)]}
+    await storage.insert_blocks([block], [{'_id': oid(600), 'sender': 'x', 'amount': 1, 'block_id': str(oid(1100)),
+                                           'mined': True, 'created_at': T0}])
+    record('insert_blocks', [await storage.chain_tip(), await storage.blocks_page(5, 3)])
+    return steps
+
+
+def _normalized(expected):
+    return {name: normalize(value) for name, value in expected.items()}
+
+
+# Kết quả không phụ thuộc engine
+EXPECTED = _normalized({
+    'insert_transactions duplicate': 'DuplicateKeyError',
+    'get_transaction missing': None,
+    'get_transaction malformed': None,
+    'transactions_page bad cursor': 'ValueError',
+    'insert_block duplicate index': 'DuplicateKeyError',
+    'block_index_unique': True,
+    'count_blocks': 4,
+    'block_indexes': {str(oid(1001)): 1, str(oid(1003)): 3},
+    'update_payments malformed': 'ValueError',
+    'update_payment_if': [True, False, False, False],
+    'get_state missing': None,
+    'delete_state': None,
+    'acquire_lock': [True, False, True],
+    'release_lock other owner': False,
+    'release_lock': True,
+    'expired lock': True,
+    'delete_transactions': [1, None],
+})
+
+
+@pytest.fixture(scope='module')
+def mongo_mode():
+    """'real' khi có mongod theo MONGO_URI, không thì 'mock' (mongomock-motor)"""
+    client = MongoClient(database.MONGO_URI, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command('ping')
+        return 'real'
+    except PyMongoError:
+        pass
+    finally:
+        client.close()
+    pytest.importorskip('mongomock_motor', reason='needs a reachable mongod or mongomock-motor')
+    return 'mock'
+
+
+async def run_sqlite(path, layout):
+    storage = await database.init_storage('sqlite', sqlite_path=path)
+    try:
+        return await conformance_steps(storage, layout)
+    finally:
+        await database.close_storage()
+
+
+async def run_mongo(layout):
+    # Database trống; init_mongodb tạo lại các index như backend
+    await database.init_storage('mongo', db_name=TEST_DB)
+    await database.get_async_db().client.drop_database(TEST_DB)
+    await database.close_storage()
+    storage = await database.init_storage('mongo', db_name=TEST_DB)
+    try:
+        return await conformance_steps(storage, layout)
+    finally:
+        await database.get_async_db().client.drop_database(TEST_DB)
+        await database.close_storage()
+
+
+def check_expected(steps):
+    for name, got in steps:
+        if name in EXPECTED:
+            assert got == EXPECTED[name], name
+    assert set(EXPECTED) <= {name for name, _ in steps}
+
+
+@pytest.mark.parametrize('layout', LAYOUTS)
+def test_sqlite_conformance(tmp_path, layout):
+    check_expected(asyncio.run(run_sqlite(str(tmp_path / 'storage.db'), layout)))
+
+
+@pytest.mark.parametrize('layout', LAYOUTS)
+def test_mongo_conformance(tmp_path, monkeypatch, mongo_mode, layout):
+    if mongo_mode == 'mock':
+        import mongomock
+        import mongomock_motor
+        shared = mongomock.MongoClient()
+        monkeypatch.setattr(database, 'AsyncIOMotorClient',
+                            lambda *a, **k: mongomock_motor.AsyncMongoMockClient(mock_mongo_client=shared))
+    # Engine mongo đọc layout từ database.BLOCK_LAYOUT khi mở
+    monkeypatch.setattr(database, 'BLOCK_LAYOUT', layout)
+    steps = asyncio.run(run_mongo(layout))
+    check_expected(steps)
+
+    reference = asyncio.run(run_sqlite(str(tmp_path / 'storage.db'), layout))
+    assert [name for name, _ in steps] == [name for name, _ in reference]
+    for (name, got), (_, expected) in zip(steps, reference):
+        assert got == expected, f'{name} differs from sqlite'
@@ -29,11 +29,13 @@ export function switchTab(tabName) {
   }
 }
 
-// Update statistics
-export function updateStats() {
-  const totalTx = allTransactions.length + allBlocks.reduce((sum, b) => sum + b.transactions.length, 0);
-  document.getElementById('statTotal').textContent = totalTx;
-  document.getElementById('statBlocks').textContent = allBlocks.length;
+// Update statistics (tổng hợp sẵn ở backend qua /api/stats, không cần tải toàn bộ chuỗi)
+export async function updateStats() {
+  const res = await fetch(apiUrl('/api/stats'));
+  if (!res.ok) throw new Error(`HTTP ${res.status}`);
+  const { stats } = await res.json();
+  document.getElementById('statTotal').textContent = stats.transactions;
+  document.getElementById('statBlocks').textContent = stats.blocks;
 }
 
 // Update status indicator
@@ -380,22 +382,45 @@ export function renderRecentTx() {
   });
 }
 
-// Load all data
-export async function loadData() {
-  try {
-    const res = await fetch(apiUrl('/api/transactions'));
-    if (!res.ok) throw new Error(`HTTP ${res.status}`);
-    const data = await res.json();
-    
+// Số bản ghi mỗi trang khi tải /api/transactions
+const PAGE_SIZE = 200;
+
+// Cursor của trang kế tiếp (null khi đã tải hết)
+let nextCursor = null;
+
+// Tải một trang /api/transactions (trang đầu khi không có cursor) và nối vào dữ liệu đã có
+async function fetchPage(cursor) {
+  const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+  if (cursor) params.set('cursor', cursor);
+  const res = await fetch(apiUrl(`/api/transactions?${params}`));
+  if (!res.ok) throw new Error(`HTTP ${res.status}`);
+  const data = await res.json();
+
+  if (!cursor) {
     allTransactions.length = 0;
-    allTransactions.push(...(data.current || []));
     allBlocks.length = 0;
-    allBlocks.push(...(data.chain || []));
+  }
+  // Giao dịch / block có thể đã đến trước qua /api/stream; giữ allBlocks theo thứ tự index
+  const knownTx = new Set(allTransactions.map(tx => tx._id));
+  allTransactions.push(...(data.current || []).filter(tx => !knownTx.has(tx._id)));
+  const knownBlocks = new Set(allBlocks.map(b => b.index));
+  allBlocks.push(...(data.chain || []).filter(b => !knownBlocks.has(b.index)));
+  allBlocks.sort((a, b) => a.index - b.index);
+  nextCursor = data.next_cursor || null;
+
+  renderTransactions();
+  renderBlocks();
+  renderRecentTx();
+  document.querySelectorAll('.load-more').forEach(el => {
+    el.style.display = nextCursor ? '' : 'none';
+  });
+}
 
-    updateStats();
-    renderTransactions();
-    renderBlocks();
-    renderRecentTx();
+// Load data (chỉ trang đầu; các trang sau tải khi người dùng bấm "Tải thêm")
+export async function loadData() {
+  try {
+    await updateStats();
+    await fetchPage(null);
     updateStatus('online');
   } catch (err) {
     updateStatus('offline');
@@ -403,6 +428,44 @@ export async function loadData() {
   }
 }
 
+// Tải trang kế tiếp theo next_cursor
+export async function loadMore() {
+  if (!nextCursor) return;
+  try {
+    await fetchPage(nextCursor);
+  } catch (err) {
+    console.error('Load more error:', err);
+  }
+}
+
+// Nhận block mới qua /api/stream (Server-Sent Events) thay vì tải lại toàn bộ /api/transactions.
+// EventSource tự kết nối lại và gửi Last-Event-ID, backend gửi bù các block bị lỡ.
+let eventSource = null;
+
+export function subscribeStream() {
+  if (eventSource || typeof EventSource === 'undefined') return;
+  eventSource = new EventSource(apiUrl('/api/stream'));
+  eventSource.addEventListener('block', (ev) => {
+    const block = JSON.parse(ev.data);
+    if (allBlocks.some(b => b.index === block.index)) return;
+    allBlocks.push(block);
+    const known = new Map(allTransactions.map(tx => [tx._id, tx]));
+    for (const tx of (block.transactions || [])) {
+      const existing = known.get(tx._id);
+      if (existing) existing.mined = true;
+      else allTransactions.unshift(tx);
+    }
+    renderTransactions();
+    renderBlocks();
+    renderRecentTx();
+    updateStats().catch(() => {});
+  });
+  // Backend không gửi bù được (client lỡ quá nhiều sự kiện): tải lại như lúc đầu
+  eventSource.addEventListener('resync', () => loadData());
+  eventSource.onopen = () => updateStatus('online');
+  eventSource.onerror = () => updateStatus('offline');
+}
+
 // Add transaction
 export async function addTransaction() {
   // Xóa thông báo cũ (nếu có)
@@ -543,7 +606,8 @@ export async function addTransaction() {
       document.getElementById('amount').value = '';
       if (document.getElementById('desc')) document.getElementById('desc').value = '';
       if (document.getElementById('signWithWallet')) document.getElementById('signWithWallet').checked = false;
-      setTimeout(async ()=>{ await loadData(); }, 800);
+      // Block mới đến qua /api/stream; chỉ tải lại khi trình duyệt không có EventSource
+      if (!eventSource) setTimeout(async ()=>{ await loadData(); }, 800);
     } else {
       const payload = { sender, recipient, amount };
       if (desc) payload.desc = desc;
@@ -559,7 +623,8 @@ export async function addTransaction() {
           console.warn('Wallet sign failed:', e);
         }
       }
-      const res = await fetch(apiUrl('/api/transactions'), {
+      // wait=true: chờ block chứa giao dịch được niêm phong rồi mới trả về
+      const res = await fetch(apiUrl('/api/transactions?wait=true'), {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(payload)
@@ -572,7 +637,7 @@ export async function addTransaction() {
         document.getElementById('amount').value = '';
         if (document.getElementById('desc')) document.getElementById('desc').value = '';
         if (document.getElementById('signWithWallet')) document.getElementById('signWithWallet').checked = false;
-        setTimeout(loadData, 500);
+        if (!eventSource) setTimeout(loadData, 500);
       } else {
         showMessage('addStatus', `✗ Lỗi: ${data.error}`, 'error');
       }